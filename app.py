@@ -3,4 +3,10 @@ from quiz_app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # The development server prepares the database itself; in production, run
+    # `flask init-db` and `flask ingest` once before starting the workers
+    from quiz_app.commands import init_database, ingest_questions
+    with app.app_context():
+        init_database()
+        ingest_questions()
     app.run(debug=True)
@@ -0,0 +1,225 @@
+"""
+Compares the 'two_step' and 'single' evaluation modes over a fixed set of answers.
+
+Reports per-answer latency, token usage and how often both modes agree on the score.
+By default the models are served by a local stand-in for the OpenAI-compatible chat
+completions API, so the harness runs offline and measures the cost of the round trips
+themselves (each stand-in call sleeps for --latency seconds plus --per-token seconds per
+completion token). The stand-in grades the question and answer quoted in each prompt by
+keywords, so its scores only show whether both modes send the right pairs; score agreement
+is only meaningful against a real model. Pass --base-url and set OPENROUTER_API_KEY to
+benchmark a real endpoint.
+
+Usage:
+    python benchmarks/eval_modes.py [--repeat 3] [--latency 0.5] [--base-url URL]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from config import Config
+from quiz_app.evaluation import evaluate_answer
+
+# (category, question, answer, duration in seconds)
+ANSWERS = [
+    ("History", "In which year did the Berlin Wall fall?", "It fell in 1989, in November.", 4.2),
+    ("History", "Who was the first emperor of Rome?", "Julius Caesar.", 2.1),
+    ("History", "What was the main cause of the First World War?", "The assassination of Archduke Franz Ferdinand, on top of alliances and militarism.", 9.8),
+    ("Science", "What is the chemical symbol for gold?", "Au.", 1.4),
+    ("Science", "Why is the sky blue?", "Because of Rayleigh scattering: shorter wavelengths are scattered more by the atmosphere.", 7.5),
+    ("Science", "What is the powerhouse of the cell?", "The nucleus.", 1.9),
+    ("Science", "What does E=mc² mean?", "Energy equals mass times the speed of light squared, so mass and energy are equivalent.", 8.3),
+    ("General Knowledge", "What is the capital of Australia?", "Sydney.", 1.2),
+    ("General Knowledge", "How many continents are there?", "Seven, or six depending on the convention used.", 3.6),
+    ("General Knowledge", "Which language has the most native speakers?", "Mandarin Chinese.", 2.4),
+    ("General Knowledge", "What is the longest river in the world?", "I think it is the Amazon or the Nile, the measurements are disputed.", 6.7),
+    ("General Knowledge", "Who painted the Mona Lisa?", "Leonardo da Vinci, in the early sixteenth century.", 3.3),
+]
+
+def _count_tokens(text):
+    return max(1, len(text) // 4)
+
+# Words the stand-in looks for in an answer to each question, to grade it
+REFERENCE_KEYWORDS = {
+    "In which year did the Berlin Wall fall?": ("1989", "november"),
+    "Who was the first emperor of Rome?": ("augustus", "octavian"),
+    "What was the main cause of the First World War?": ("franz ferdinand", "alliances", "militarism", "nationalism"),
+    "What is the chemical symbol for gold?": ("au",),
+    "Why is the sky blue?": ("rayleigh", "scatter", "wavelength"),
+    "What is the powerhouse of the cell?": ("mitochondri",),
+    "What does E=mc² mean?": ("energy", "mass", "speed of light", "equivalent"),
+    "What is the capital of Australia?": ("canberra",),
+    "How many continents are there?": ("seven", "convention"),
+    "Which language has the most native speakers?": ("mandarin",),
+    "What is the longest river in the world?": ("nile", "amazon", "disputed"),
+    "Who painted the Mona Lisa?": ("leonardo", "da vinci", "sixteenth"),
+}
+
+def _stand_in_score(prompt):
+    """
+    Grades the question and answer quoted in the prompt by the reference keywords the answer
+    contains. Both modes therefore get the same score only when their prompts pair each
+    answer with its own question.
+    """
+    question = re.search(r'Question: "(.*?)"\n', prompt, re.S)
+    answer = re.search(r'User\'s Answer: "(.*?)"\n', prompt, re.S)
+    if not question or not answer:
+        return 1
+    keywords = REFERENCE_KEYWORDS.get(question.group(1), ())
+    found = sum(1 for keyword in keywords if keyword in answer.group(1).lower())
+    return 1 + round(4 * found / len(keywords)) if keywords else 1
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /chat/completions requests like an OpenAI-compatible endpoint would."""
+    latency = 0.5
+    per_token = 0.002
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt = "\n".join(m.get('content') or '' for m in body.get('messages', []))
+        score = _stand_in_score(prompt)
+        justification = f"The answer deserves {score} out of 5. " + "It is assessed against the question in detail. " * 20
+
+        message = {"role": "assistant", "content": None}
+        if body.get('tools'):
+            # Function calling: reply with a call to the first tool, filling its parameters
+            function = body['tools'][0]['function']
+            fields = {"score": score, "justification": justification}
+            arguments = {name: fields[name] for name in function['parameters'].get('properties', {}) if name in fields}
+            message["tool_calls"] = [{
+                "id": "call_0", "type": "function",
+                "function": {"name": function['name'], "arguments": json.dumps(arguments)}
+            }]
+            completion = message["tool_calls"][0]["function"]["arguments"]
+        elif body.get('response_format'):
+            schema = body['response_format'].get('json_schema', {}).get('schema', {})
+            fields = {"score": score, "justification": justification}
+            message["content"] = json.dumps({name: fields[name] for name in schema.get('properties', fields) if name in fields})
+            completion = message["content"]
+        else:
+            message["content"] = justification
+            completion = justification
+
+        prompt_tokens, completion_tokens = _count_tokens(prompt), _count_tokens(completion)
+        time.sleep(self.latency + self.per_token * completion_tokens)
+
+        payload = json.dumps({
+            "id": "chatcmpl-stand-in",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model'),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if body.get('tools') else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in(latency, per_token):
+    """Starts the stand-in endpoint on a free local port and returns its base URL."""
+    StandInHandler.latency = latency
+    StandInHandler.per_token = per_token
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def build_config(mode, base_url, api_key):
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    config.update({'EVALUATION_MODE': mode, 'OPENROUTER_BASE_URL': base_url, 'OPENROUTER_API_KEY': api_key})
+    return config
+
+def run_mode(mode, base_url, api_key, repeat):
+    """Evaluates every answer `repeat` times and returns one record per evaluation."""
+    config = build_config(mode, base_url, api_key)
+    # Warm up the client and its connection pool so the first record is not an outlier
+    category, question, answer, duration = ANSWERS[0]
+    evaluate_answer(question, answer, category, config, duration)
+
+    records = []
+    for _ in range(repeat):
+        for index, (category, question, answer, duration) in enumerate(ANSWERS):
+            usage = UsageMetadataCallbackHandler()
+            start = time.perf_counter()
+            result = evaluate_answer(question, answer, category, config, duration, callbacks=[usage])
+            elapsed = time.perf_counter() - start
+            records.append({
+                "index": index,
+                "latency": elapsed,
+                "score": result.get("score"),
+                "input_tokens": sum(u.get('input_tokens', 0) for u in usage.usage_metadata.values()),
+                "output_tokens": sum(u.get('output_tokens', 0) for u in usage.usage_metadata.values()),
+            })
+    return records
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(mode, records):
+    latencies = [r["latency"] for r in records]
+    failures = sum(1 for r in records if not r["score"])
+    print(f"{mode:>9}: mean {statistics.mean(latencies):.3f}s  p50 {_percentile(latencies, 0.5):.3f}s  "
+          f"p95 {_percentile(latencies, 0.95):.3f}s  "
+          f"tokens in/out per answer {statistics.mean(r['input_tokens'] for r in records):.0f}/"
+          f"{statistics.mean(r['output_tokens'] for r in records):.0f}  failures {failures}")
+
+def agreement(two_step, single, stand_in):
+    """
+    Compares the first score of each answer in both modes. The stand-in grades every prompt
+    the same way, so against it this only checks that both modes score each answer against
+    its own question; model agreement needs a real endpoint.
+    """
+    first = lambda records: {r["index"]: r["score"] for r in reversed(records)}
+    a, b = first(two_step), first(single)
+    pairs = [(a[i], b[i]) for i in a if a[i] and b.get(i)]
+    if not pairs:
+        print("agreement: no successful pairs")
+        return
+    exact = sum(1 for x, y in pairs if x == y) / len(pairs)
+    if stand_in:
+        print(f"prompt check (stand-in): same score in both modes for {exact:.0%} of {len(pairs)} answers")
+        return
+    within_one = sum(1 for x, y in pairs if abs(x - y) <= 1) / len(pairs)
+    mean_diff = statistics.mean(abs(x - y) for x, y in pairs)
+    print(f"agreement: exact {exact:.0%}  within 1 point {within_one:.0%}  mean abs diff {mean_diff:.2f}  ({len(pairs)} answers)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help="OpenAI-compatible endpoint to benchmark instead of the local stand-in")
+    parser.add_argument('--repeat', type=int, default=1, help="Number of passes over the answer set")
+    parser.add_argument('--latency', type=float, default=0.5, help="Stand-in latency per call, in seconds")
+    parser.add_argument('--per-token', type=float, default=0.002, help="Stand-in latency per completion token, in seconds")
+    args = parser.parse_args()
+
+    if args.base_url:
+        base_url, api_key = args.base_url, os.environ.get('OPENROUTER_API_KEY')
+    else:
+        base_url, api_key = start_stand_in(args.latency, args.per_token), 'stand-in'
+    print(f"Endpoint: {base_url}, {len(ANSWERS)} answers x {args.repeat}")
+
+    results = {}
+    for mode in ('two_step', 'single'):
+        results[mode] = run_mode(mode, base_url, api_key, args.repeat)
+        summarize(mode, results[mode])
+    agreement(results['two_step'], results['single'], stand_in=not args.base_url)
+
+if __name__ == '__main__':
+    main()
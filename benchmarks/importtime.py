@@ -0,0 +1,78 @@
+"""
+Measures how long a web worker takes to import the application and run create_app().
+
+Each run starts a fresh interpreter with `python -X importtime`, so nothing is cached
+between runs, and reports the median boot time, the slowest top-level imports (cumulative
+time, with the package they belong to) and which provider SDKs were loaded at boot. None
+of them should be: they are imported on first use, by the functions that call them.
+
+Usage:
+    python benchmarks/importtime.py [--runs 5] [--top 15]
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Heavy packages that must not be imported when a worker boots
+PROVIDER_SDKS = ['langchain', 'langchain_core', 'langchain_openai', 'openai', 'deepgram', 'mistralai', 'pydub', 'pydantic', 'numpy']
+
+BOOT = """
+import time
+start = time.perf_counter()
+from quiz_app import create_app
+create_app()
+print(time.perf_counter() - start)
+"""
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def boot_once():
+    """Returns (boot seconds, {module: (self us, cumulative us, depth)}) for one fresh interpreter."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'quiz.db')}")
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters to boot")
+    parser.add_argument('--top', type=int, default=15, help="Number of top-level imports to list")
+    args = parser.parse_args()
+
+    runs = [boot_once() for _ in range(args.runs)]
+    boot_times = [boot_time for boot_time, _ in runs]
+    modules = runs[-1][1]
+
+    print(f"create_app() boot time over {args.runs} runs: median {statistics.median(boot_times) * 1000:.0f} ms, "
+          f"min {min(boot_times) * 1000:.0f} ms, max {max(boot_times) * 1000:.0f} ms")
+    print(f"Modules imported: {len(modules)}, total import time: {sum(m[0] for m in modules.values()) / 1000:.0f} ms")
+
+    # Imports made directly by the interpreter or by quiz_app, i.e. what the app chose to load
+    top_level = [(name, cumulative) for name, (_, cumulative, depth) in modules.items()
+                 if depth == 0 or (depth == 1 and '.' not in name)]
+    print(f"\nSlowest top-level imports (cumulative ms):")
+    for name, cumulative in sorted(top_level, key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    loaded = [sdk for sdk in PROVIDER_SDKS if sdk in modules]
+    print(f"\nProvider SDKs loaded at boot: {', '.join(loaded) if loaded else 'none'}")
+    if loaded:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
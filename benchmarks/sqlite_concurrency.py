@@ -0,0 +1,279 @@
+"""
+Stress test of the SQLite concurrency profile, as several Gunicorn workers would load it.
+
+Each worker process runs threads that play quiz sessions back to back: create the session,
+upload answers (one short write each), save their scores (the pipeline's write), and read
+the session and questions pages in between. No provider is called, so the database is the
+only shared resource. The same load is run with the profile disabled (rollback journal,
+default pool and driver settings) and enabled, at 1 and --workers processes, and the
+throughput, latencies and "database is locked" errors are reported.
+
+A second check opens a long read transaction, like a slow page or an export, and times a
+commit made meanwhile by another connection. With the rollback journal the commit must wait
+for the reader to finish, so sessions serialize behind reads; in WAL mode it goes through.
+
+A third runs writer threads next to reader connections that keep read transactions open
+(100 ms each, one after the other), and reports both throughputs and their lock errors. The
+first run only reads between writes, so it barely differs between both settings; this one
+shows whether writers still serialize behind readers.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--workers 4] [--threads 4] [--seconds 10]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ANSWERS_PER_SESSION = 5
+
+def _p95(values):
+    return statistics.quantiles(values, n=20)[-1] if len(values) >= 2 else (values[0] if values else 0.0)
+
+def _play_sessions(app, deadline, seed):
+    """Plays sessions until the deadline. Returns (sessions, write latencies, read latencies, lock errors)."""
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from quiz_app import db
+    from quiz_app.models import Question, QuizSession, Answer, QuestionStats
+    from quiz_app.pipeline import save_answer_results
+
+    rng = random.Random(seed)
+    sessions, writes, reads, errors = 0, [], [], 0
+    with app.app_context():
+        question_ids = [row[0] for row in db.session.query(Question.id)]
+        while time.monotonic() < deadline:
+            try:
+                start = time.perf_counter()
+                quiz_session = QuizSession(config='{}')
+                db.session.add(quiz_session)
+                db.session.commit()
+                writes.append(time.perf_counter() - start)
+
+                answer_ids = []
+                for question_id in rng.sample(question_ids, ANSWERS_PER_SESSION):
+                    start = time.perf_counter()
+                    answer = Answer(session_id=quiz_session.id, question_id=question_id, duration=rng.uniform(2, 30))
+                    db.session.add(answer)
+                    db.session.commit()
+                    writes.append(time.perf_counter() - start)
+                    answer_ids.append(answer.id)
+
+                    # The quiz and sessions pages are read while other sessions write
+                    start = time.perf_counter()
+                    db.session.query(QuizSession.id, func.count(Answer.id), func.avg(Answer.score))\
+                        .outerjoin(Answer, QuizSession.id == Answer.session_id)\
+                        .group_by(QuizSession.id).order_by(QuizSession.start_time.desc()).limit(50).all()
+                    db.session.query(Question, QuestionStats)\
+                        .join(QuestionStats, Question.id == QuestionStats.question_id).all()
+                    db.session.commit()
+                    reads.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                save_answer_results([
+                    {"answer_id": answer_id, "answer_text": "answer", "score": rng.randint(1, 5), "justification": "ok"}
+                    for answer_id in answer_ids
+                ])
+                writes.append(time.perf_counter() - start)
+                sessions += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                errors += 1
+    return sessions, writes, reads, errors
+
+def _worker(database_url, profile_enabled, threads, deadline, seed, results):
+    import concurrent.futures
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE_ENABLED'] = 'true' if profile_enabled else 'false'
+    from quiz_app import create_app
+    app = create_app()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        outcomes = list(executor.map(lambda i: _play_sessions(app, deadline, seed * 100 + i), range(threads)))
+    results.put(outcomes)
+
+def run(database_url, profile_enabled, workers, threads, seconds):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    # Leave time for the interpreters to start, so that the workers run at the same time
+    deadline = time.monotonic() + 5 + seconds
+    processes = [context.Process(target=_worker, args=(database_url, profile_enabled, threads, deadline, seed, results))
+                 for seed in range(workers)]
+    for process in processes:
+        process.start()
+    outcomes = [outcome for _ in processes for outcome in results.get()]
+    for process in processes:
+        process.join()
+
+    sessions = sum(outcome[0] for outcome in outcomes)
+    writes = [latency for outcome in outcomes for latency in outcome[1]]
+    reads = [latency for outcome in outcomes for latency in outcome[2]]
+    errors = sum(outcome[3] for outcome in outcomes)
+    return sessions / seconds, _p95(writes), _p95(reads), errors
+
+def _commit_during_read(database_url, profile_enabled, hold_seconds, results):
+    import sqlite3
+    import threading
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE_ENABLED'] = 'true' if profile_enabled else 'false'
+    from quiz_app import create_app, db
+    from quiz_app.models import QuizSession
+    app = create_app()
+
+    reading = threading.Event()
+    def _read():
+        reader = sqlite3.connect(database_url[len('sqlite:///'):], isolation_level=None)
+        reader.execute('BEGIN')
+        reader.execute('SELECT count(*) FROM answer').fetchall()
+        reading.set()
+        time.sleep(hold_seconds)
+        reader.execute('COMMIT')
+        reader.close()
+    thread = threading.Thread(target=_read)
+    thread.start()
+    reading.wait()
+
+    with app.app_context():
+        start = time.perf_counter()
+        db.session.add(QuizSession(config='{}'))
+        db.session.commit()
+        results.put(time.perf_counter() - start)
+    thread.join()
+
+def commit_during_read(database_url, profile_enabled, hold_seconds=1.0):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_commit_during_read, args=(database_url, profile_enabled, hold_seconds, results))
+    process.start()
+    latency = results.get()
+    process.join()
+    return latency
+
+def _mixed_load(database_url, profile_enabled, writers, readers, seconds, read_hold, results):
+    import sqlite3
+    import threading
+    from sqlalchemy.exc import OperationalError
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE_ENABLED'] = 'true' if profile_enabled else 'false'
+    from quiz_app import create_app, db
+    from quiz_app.models import QuizSession
+    app = create_app()
+    # The readers wait for locks as long as the app's connections do: 5 s is the driver's default
+    timeout = app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('connect_args', {}).get('timeout', 5.0) \
+        if profile_enabled else 5.0
+    counts = {'writes': 0, 'reads': 0, 'write_errors': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def _count(name):
+        with lock:
+            counts[name] += 1
+
+    def _write():
+        with app.app_context():
+            while time.monotonic() < deadline:
+                try:
+                    db.session.add(QuizSession(config='{}'))
+                    db.session.commit()
+                    _count('writes')
+                except OperationalError as e:
+                    db.session.rollback()
+                    if 'locked' not in str(e):
+                        raise
+                    _count('write_errors')
+
+    def _read():
+        # A page or an export that reads in one transaction and takes `read_hold` to render
+        reader = sqlite3.connect(database_url[len('sqlite:///'):], timeout=timeout, isolation_level=None)
+        while time.monotonic() < deadline:
+            try:
+                reader.execute('BEGIN')
+                reader.execute('SELECT count(*), avg(score) FROM answer').fetchall()
+                time.sleep(read_hold)
+                reader.execute('SELECT count(*) FROM quiz_session').fetchall()
+                reader.execute('COMMIT')
+                _count('reads')
+            except sqlite3.OperationalError as e:
+                if reader.in_transaction:
+                    reader.execute('ROLLBACK')
+                if 'locked' not in str(e):
+                    raise
+                _count('read_errors')
+        reader.close()
+
+    threads = [threading.Thread(target=_write) for _ in range(writers)]
+    threads += [threading.Thread(target=_read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(counts)
+
+def mixed_load(database_url, profile_enabled, writers, readers, seconds, read_hold=0.1):
+    """
+    Runs writer threads committing small sessions next to reader connections holding read
+    transactions. Returns (writes/s, reads/s, write lock errors, read lock errors).
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_mixed_load, args=(database_url, profile_enabled, writers, readers, seconds, read_hold, results))
+    process.start()
+    counts = results.get()
+    process.join()
+    return counts['writes'] / seconds, counts['reads'] / seconds, counts['write_errors'], counts['read_errors']
+
+def prepare(database_url, profile_enabled):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE_ENABLED'] = 'true' if profile_enabled else 'false'
+    from quiz_app import create_app
+    from quiz_app.commands import init_database, ingest_questions
+    app = create_app()
+    with app.app_context():
+        init_database()
+        ingest_questions()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help="Worker processes, like Gunicorn workers")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker")
+    parser.add_argument('--seconds', type=float, default=10, help="Duration of each run")
+    args = parser.parse_args()
+
+    blocked_commits = {}
+    mixed = {}
+    print(f"{'profile':>8} {'workers':>7} {'sessions/s':>10} {'p95 write ms':>12} {'p95 read ms':>11} {'locked':>6}")
+    for profile_enabled in (False, True):
+        for workers in sorted({1, args.workers}):
+            with tempfile.TemporaryDirectory() as tmp:
+                database_url = f"sqlite:///{os.path.join(tmp, 'quiz.db')}"
+                # Each run prepares its own database in a separate process, so the journal
+                # mode it leaves behind (WAL is persistent) cannot leak into the next run
+                context = multiprocessing.get_context('spawn')
+                process = context.Process(target=prepare, args=(database_url, profile_enabled))
+                process.start()
+                process.join()
+                throughput, write_p95, read_p95, errors = run(database_url, profile_enabled, workers, args.threads, args.seconds)
+                if workers == 1:
+                    blocked_commits[profile_enabled] = commit_during_read(database_url, profile_enabled)
+                    mixed[profile_enabled] = mixed_load(database_url, profile_enabled, args.threads, args.threads, args.seconds)
+            print(f"{'on' if profile_enabled else 'off':>8} {workers:>7} {throughput:>10.1f} "
+                  f"{write_p95 * 1000:>12.1f} {read_p95 * 1000:>11.1f} {errors:>6}")
+
+    print("\nCommit while another connection holds a 1 s read transaction:")
+    for profile_enabled, latency in blocked_commits.items():
+        print(f"  profile {'on' if profile_enabled else 'off':>3}: {latency * 1000:.0f} ms")
+
+    print(f"\n{args.threads} writers next to {args.threads} readers holding 100 ms read transactions:")
+    print(f"{'profile':>8} {'writes/s':>9} {'reads/s':>8} {'write locked':>12} {'read locked':>11}")
+    for profile_enabled, (writes, reads, write_errors, read_errors) in mixed.items():
+        print(f"{'on' if profile_enabled else 'off':>8} {writes:>9.1f} {reads:>8.1f} {write_errors:>12} {read_errors:>11}")
+
+if __name__ == '__main__':
+    main()
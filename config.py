@@ -31,6 +31,28 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(DB_DIR, "quiz.db")}')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite concurrency profile (see quiz_app/sqlite_profile.py), so that several Gunicorn
+    # workers, the answer pipeline and job workers can share the database file
+    SQLITE_PROFILE_ENABLED = os.environ.get("SQLITE_PROFILE_ENABLED", "true").lower() == "true"
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 15000)) # Milliseconds a writer waits for the lock
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)) # Bytes
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024)) # Pages, or KiB when negative
+    SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", 10))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.environ.get("SQLITE_POOL_MAX_OVERFLOW", 20))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get("SQLITE_POOL_TIMEOUT", 30)) # Seconds to wait for a free connection
+
+    # SQL query count and time of each request, in the X-DB-Query-Count, X-DB-Time-Ms and
+    # Server-Timing headers (see quiz_app/instrumentation.py). SQL_QUERY_LOG also prints them,
+    # with the statements of the requests that run more than SQL_QUERY_LOG_THRESHOLD queries
+    SQL_INSTRUMENTATION_ENABLED = os.environ.get("SQL_INSTRUMENTATION_ENABLED", "true").lower() == "true"
+    SQL_QUERY_LOG = os.environ.get("SQL_QUERY_LOG", "false").lower() == "true"
+    SQL_QUERY_LOG_THRESHOLD = int(os.environ.get("SQL_QUERY_LOG_THRESHOLD", 20))
+
+    # Sessions read per batch by the bulk export (/export and `flask export`)
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 200))
+
     # Deepgram API Configuration
     DEEPGRAM_API_KEY = os.environ.get('DEEPGRAM_API_KEY')
     DEEPGRAM_MODEL = os.environ.get('DEEPGRAM_MODEL', 'nova-3')
@@ -41,6 +63,11 @@ class Config:
 
     # OpenRouter LLM Configuration
     OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
+    OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL") # Any OpenAI-compatible endpoint, defaults to OpenRouter
+
+    # "two_step": REASONING_MODEL writes the justification, then STRUCTURED_OUTPUT_MODEL scores it.
+    # "single": REASONING_MODEL returns the justification and the score in one structured output call.
+    EVALUATION_MODE = os.environ.get("EVALUATION_MODE", "two_step")
     
     # Model for generating the detailed, human-like evaluation
     REASONING_MODEL = os.environ.get("REASONING_MODEL", "google/gemini-2.5-pro")
@@ -53,18 +80,74 @@ class Config:
     STRUCTURED_OUTPUT_TEMPERATURE = float(os.environ.get("STRUCTURED_OUTPUT_TEMPERATURE", 0))
     STRUCTURED_OUTPUT_TOP_K = int(os.environ.get("STRUCTURED_OUTPUT_TOP_K", 1))
 
+    # Cache of evaluations, keyed by question, normalized answer, duration, models and prompts
+    EVALUATION_CACHE_ENABLED = os.environ.get("EVALUATION_CACHE_ENABLED", "true").lower() == "true"
+    EVALUATION_CACHE_TTL = int(os.environ.get("EVALUATION_CACHE_TTL", 30 * 24 * 3600)) # in seconds, 0 = no expiry
+    EVALUATION_CACHE_MAX_ENTRIES = int(os.environ.get("EVALUATION_CACHE_MAX_ENTRIES", 10000)) # 0 = unbounded
+
+    # Cache of transcripts, keyed by audio content hash, STT provider, model and language
+    TRANSCRIPTION_CACHE_ENABLED = os.environ.get("TRANSCRIPTION_CACHE_ENABLED", "true").lower() == "true"
+
     # Optional context for prompts, loaded from files
     REASONING_CONTEXT_USER = _read_file_content(os.environ.get("REASONING_CONTEXT_USER"))
     REASONING_CONTEXT_SYSTEM = _read_file_content(os.environ.get("REASONING_CONTEXT_SYSTEM"))
     STRUCTURED_CONTEXT_USER = _read_file_content(os.environ.get("STRUCTURED_CONTEXT_USER"))
     STRUCTURED_CONTEXT_SYSTEM = _read_file_content(os.environ.get("STRUCTURED_CONTEXT_SYSTEM"))
 
+    # Answer pipeline: 'pipelined' starts transcription and evaluation as soon as an answer
+    # is uploaded, 'queue' hands each stage to the durable job queue processed by `flask worker`,
+    # 'deferred' processes the whole session when the results page is opened
+    PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "pipelined")
+    # Seconds /results waits for in-flight answers before processing the rest itself (unset = no limit)
+    PIPELINE_WAIT_TIMEOUT = float(os.environ["PIPELINE_WAIT_TIMEOUT"]) if os.environ.get("PIPELINE_WAIT_TIMEOUT") else None
+
+    # Streaming upload: the recorder sends a chunk every STREAMING_CHUNK_INTERVAL milliseconds,
+    # transcribed live by providers that support it (Deepgram)
+    STREAMING_UPLOAD_ENABLED = os.environ.get("STREAMING_UPLOAD_ENABLED", "true").lower() == "true"
+    STREAMING_CHUNK_INTERVAL = int(os.environ.get("STREAMING_CHUNK_INTERVAL", 1000))
+    STREAMING_STT_PROVIDER = os.environ.get("STREAMING_STT_PROVIDER") # Overrides the user's choice, e.g. "local" for the offline stand-in
+    STREAMING_FINISH_TIMEOUT = float(os.environ.get("STREAMING_FINISH_TIMEOUT", 15)) # Seconds to wait for the live transcript
+    STREAMING_IDLE_TIMEOUT = int(os.environ.get("STREAMING_IDLE_TIMEOUT", 300)) # Abandoned streams are dropped after this
+
+    # Durable job queue (PIPELINE_MODE=queue)
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 300)) # Visibility timeout of a claimed job
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", 5)) # Base of the exponential retry backoff, in seconds
+    JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", 32)) # Jobs in flight per worker process
+
+    # Maximum number of concurrent calls per external provider, shared by everything in a process
+    PROVIDER_CONCURRENCY_DEEPGRAM = int(os.environ.get("PROVIDER_CONCURRENCY_DEEPGRAM", 16))
+    PROVIDER_CONCURRENCY_MISTRAL = int(os.environ.get("PROVIDER_CONCURRENCY_MISTRAL", 8))
+    PROVIDER_CONCURRENCY_OPENROUTER = int(os.environ.get("PROVIDER_CONCURRENCY_OPENROUTER", 32))
+    PROVIDER_CONCURRENCY_SPEECHIFY = int(os.environ.get("PROVIDER_CONCURRENCY_SPEECHIFY", 8))
+    # Maximum number of calls per second per provider, unset for no limit
+    PROVIDER_RATE_LIMIT_DEEPGRAM = os.environ.get("PROVIDER_RATE_LIMIT_DEEPGRAM")
+    PROVIDER_RATE_LIMIT_MISTRAL = os.environ.get("PROVIDER_RATE_LIMIT_MISTRAL")
+    PROVIDER_RATE_LIMIT_OPENROUTER = os.environ.get("PROVIDER_RATE_LIMIT_OPENROUTER")
+    PROVIDER_RATE_LIMIT_SPEECHIFY = os.environ.get("PROVIDER_RATE_LIMIT_SPEECHIFY")
+
     # Directory for questions
     QUESTIONS_DIR = os.environ.get("QUESTIONS_DIR", os.path.join(BASE_DIR, 'data', 'questions'))
 
     # Speechify TTS Configuration
     SPEECHIFY_API_TOKEN = os.environ.get('SPEECHIFY_API_TOKEN')
+    # Audio generated under question ids before the content-addressed store, only read by `flask publish-tts-assets`
     TTS_AUDIO_DIR = os.environ.get("TTS_AUDIO_DIR", os.path.join(BASE_DIR, 'quiz_app', 'static', 'audio', 'tts'))
+    # Format of the question audio: "mp3", "ogg" (Opus), "aac" or "wav". Speechify returns it
+    # directly; imported files in another format are transcoded (ffmpeg). Part of the audio keys.
+    TTS_AUDIO_FORMAT = os.environ.get("TTS_AUDIO_FORMAT", "mp3")
+    # The question audio store, files named by their content hash and served by /tts/<name>
+    TTS_ASSET_DIR = os.environ.get("TTS_ASSET_DIR", os.path.join(BASE_DIR, 'quiz_app', 'tts_assets'))
+    # Questions per chunk of the background audio generation; progress is saved after each chunk
+    TTS_BATCH_CHUNK_SIZE = int(os.environ.get("TTS_BATCH_CHUNK_SIZE", 32))
+    # Language of the translated audio published under question ids, which schema migration 3
+    # moves to the content-addressed store. It was the alt language of the last generation.
+    TTS_LEGACY_ALT_LANGUAGE = os.environ.get("TTS_LEGACY_ALT_LANGUAGE", "en")
+    # Questions translated per LLM request, within an estimated token budget (input and output) per request.
+    # Requests are made per chunk, so TTS_BATCH_CHUNK_SIZE caps it too. TRANSLATION_BATCH_MAX_ITEMS=1
+    # translates them one by one.
+    TRANSLATION_BATCH_MAX_ITEMS = int(os.environ.get("TRANSLATION_BATCH_MAX_ITEMS", 50))
+    TRANSLATION_BATCH_TOKEN_BUDGET = int(os.environ.get("TRANSLATION_BATCH_TOKEN_BUDGET", 4000))
 
     # JWT & Authentication Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'a_default_jwt_secret_key')
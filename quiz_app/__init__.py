@@ -2,7 +2,6 @@ from flask import Flask, request, redirect, url_for, g, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity
 import os
-import markdown
 from jinja2 import pass_context
 from markupsafe import Markup
 
@@ -28,15 +27,30 @@ def create_app():
         pass
 
     # Initialize extensions with the app
+    from . import sqlite_profile
+    sqlite_profile.init_app(app)
     db.init_app(app)
     jwt.init_app(app)
 
+    # Per-provider concurrency limits for the shared async client layer
+    from . import providers
+    providers.init_app(app)
+
+    # Cache hits counted in memory are written when the process exits
+    from . import cache_store
+    cache_store.init_app(app)
+
     # Custom Markdown filter
     @app.template_filter('markdown')
     @pass_context
     def markdown_filter(context, value):
+        import markdown
         return Markup(markdown.markdown(value, extensions=['fenced_code']))
 
+    # SQL query count and time of each request, registered first so that every query is counted
+    from . import instrumentation
+    instrumentation.init_app(app)
+
     @app.before_request
     def before_request_hook():
         # The login page and static files should be accessible without a JWT
@@ -54,18 +68,23 @@ def create_app():
         from . import routes
         from . import auth
         from .models import Question # Import models here
-        
-        # Create database tables for our models
-        db.create_all()
 
-        # Load questions into the database
-        from .quiz_logic import load_questions_from_json
-        questions_dir = app.config.get('QUESTIONS_DIR')
-        if questions_dir:
-            load_questions_from_json(questions_dir)
+        # WAL, busy timeout and cache settings on every SQLite connection
+        sqlite_profile.register_pragmas(db.engine, app.config)
+        instrumentation.register_engine_events(db.engine)
+
+        # Keep the per-question statistics in sync with the answers
+        from . import question_stats
+
+        # Creating the tables and loading the questions is left to `flask init-db` and
+        # `flask ingest` (see commands.py), so that starting a worker does no database work
 
         # Register blueprints
         app.register_blueprint(routes.main_bp)
         app.register_blueprint(auth.auth_bp)
 
+        # Register CLI commands (e.g. `flask worker`, `flask init-db`)
+        from .commands import register_commands
+        register_commands(app)
+
         return app
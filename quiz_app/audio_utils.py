@@ -1,10 +1,29 @@
-from pydub import AudioSegment
-from pydub.exceptions import CouldntDecodeError
+import struct
+import wave
+
+# Matroska/WebM element IDs used to find the duration, see https://www.matroska.org/technical/elements.html
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+CLUSTER = 0x1F43B675
+CLUSTER_TIMESTAMP = 0xE7
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+SIMPLE_BLOCK = 0xA3
+
+# Master elements whose children are scanned. Every other element is skipped over,
+# so the parser never has to know where a master element of unknown size ends.
+EBML_SCANNED_MASTERS = {SEGMENT, INFO, CLUSTER, BLOCK_GROUP}
 
 def get_audio_duration(file_path):
     """
-    Calculates the duration of an audio file in seconds using pydub.
-    This supports multiple formats, including WAV and WebM.
+    Calculates the duration of an audio file in seconds.
+
+    WebM/Matroska and WAV files are measured from their container metadata, without
+    decoding any audio. Other formats, and files the native readers cannot make sense of,
+    are decoded with pydub (ffmpeg).
 
     Args:
         file_path (str): The path to the audio file.
@@ -12,6 +31,30 @@ def get_audio_duration(file_path):
     Returns:
         The duration of the audio file in seconds (float), or 0.0 if an error occurs.
     """
+    try:
+        duration = probe_duration(file_path)
+        if duration:
+            return duration
+    except Exception as e:
+        print(f"Could not read the duration of {file_path} from its headers, decoding it instead: {e}")
+    return _decode_duration(file_path)
+
+def probe_duration(file_path):
+    """Returns the duration in seconds read from the container, or None if the format is not supported."""
+    with open(file_path, "rb") as f:
+        header = f.read(12)
+        f.seek(0)
+        if header[:4] == EBML_HEADER.to_bytes(4, 'big'):
+            return _ebml_duration(f)
+        if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+            with wave.open(f) as wav:
+                return wav.getnframes() / float(wav.getframerate())
+    return None
+
+def _decode_duration(file_path):
+    # pydub is only needed for the formats the native readers do not support
+    from pydub import AudioSegment
+    from pydub.exceptions import CouldntDecodeError
     try:
         audio = AudioSegment.from_file(file_path)
         duration = len(audio) / 1000.0  # pydub measures in milliseconds
@@ -22,3 +65,91 @@ def get_audio_duration(file_path):
     except Exception as e:
         print(f"Could not calculate duration for {file_path}: {e}")
         return 0.0
+
+def _read_vint(f, keep_marker):
+    """
+    Reads an EBML variable-length integer. Returns (value, is_unknown), or (None, False) at
+    the end of the file. Element IDs keep their length marker bit, element sizes do not.
+    """
+    first = f.read(1)
+    if not first:
+        return None, False
+    first = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError("Invalid EBML variable-length integer")
+
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None, False
+    value = first if keep_marker else first & (mask - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    # A size with all its value bits set means "unknown", as written by live encoders
+    is_unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, is_unknown
+
+def _ebml_duration(f):
+    """
+    Reads the duration of a WebM/Matroska file.
+
+    Uses the Duration element of the segment info when present. Browsers' MediaRecorder
+    writes it without one and with clusters of unknown size, so otherwise the clusters are
+    scanned: the duration runs from the first block to the last one, plus one block duration.
+    """
+    timestamp_scale = 1000000 # nanoseconds per timestamp unit
+    info_duration = None
+    cluster_timestamp = 0
+    first_timestamp = None
+    last_timestamp = None
+    last_gap = 0
+
+    while True:
+        element_id, _ = _read_vint(f, keep_marker=True)
+        if element_id is None:
+            break
+        size, size_unknown = _read_vint(f, keep_marker=False)
+        if size is None:
+            break
+
+        if element_id == CLUSTER and info_duration:
+            break # The segment info is complete, no need to scan the blocks
+        if element_id in EBML_SCANNED_MASTERS:
+            continue # Read the children in place
+
+        if size_unknown:
+            raise ValueError(f"Element 0x{element_id:X} of unknown size cannot be skipped")
+
+        if element_id == TIMESTAMP_SCALE:
+            timestamp_scale = int.from_bytes(f.read(size), 'big')
+        elif element_id == DURATION:
+            data = f.read(size)
+            info_duration = struct.unpack('>f' if size == 4 else '>d', data)[0]
+        elif element_id == CLUSTER_TIMESTAMP:
+            cluster_timestamp = int.from_bytes(f.read(size), 'big')
+        elif element_id in (SIMPLE_BLOCK, BLOCK):
+            start = f.tell()
+            _read_vint(f, keep_marker=False) # Track number
+            relative = f.read(2)
+            if len(relative) < 2:
+                break # Truncated file, keep what was read so far
+            timestamp = cluster_timestamp + struct.unpack('>h', relative)[0]
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if last_timestamp is not None and timestamp > last_timestamp:
+                last_gap = timestamp - last_timestamp
+            last_timestamp = timestamp if last_timestamp is None else max(last_timestamp, timestamp)
+            f.seek(start + size)
+        else:
+            f.seek(size, 1)
+
+    if info_duration:
+        return info_duration * timestamp_scale / 1e9
+    if last_timestamp is None:
+        return None
+    # The last block lasts about as long as the gap before it
+    return (last_timestamp - first_timestamp + last_gap) * timestamp_scale / 1e9
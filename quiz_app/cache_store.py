@@ -0,0 +1,87 @@
+import atexit
+import datetime
+import threading
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from . import db
+
+# Cache hits of this process not written yet, by model then primary key: (count, last use).
+# They are written with the next entry stored, and when the process exits, so that a lookup
+# never writes to the database. Hits of a process that is killed are lost: the counts, which
+# only inform the LRU eviction, are approximate.
+_pending_hits = {}
+_pending_hits_lock = threading.Lock()
+
+def _key_clause(model, key):
+    """The WHERE clause of the row of `model` with primary key `key`, a tuple for composite keys."""
+    columns = db.inspect(model).primary_key
+    values = key if isinstance(key, tuple) else (key,)
+    return [column == value for column, value in zip(columns, values)]
+
+def record_hit(model, key):
+    """Counts a hit of the cache entry of `model` with primary key `key`, in memory."""
+    with _pending_hits_lock:
+        hits = _pending_hits.setdefault(model, {})
+        count, _ = hits.get(key, (0, None))
+        hits[key] = (count + 1, datetime.datetime.utcnow())
+
+def write_pending_hits(model):
+    """Adds the hits counted since the last write to the entries of `model`. The caller commits."""
+    with _pending_hits_lock:
+        hits = _pending_hits.pop(model, {})
+    for key, (count, last_used_at) in hits.items():
+        db.session.execute(
+            update(model).where(*_key_clause(model, key))
+            .values(hits=model.hits + count, last_used_at=last_used_at)
+            .execution_options(synchronize_session=False)
+        )
+
+def upsert(model, values, update_columns):
+    """
+    Inserts a cache entry, or sets `update_columns` of the entry with the same primary key.
+    SQLite and PostgreSQL do it in one statement, so that concurrent writers of the same key
+    do not collide. Other databases get a select then an insert or update, which the caller
+    runs in a savepoint: a concurrent insert of the same key then fails that write only.
+    """
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(model).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in db.inspect(model).primary_key],
+            set_={name: statement.excluded[name] for name in update_columns}
+        )
+        db.session.execute(statement)
+        return
+
+    key = tuple(values[column.key] for column in db.inspect(model).primary_key)
+    key_clause = _key_clause(model, key)
+    if db.session.execute(select(*db.inspect(model).primary_key).where(*key_clause)).first() is None:
+        db.session.execute(insert(model).values(**values))
+    else:
+        db.session.execute(
+            update(model).where(*key_clause)
+            .values({name: values[name] for name in update_columns})
+            .execution_options(synchronize_session=False)
+        )
+
+def _write_hits_at_exit(app):
+    with _pending_hits_lock:
+        pending = bool(_pending_hits)
+    if not pending:
+        return
+    with app.app_context():
+        try:
+            for model in list(_pending_hits):
+                write_pending_hits(model)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Could not write the cache hits: {e}")
+
+def init_app(app):
+    """Writes the hits still pending when the process exits."""
+    atexit.register(_write_hits_at_exit, app)
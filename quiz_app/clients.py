@@ -0,0 +1,148 @@
+import os
+import atexit
+import threading
+import httpx
+from .providers import is_loop_running, run_sync
+
+OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+
+# Keep-alive pool settings shared by every provider client
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+
+# Process-wide registry of provider clients, keyed by (provider, model, params).
+# Entries are {'client': ..., 'close': [...]} where 'close' lists the pools to shut down.
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+class _SharedAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    An async transport that survives the `async with httpx.AsyncClient(...)` blocks of SDKs
+    which create a client per request (Deepgram), so their connections stay in our pool.
+    """
+    async def __aexit__(self, *args):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        await super().aclose()
+
+def _openrouter_client(model, temperature=None, api_key=None, max_retries=3, reasoning=None, base_url=None):
+    from langchain.globals import set_verbose
+    from langchain_openai import ChatOpenAI
+    # Suppress the verbose warning by setting the global verbosity flag
+    set_verbose(False)
+    http_client = httpx.Client(limits=POOL_LIMITS, timeout=None)
+    http_async_client = httpx.AsyncClient(limits=POOL_LIMITS, timeout=None)
+    options = {}
+    if reasoning is not None:
+        options['extra_body'] = {"reasoning": {"enable": reasoning}}
+    client = ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        openai_api_key=api_key,
+        openai_api_base=base_url or OPENROUTER_API_BASE,
+        default_headers={
+            "HTTP-Referer": "http://localhost",
+            "X-Title": "AI Quizzer"
+        },
+        max_retries=max_retries,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        **options
+    )
+    return client, [http_client, http_async_client]
+
+def _mistral_client(model, api_key=None):
+    from mistralai import Mistral
+    http_client = httpx.Client(limits=POOL_LIMITS, follow_redirects=True)
+    http_async_client = httpx.AsyncClient(limits=POOL_LIMITS, follow_redirects=True)
+    client = Mistral(api_key=api_key, client=http_client, async_client=http_async_client)
+    return client, [http_client, http_async_client]
+
+def _deepgram_client(model, api_key=None):
+    from deepgram import DeepgramClient
+    return DeepgramClient(api_key), []
+
+def _deepgram_transport(model):
+    # Passed to each Deepgram request, see stt_deepgram.transcribe_audio_async()
+    transport = _SharedAsyncTransport(limits=POOL_LIMITS)
+    return transport, [transport]
+
+def _speechify_client(model, token=None):
+    client = httpx.AsyncClient(
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        },
+        limits=POOL_LIMITS,
+        timeout=120
+    )
+    return client, [client]
+
+FACTORIES = {
+    'openrouter': _openrouter_client,
+    'mistral': _mistral_client,
+    'deepgram': _deepgram_client,
+    'deepgram-transport': _deepgram_transport,
+    'speechify': _speechify_client,
+}
+
+def get_client(provider, model=None, **params):
+    """
+    Returns the shared client for a provider, creating it on first use.
+
+    Clients are keyed by (provider, model, params) and reused by every thread and by the
+    provider event loop, so connections stay warm between calls. Params must be hashable.
+    """
+    global _clients_pid
+    key = (provider, model, tuple(sorted(params.items())))
+    with _clients_lock:
+        # Pools inherited from a parent process must not be shared with it
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        entry = _clients.get(key)
+        if entry is None:
+            client, pools = FACTORIES[provider](model, **params)
+            entry = {'client': client, 'close': pools}
+            _clients[key] = entry
+        return entry['client']
+
+async def _close_async_pools(pools):
+    for pool in pools:
+        if isinstance(pool, _SharedAsyncTransport):
+            await pool.close_pool()
+        else:
+            await pool.aclose()
+
+def close_clients():
+    """Closes every pooled connection. Called when the process exits."""
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            return
+        entries = list(_clients.values())
+        _clients.clear()
+
+    sync_pools, async_pools = [], []
+    for entry in entries:
+        for pool in entry['close']:
+            (sync_pools if isinstance(pool, httpx.Client) else async_pools).append(pool)
+
+    for pool in sync_pools:
+        try:
+            pool.close()
+        except Exception as e:
+            print(f"Error closing HTTP client: {e}")
+    if async_pools:
+        # Async pools belong to the provider loop and must be closed on it
+        try:
+            if is_loop_running():
+                run_sync(_close_async_pools(async_pools), timeout=5)
+        except Exception as e:
+            print(f"Error closing async HTTP clients: {e}")
+
+atexit.register(close_clients)
@@ -0,0 +1,160 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+def init_database():
+    """Creates the missing tables, applies the pending migrations and builds the statistics if needed."""
+    from . import db
+    from .migrations import run_migrations
+    from .question_stats import ensure_question_stats
+    db.create_all()
+    # Bring tables created by an earlier version up to date
+    run_migrations()
+    ensure_question_stats()
+
+def ingest_questions():
+    """Loads the question files of QUESTIONS_DIR into the database."""
+    from .quiz_logic import load_questions_from_json
+    questions_dir = current_app.config.get('QUESTIONS_DIR')
+    if questions_dir:
+        load_questions_from_json(questions_dir)
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Creates or upgrades the database schema."""
+    init_database()
+    click.echo("Database initialized.")
+
+@click.command('ingest')
+@with_appcontext
+def ingest_command():
+    """Loads new and changed question files into the database."""
+    ingest_questions()
+
+@click.command('worker')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to wait when the queue is empty.')
+@click.option('--concurrency', type=int, default=None, help='Maximum number of jobs in flight (default: JOB_WORKER_CONCURRENCY).')
+@click.option('--once', is_flag=True, help='Exit as soon as the queue is empty.')
+@with_appcontext
+def worker_command(poll_interval, concurrency, once):
+    """Runs a worker that processes the durable job queue."""
+    from .jobs import run_worker
+    from .clients import close_clients
+    from . import pipeline  # Registers the answer pipeline job handlers
+    from . import tts_batch  # Registers the audio generation job handler
+    try:
+        run_worker(poll_interval=poll_interval, once=once, concurrency=concurrency)
+    finally:
+        close_clients()
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recomputes the per-question statistics from all the answers."""
+    from .question_stats import rebuild_question_stats
+    count = rebuild_question_stats()
+    click.echo(f"Statistics rebuilt for {count} questions.")
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Applies the pending schema migrations."""
+    from .migrations import run_migrations, MIGRATIONS
+    applied = run_migrations()
+    if not applied:
+        click.echo(f"The schema is up to date ({len(MIGRATIONS)} migrations applied).")
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Checks that the hot queries use their indexes, with EXPLAIN QUERY PLAN."""
+    from .migrations import check_query_plans
+    failures = 0
+    for description, index_name, plan, uses_index in check_query_plans():
+        click.echo(f"{'OK  ' if uses_index else 'FAIL'} {description} (expects {index_name})")
+        for line in plan:
+            click.echo(f"       {line}")
+        failures += not uses_index
+    if failures:
+        raise click.ClickException(f"{failures} queries do not use their index.")
+
+@click.command('check-query-budgets')
+@with_appcontext
+def check_query_budgets_command():
+    """Checks that the main pages run no more SQL queries than their budget."""
+    from .instrumentation import check_query_budgets
+    failures = 0
+    for description, url, budget, count, statements in check_query_budgets(current_app):
+        click.echo(f"{'OK  ' if statements is None else 'FAIL'} {description} ({url}): {count} queries, budget {budget}")
+        for statement in statements or []:
+            click.echo(f"       {statement}")
+        failures += statements is not None
+    if failures:
+        raise click.ClickException(f"{failures} pages run more queries than their budget.")
+
+@click.command('export')
+@click.option('--output', '-o', default='-', show_default=True, help="Output file, '-' for the standard output (NDJSON only).")
+@click.option('--format', 'export_format', type=click.Choice(['ndjson', 'parquet']), default='ndjson', show_default=True,
+              help="ndjson: one line per session with its answers; parquet: one row per answer (requires pyarrow).")
+@click.option('--batch-size', type=int, default=None, help='Sessions read per batch (default: EXPORT_BATCH_SIZE).')
+@click.option('--date-from', default=None, help='Only the sessions started on or after this ISO date.')
+@click.option('--date-to', default=None, help='Only the sessions started before this ISO date (a bare date is included).')
+@with_appcontext
+def export_command(output, export_format, batch_size, date_from, date_to):
+    """Exports all the sessions and their answers, streamed in batches."""
+    from .export import iter_ndjson, write_parquet
+    from .pagination import parse_date, PaginationError
+    try:
+        date_from = parse_date(date_from)
+        date_to = parse_date(date_to, end_of_day=True)
+    except PaginationError as e:
+        raise click.BadParameter(str(e))
+    batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 200)
+
+    if export_format == 'parquet':
+        if output == '-':
+            raise click.BadParameter("The Parquet export needs an --output file.")
+        try:
+            rows = write_parquet(output, batch_size, date_from, date_to)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Exported {rows} answers to {output}.", err=True)
+        return
+
+    with click.open_file(output, 'w', encoding='utf-8') as f:
+        for chunk in iter_ndjson(batch_size, date_from, date_to):
+            f.write(chunk)
+
+@click.command('publish-tts-assets')
+@click.option('--alt-language', default=None, help='Language of the translated files (question_<id>.alt.*) to import too.')
+@click.option('--force', is_flag=True, help='Import again the audio the store already has.')
+@with_appcontext
+def publish_tts_assets_command(alt_language, force):
+    """Imports the audio and translations generated under question ids into the store."""
+    from .tts_assets import import_legacy_files
+    audio, translations = import_legacy_files(alt_language=alt_language, force=force)
+    click.echo(f"Imported {audio} audio files and {translations} translations.")
+
+@click.command('gc-store')
+@click.option('--dry-run', is_flag=True, help='Only count what would be deleted.')
+@with_appcontext
+def gc_store_command(dry_run):
+    """Deletes the stored translations, audio and files no current question uses."""
+    from .tts_assets import collect_garbage
+    translations, audio, files = collect_garbage(dry_run=dry_run)
+    verb = "Would delete" if dry_run else "Deleted"
+    click.echo(f"{verb} {translations} translations, {audio} audio entries and {files} files.")
+
+def register_commands(app):
+    """Registers the `flask` CLI commands of the application."""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(ingest_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(check_query_budgets_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(publish_tts_assets_command)
+    app.cli.add_command(gc_store_command)
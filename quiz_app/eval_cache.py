@@ -0,0 +1,162 @@
+import json
+import asyncio
+import hashlib
+import datetime
+import unicodedata
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from . import db
+from .cache_store import record_hit, write_pending_hits, upsert
+from .models import EvaluationCache
+from .evaluation import evaluate_answer, evaluate_answer_async, stream_evaluation_async, format_duration, EVALUATION_PROMPT_VERSION
+from .providers import iterate_sync
+
+# Configuration entries that change the outcome of an evaluation
+EVALUATION_CONFIG_KEYS = (
+    'EVALUATION_MODE',
+    'OPENROUTER_BASE_URL', # The same model names may be other models at another endpoint
+    'REASONING_MODEL',
+    'REASONING_TEMPERATURE',
+    'STRUCTURED_OUTPUT_MODEL',
+    'STRUCTURED_OUTPUT_TEMPERATURE',
+    'REASONING_CONTEXT_USER',
+    'REASONING_CONTEXT_SYSTEM',
+    'STRUCTURED_CONTEXT_USER',
+    'STRUCTURED_CONTEXT_SYSTEM',
+)
+
+def normalize_answer_text(text):
+    """Normalizes Unicode and whitespace so that trivially different transcripts share an entry."""
+    return " ".join(unicodedata.normalize('NFC', text or "").split())
+
+def evaluation_cache_key(question_digest, answer_text, duration, config):
+    """
+    Hashes everything that influences an evaluation: the question, the normalized answer,
+    the duration as shown to the models, the endpoint, the models, their temperatures and
+    the prompts.
+    """
+    material = {
+        'version': EVALUATION_PROMPT_VERSION,
+        'question': question_digest,
+        'answer': normalize_answer_text(answer_text),
+        # The prompts only see the duration rounded to the second, so that is the bucket
+        'duration': format_duration(duration),
+        'config': {name: config.get(name) for name in EVALUATION_CONFIG_KEYS},
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def _is_enabled():
+    return current_app.config.get('EVALUATION_CACHE_ENABLED', True)
+
+def get_cached_evaluation(key):
+    """Returns the cached evaluation for a key, or None if it is missing or expired. Never writes nor commits."""
+    if not _is_enabled():
+        return None
+    entry = EvaluationCache.query.get(key)
+    if entry is None:
+        return None
+
+    ttl = current_app.config.get('EVALUATION_CACHE_TTL')
+    if ttl and entry.created_at < datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl):
+        return None # Deleted by the next eviction
+
+    # Counted in memory, see cache_store.py
+    record_hit(EvaluationCache, key)
+    return {"score": entry.score, "justification": entry.justification}
+
+def store_evaluation(key, result, commit=True):
+    """
+    Caches a successful evaluation and evicts the least recently used entries beyond the limit.
+    The cache is only an optimisation: a failed write is logged and rolled back on its own,
+    and never fails the caller. With `commit=False`, the write is left to be committed with
+    the caller's changes.
+    """
+    if not _is_enabled() or not result.get("score"):
+        return # Failed evaluations (score 0) must be retried, not cached
+
+    now = datetime.datetime.utcnow()
+    # An upsert, since identical answers evaluated at the same time store the same key
+    values = dict(
+        key=key,
+        score=result["score"],
+        justification=result["justification"],
+        hits=0,
+        created_at=now,
+        last_used_at=now
+    )
+    try:
+        with db.session.begin_nested():
+            upsert(EvaluationCache, values, ['score', 'justification', 'created_at', 'last_used_at'])
+            # Before the LRU eviction, which orders by last use
+            write_pending_hits(EvaluationCache)
+            evict_expired_evaluations()
+        if commit:
+            db.session.commit()
+    except SQLAlchemyError as e:
+        print(f"Could not cache the evaluation: {e}")
+        if commit:
+            db.session.rollback()
+
+def evict_expired_evaluations():
+    """Deletes expired entries and trims the cache to EVALUATION_CACHE_MAX_ENTRIES. The caller commits."""
+    ttl = current_app.config.get('EVALUATION_CACHE_TTL')
+    if ttl:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)
+        EvaluationCache.query.filter(EvaluationCache.created_at < cutoff).delete(synchronize_session=False)
+
+    max_entries = current_app.config.get('EVALUATION_CACHE_MAX_ENTRIES')
+    if max_entries:
+        excess = EvaluationCache.query.count() - max_entries
+        if excess > 0:
+            oldest = db.session.query(EvaluationCache.key).order_by(EvaluationCache.last_used_at).limit(excess)
+            EvaluationCache.query.filter(EvaluationCache.key.in_(oldest)).delete(synchronize_session=False)
+
+def evaluate_answer_cached(question, answer_text, config, duration=None, bypass=False):
+    """
+    Evaluates an answer to a Question, reusing the cached result when nothing that
+    influences it has changed. With `bypass`, the models are always called and the
+    fresh result replaces the cached one.
+    """
+    key = evaluation_cache_key(question.digest, answer_text, duration, config)
+    if not bypass:
+        cached = get_cached_evaluation(key)
+        if cached is not None:
+            return cached
+
+    result = evaluate_answer(question.question_text, answer_text, question.category, config, duration)
+    store_evaluation(key, result)
+    return result
+
+def stream_evaluation_cached(question, answer_text, config, duration=None, bypass=False):
+    """
+    Streaming variant of evaluate_answer_cached(), yielding the events of
+    evaluation.stream_evaluation_async(). A cache hit yields the final result only.
+    """
+    key = evaluation_cache_key(question.digest, answer_text, duration, config)
+    if not bypass:
+        cached = get_cached_evaluation(key)
+        if cached is not None:
+            yield 'result', cached
+            return
+
+    events = stream_evaluation_async(question.question_text, answer_text, question.category, config, duration)
+    for event, data in iterate_sync(events):
+        if event == 'result':
+            store_evaluation(key, data)
+        yield event, data
+
+def _in_app_context(app, func, *args):
+    with app.app_context():
+        return func(*args)
+
+async def evaluate_answer_cached_async(app, question_digest, question_text, answer_text, category, config, duration=None):
+    """Async variant of evaluate_answer_cached() for code running on the provider loop."""
+    key = evaluation_cache_key(question_digest, answer_text, duration, config)
+    cached = await asyncio.to_thread(_in_app_context, app, get_cached_evaluation, key)
+    if cached is not None:
+        return cached
+
+    result = await evaluate_answer_async(question_text, answer_text, category, config, duration)
+    await asyncio.to_thread(_in_app_context, app, store_evaluation, key, result)
+    return result
@@ -1,12 +1,12 @@
 import json
-from langchain.globals import set_verbose
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from pydantic import BaseModel, Field
+from .providers import limit, run_sync
+from .clients import get_client
 
-# Suppress the verbose warning by setting the global verbosity flag
-set_verbose(False)
+# LangChain and pydantic are imported by the functions that need them, so that importing this
+# module, and starting the app, does not load them before the first evaluation.
+
+# Bump when the prompts below change, so that cached evaluations are not reused
+EVALUATION_PROMPT_VERSION = 1
 
 def format_duration(seconds):
     """Formats duration in seconds to a 'X min Y sec' string."""
@@ -18,114 +18,228 @@ def format_duration(seconds):
         return f"{minutes} min {remaining_seconds} sec"
     return f"{remaining_seconds} sec"
 
-# Define the desired JSON structure for the score
-class QuizGrade(BaseModel):
-    score: int = Field(description="The score from 1 to 5, where 1 is poor and 5 is excellent.")
-
-def get_openrouter_client(model_name, temperature, top_k, api_key, max_retries):
-    """Helper function to create a ChatOpenAI client for OpenRouter."""
-    return ChatOpenAI(
-        model=model_name,
+def get_openrouter_client(model_name, temperature, top_k, api_key, max_retries, base_url=None):
+    """Helper function to get the shared ChatOpenAI client for OpenRouter."""
+    params = {}
+    if base_url:
+        params['base_url'] = base_url
+    return get_client(
+        'openrouter',
+        model_name,
         temperature=temperature,
-        openai_api_key=api_key,
-        openai_api_base="https://openrouter.ai/api/v1",
-        default_headers={
-            "HTTP-Referer": "http://localhost", 
-            "X-Title": "AI Quizzer"
-        },
-        max_retries=max_retries
+        api_key=api_key,
+        max_retries=max_retries,
+        **params
     )
 
-def evaluate_answer(question, answer, category, config, duration=None):
+async def evaluate_answer_async(question, answer, category, config, duration=None, callbacks=None):
     """
-    Evaluates a user's answer using a two-step LLM process via OpenRouter.
-    1. A reasoning model generates a detailed justification.
-    2. A structured output model provides a score based on the justification.
+    Evaluates a user's answer using OpenRouter, in the mode set by EVALUATION_MODE:
+    - 'two_step' (default): a reasoning model writes the justification, then a structured
+      output model scores it. Two sequential calls.
+    - 'single': the reasoning model returns the justification and the score in one
+      structured output call.
+
+    `callbacks` are passed to the LangChain calls, e.g. to collect token usage.
     """
     try:
         api_key = config.get('OPENROUTER_API_KEY')
         if not api_key:
             return {"score": 0, "justification": "Error: OPENROUTER_API_KEY not configured."}
 
-        # --- Step 1: Get detailed justification from the reasoning model ---
-        reasoning_client = get_openrouter_client(
-            config['REASONING_MODEL'],
-            config['REASONING_TEMPERATURE'],
-            config['REASONING_TOP_K'],
-            api_key,
-            config.get('OPENROUTER_MAX_RETRIES', 3)
+        run_config = {"callbacks": callbacks} if callbacks else None
+        if config.get('EVALUATION_MODE') == 'single':
+            return await _evaluate_single(question, answer, category, config, duration, run_config)
+        return await _evaluate_two_step(question, answer, category, config, duration, run_config)
+
+    except Exception as e:
+        print(f"Error during evaluation: {e}")
+        return {
+            "score": 0,
+            "justification": f"An error occurred during evaluation: {e}"
+        }
+
+def _reasoning_chain(config, duration):
+    """Step 1 of the two-step mode: the reasoning model writes the justification."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    reasoning_client = get_openrouter_client(
+        config['REASONING_MODEL'],
+        config['REASONING_TEMPERATURE'],
+        config['REASONING_TOP_K'],
+        config.get('OPENROUTER_API_KEY'),
+        config.get('OPENROUTER_MAX_RETRIES', 3),
+        config.get('OPENROUTER_BASE_URL')
+    )
+    
+    reasoning_context_system = config.get("REASONING_CONTEXT_SYSTEM", "")
+    reasoning_context_user = config.get("REASONING_CONTEXT_USER", "")
+
+    formatted_duration = format_duration(duration)
+
+    reasoning_prompt_text = f"""{reasoning_context_system}
+        You are an expert evaluator in the field of {{category}}. Your task is to provide a detailed, constructive critique of a user's answer to a quiz question.
+        
+        Category: {{category}}
+        Question: "{{question}}"
+        User's Answer: "{{answer}}"
+        Answer Duration: {formatted_duration}
+        
+        {reasoning_context_user}
+        
+        Please provide a clear rationale for why the answer is correct, partially correct, or incorrect. Be encouraging but accurate.
+        Do not assign a score, only provide the written justification."""
+    
+    reasoning_prompt = ChatPromptTemplate.from_template(reasoning_prompt_text)
+    
+    return reasoning_prompt | reasoning_client | StrOutputParser()
+
+def _scoring_chain(config, duration):
+    """Step 2 of the two-step mode: the structured output model scores the justification."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from .evaluation_schemas import QuizGrade
+    structured_client = get_openrouter_client(
+        config['STRUCTURED_OUTPUT_MODEL'],
+        config['STRUCTURED_OUTPUT_TEMPERATURE'],
+        config['STRUCTURED_OUTPUT_TOP_K'],
+        config.get('OPENROUTER_API_KEY'),
+        config.get('OPENROUTER_MAX_RETRIES', 3),
+        config.get('OPENROUTER_BASE_URL')
+    ).with_structured_output(QuizGrade)
+
+    structured_context_system = config.get("STRUCTURED_CONTEXT_SYSTEM", "")
+    structured_context_user = config.get("STRUCTURED_CONTEXT_USER", "")
+
+    formatted_duration = format_duration(duration)
+
+    scoring_prompt_text = f"""{structured_context_system}
+        You are a strict but fair judge. Based on the following quiz question, the user's answer, and a detailed evaluation, please assign a score from 1 to 5.
+        
+        Category: {{category}}
+        Question: "{{question}}"
+        User's Answer: "{{answer}}"
+        Answer Duration: {formatted_duration}
+        Evaluation: "{{justification}}"
+        
+        {structured_context_user}
+        
+        Provide only the score from 1 to 5 in the required JSON format."""
+        
+    scoring_prompt = ChatPromptTemplate.from_template(scoring_prompt_text)
+    
+    return scoring_prompt | structured_client
+
+async def _evaluate_two_step(question, answer, category, config, duration, run_config):
+    inputs = {
+        "question": question,
+        "answer": answer,
+        "category": category
+    }
+
+    # --- Step 1: Get detailed justification from the reasoning model ---
+    async with limit('openrouter'):
+        justification = await _reasoning_chain(config, duration).ainvoke(inputs, config=run_config)
+
+    # --- Step 2: Get a structured score based on the justification ---
+    async with limit('openrouter'):
+        grade = await _scoring_chain(config, duration).ainvoke(
+            {**inputs, "justification": justification}, config=run_config
         )
+
+    return {
+        "score": grade.score,
+        "justification": justification
+    }
+
+async def _evaluate_single(question, answer, category, config, duration, run_config):
+    from langchain_core.prompts import ChatPromptTemplate
+    from .evaluation_schemas import QuizEvaluation
+    evaluation_client = get_openrouter_client(
+        config['REASONING_MODEL'],
+        config['REASONING_TEMPERATURE'],
+        config['REASONING_TOP_K'],
+        config.get('OPENROUTER_API_KEY'),
+        config.get('OPENROUTER_MAX_RETRIES', 3),
+        config.get('OPENROUTER_BASE_URL')
+    ).with_structured_output(QuizEvaluation)
+
+    # Both sets of contexts apply, since this call does the work of the two steps
+    context_system = "\n".join(filter(None, [config.get("REASONING_CONTEXT_SYSTEM"), config.get("STRUCTURED_CONTEXT_SYSTEM")]))
+    context_user = "\n".join(filter(None, [config.get("REASONING_CONTEXT_USER"), config.get("STRUCTURED_CONTEXT_USER")]))
+
+    formatted_duration = format_duration(duration)
+
+    evaluation_prompt_text = f"""{context_system}
+        You are an expert evaluator in the field of {{category}}, strict but fair. Your task is to provide a detailed, constructive critique of a user's answer to a quiz question, then score it.
         
-        reasoning_context_system = config.get("REASONING_CONTEXT_SYSTEM", "")
-        reasoning_context_user = config.get("REASONING_CONTEXT_USER", "")
-
-        formatted_duration = format_duration(duration)
-
-        reasoning_prompt_text = f"""{reasoning_context_system}
-            You are an expert evaluator in the field of {{category}}. Your task is to provide a detailed, constructive critique of a user's answer to a quiz question.
-            
-            Category: {{category}}
-            Question: "{{question}}"
-            User's Answer: "{{answer}}"
-            Answer Duration: {formatted_duration}
-            
-            {reasoning_context_user}
-            
-            Please provide a clear rationale for why the answer is correct, partially correct, or incorrect. Be encouraging but accurate.
-            Do not assign a score, only provide the written justification."""
+        Category: {{category}}
+        Question: "{{question}}"
+        User's Answer: "{{answer}}"
+        Answer Duration: {formatted_duration}
         
-        reasoning_prompt = ChatPromptTemplate.from_template(reasoning_prompt_text)
+        {context_user}
         
-        reasoning_chain = reasoning_prompt | reasoning_client | StrOutputParser()
-        justification = reasoning_chain.invoke({
+        First write a clear rationale for why the answer is correct, partially correct, or incorrect. Be encouraging but accurate.
+        Then assign a score from 1 to 5 consistent with that rationale. Reply in the required JSON format."""
+
+    evaluation_prompt = ChatPromptTemplate.from_template(evaluation_prompt_text)
+
+    evaluation_chain = evaluation_prompt | evaluation_client
+    async with limit('openrouter'):
+        evaluation = await evaluation_chain.ainvoke({
             "question": question,
             "answer": answer,
             "category": category
-        })
-
-        # --- Step 2: Get a structured score based on the justification ---
-        structured_client = get_openrouter_client(
-            config['STRUCTURED_OUTPUT_MODEL'],
-            config['STRUCTURED_OUTPUT_TEMPERATURE'],
-            config['STRUCTURED_OUTPUT_TOP_K'],
-            api_key,
-            config.get('OPENROUTER_MAX_RETRIES', 3)
-        ).with_structured_output(QuizGrade)
-
-        structured_context_system = config.get("STRUCTURED_CONTEXT_SYSTEM", "")
-        structured_context_user = config.get("STRUCTURED_CONTEXT_USER", "")
-
-        scoring_prompt_text = f"""{structured_context_system}
-            You are a strict but fair judge. Based on the following quiz question, the user's answer, and a detailed evaluation, please assign a score from 1 to 5.
-            
-            Category: {{category}}
-            Question: "{{question}}"
-            User's Answer: "{{answer}}"
-            Answer Duration: {formatted_duration}
-            Evaluation: "{{justification}}"
-            
-            {structured_context_user}
-            
-            Provide only the score from 1 to 5 in the required JSON format."""
-            
-        scoring_prompt = ChatPromptTemplate.from_template(scoring_prompt_text)
-        
-        scoring_chain = scoring_prompt | structured_client
-        grade = scoring_chain.invoke({
-            "justification": justification,
+        }, config=run_config)
+
+    return {
+        "score": evaluation.score,
+        "justification": evaluation.justification
+    }
+
+async def stream_evaluation_async(question, answer, category, config, duration=None):
+    """
+    Streaming variant of evaluate_answer_async(). Yields ('token', text) events while the
+    reasoning model writes the justification, then a final ('result', {"score", "justification"}).
+
+    In 'single' mode the justification only exists once the structured output is complete,
+    so it arrives as a single token event right before the result.
+    """
+    try:
+        if not config.get('OPENROUTER_API_KEY'):
+            yield 'result', {"score": 0, "justification": "Error: OPENROUTER_API_KEY not configured."}
+            return
+
+        if config.get('EVALUATION_MODE') == 'single':
+            result = await _evaluate_single(question, answer, category, config, duration, None)
+            yield 'token', result["justification"]
+            yield 'result', result
+            return
+
+        inputs = {
             "question": question,
             "answer": answer,
             "category": category
-        })
-
-        return {
-            "score": grade.score,
-            "justification": justification
         }
+        chunks = []
+        async with limit('openrouter'):
+            async for chunk in _reasoning_chain(config, duration).astream(inputs):
+                chunks.append(chunk)
+                yield 'token', chunk
+        justification = "".join(chunks)
+
+        async with limit('openrouter'):
+            grade = await _scoring_chain(config, duration).ainvoke({**inputs, "justification": justification})
+
+        yield 'result', {"score": grade.score, "justification": justification}
 
     except Exception as e:
         print(f"Error during evaluation: {e}")
-        return {
+        yield 'result', {
             "score": 0,
             "justification": f"An error occurred during evaluation: {e}"
         }
+
+def evaluate_answer(question, answer, category, config, duration=None, callbacks=None):
+    """Synchronous wrapper around evaluate_answer_async()."""
+    return run_sync(evaluate_answer_async(question, answer, category, config, duration, callbacks))
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+# Define the desired JSON structure for the score
+class QuizGrade(BaseModel):
+    score: int = Field(description="The score from 1 to 5, where 1 is poor and 5 is excellent.")
+
+# JSON structure of the single-call mode. The justification comes first so that the model
+# writes its rationale before settling on a score.
+class QuizEvaluation(BaseModel):
+    justification: str = Field(description="A clear, constructive rationale for why the answer is correct, partially correct, or incorrect.")
+    score: int = Field(description="The score from 1 to 5, where 1 is poor and 5 is excellent.")
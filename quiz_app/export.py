@@ -0,0 +1,117 @@
+import json
+from itertools import groupby
+from . import db
+from .models import QuizSession, Answer, Question
+
+# Columns of the flat, one row per answer, export (Parquet)
+ANSWER_COLUMNS = [
+    'session_id', 'session_start_time', 'answer_id', 'question_id', 'category', 'question_text',
+    'answer_text', 'score', 'justification', 'duration', 'timestamp',
+]
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def session_record(quiz_session, answers):
+    """The export of a session, with its answers given as rows of session_answer_rows()."""
+    return {
+        "session_id": quiz_session.id,
+        "start_time": _isoformat(quiz_session.start_time),
+        "config": quiz_session.config,
+        "answers": [{
+            "question_id": answer.question_id,
+            "question_text": answer.question_text,
+            "category": answer.category,
+            "answer_text": answer.answer_text,
+            "score": answer.score,
+            "justification": answer.justification,
+            "duration": answer.duration,
+            "timestamp": _isoformat(answer.timestamp),
+        } for answer in answers]
+    }
+
+def session_answer_rows(session_ids):
+    """The answers of some sessions with their question's text and category, by session then id."""
+    return db.session.query(
+        Answer.id, Answer.session_id, Answer.question_id, Question.question_text, Question.category,
+        Answer.answer_text, Answer.score, Answer.justification, Answer.duration, Answer.timestamp
+    ).join(Question, Answer.question_id == Question.id)\
+        .filter(Answer.session_id.in_(session_ids))\
+        .order_by(Answer.session_id, Answer.id).all()
+
+def iter_session_batches(batch_size, date_from=None, date_to=None):
+    """
+    Yields the sessions, oldest id first, in batches of `batch_size` as lists of
+    (session, answer rows). Each batch is two short queries: a keyset page of sessions
+    and their answers. Nothing is kept from one batch to the next, so memory does not
+    depend on the size of the history, and no read transaction stays open between batches.
+    """
+    last_id = 0
+    while True:
+        query = db.session.query(QuizSession.id, QuizSession.start_time, QuizSession.config)\
+            .filter(QuizSession.id > last_id)
+        if date_from:
+            query = query.filter(QuizSession.start_time >= date_from)
+        if date_to:
+            query = query.filter(QuizSession.start_time < date_to)
+        sessions = query.order_by(QuizSession.id).limit(batch_size).all()
+        if not sessions:
+            return
+        answers_by_session = {
+            session_id: list(rows)
+            for session_id, rows in groupby(session_answer_rows([s.id for s in sessions]), key=lambda row: row.session_id)
+        }
+        # End the read transaction before the batch is written out
+        db.session.commit()
+        yield [(s, answers_by_session.get(s.id, [])) for s in sessions]
+        last_id = sessions[-1].id
+
+def iter_ndjson(batch_size, date_from=None, date_to=None):
+    """The export as NDJSON: one line per session, in the format of /export_session."""
+    for batch in iter_session_batches(batch_size, date_from, date_to):
+        yield "".join(json.dumps(session_record(s, answers)) + "\n" for s, answers in batch)
+
+def answer_columns(batch):
+    """A batch of iter_session_batches() as columns of ANSWER_COLUMNS, one row per answer."""
+    columns = {name: [] for name in ANSWER_COLUMNS}
+    for quiz_session, answers in batch:
+        for answer in answers:
+            columns['session_id'].append(quiz_session.id)
+            columns['session_start_time'].append(quiz_session.start_time)
+            columns['answer_id'].append(answer.id)
+            for name in ANSWER_COLUMNS[3:]:
+                columns[name].append(getattr(answer, name))
+    return columns
+
+def write_parquet(path, batch_size, date_from=None, date_to=None):
+    """
+    Writes the answers, one row per answer, to a Parquet file, a row group per batch.
+    Requires pyarrow, which is optional. Returns the number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The Parquet export requires pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        ('session_id', pa.int64()),
+        ('session_start_time', pa.timestamp('us')),
+        ('answer_id', pa.int64()),
+        ('question_id', pa.int64()),
+        ('category', pa.string()),
+        ('question_text', pa.string()),
+        ('answer_text', pa.string()),
+        ('score', pa.int64()),
+        ('justification', pa.string()),
+        ('duration', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_session_batches(batch_size, date_from, date_to):
+            table = pa.Table.from_pydict(answer_columns(batch), schema=schema)
+            if table.num_rows:
+                writer.write_table(table)
+                rows += table.num_rows
+    return rows
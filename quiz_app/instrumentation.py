@@ -0,0 +1,139 @@
+import time
+import contextlib
+import contextvars
+from flask import g, request
+from sqlalchemy import event
+
+# The recorders of the queries run in the current context (request, command or test),
+# innermost last. Each one is a dict: {"count": ..., "seconds": ..., "statements": [...]}.
+_recorders = contextvars.ContextVar('sql_query_recorders', default=())
+
+def new_recorder():
+    return {"count": 0, "seconds": 0.0, "statements": []}
+
+@contextlib.contextmanager
+def record_queries():
+    """Records the SQL statements run in the block, by this thread or task. Yields the recorder."""
+    recorder = new_recorder()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+@contextlib.contextmanager
+def assert_max_queries(max_count):
+    """
+    Fails with an AssertionError listing the statements when the block runs more than
+    `max_count` SQL queries. Used to keep endpoints within their query budget, e.g.:
+
+        with assert_max_queries(5):
+            client.get(f'/session/{session_id}')
+    """
+    with record_queries() as recorder:
+        yield recorder
+    if recorder["count"] > max_count:
+        statements = "\n".join(f"  {statement}" for statement in recorder["statements"])
+        raise AssertionError(f"{recorder['count']} queries run, at most {max_count} expected:\n{statements}")
+
+def register_engine_events(engine):
+    """Times the statements run by the engine and adds them to the active recorders."""
+
+    # The start time is kept on the execution context, which is dropped with the statement,
+    # so a statement that raises leaves nothing behind to skew the next timings
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_start_time
+        for recorder in _recorders.get():
+            recorder["count"] += 1
+            recorder["seconds"] += elapsed
+            recorder["statements"].append(" ".join(statement.split()))
+
+def init_app(app):
+    """
+    Counts and times the SQL queries of each request, and reports them in the X-DB-Query-Count,
+    X-DB-Time-Ms and Server-Timing response headers. With SQL_QUERY_LOG, a line is also printed
+    for each request, with its statements when there are more than SQL_QUERY_LOG_THRESHOLD.
+    Must be called before the other before_request hooks, so that their queries are counted.
+    """
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED'):
+        return
+
+    @app.before_request
+    def _start_recording():
+        g.sql_recorder = new_recorder()
+        g.sql_recorder_token = _recorders.set(_recorders.get() + (g.sql_recorder,))
+
+    @app.after_request
+    def _report_queries(response):
+        recorder = g.get('sql_recorder')
+        if recorder is None:
+            return response
+        milliseconds = recorder["seconds"] * 1000
+        response.headers['X-DB-Query-Count'] = str(recorder["count"])
+        response.headers['X-DB-Time-Ms'] = f"{milliseconds:.1f}"
+        response.headers.add('Server-Timing', f'db;dur={milliseconds:.1f};desc="{recorder["count"]} queries"')
+        if app.config.get('SQL_QUERY_LOG'):
+            print(f"[sql] {request.method} {request.path} -> {response.status_code}: "
+                  f"{recorder['count']} queries, {milliseconds:.1f} ms")
+            if recorder["count"] > app.config.get('SQL_QUERY_LOG_THRESHOLD', 20):
+                for statement in recorder["statements"]:
+                    print(f"[sql]   {statement}")
+        return response
+
+    @app.teardown_request
+    def _stop_recording(exc):
+        token = g.pop('sql_recorder_token', None)
+        if token is not None:
+            try:
+                _recorders.reset(token)
+            except ValueError:
+                # Torn down in another context than the one the request started in
+                pass
+
+def _query_budgets(session_id, question_id):
+    """
+    The pages whose number of queries must not grow with the data, with their budget. Run on
+    the session and question with the most answers, an N+1 pattern goes over the budget.
+    """
+    return [
+        ('session results', f'/session/{session_id}', 5),
+        ('session export', f'/export_session/{session_id}', 3),
+        ('question details', f'/question/{question_id}', 5),
+        ('question history', f'/api/questions/{question_id}/history', 3),
+        ('sessions page', '/api/sessions', 3),
+        ('questions page', '/api/questions', 3),
+        ('questions metrics', '/questions', 6),
+        ('categories', '/categories', 3),
+    ]
+
+def check_query_budgets(app):
+    """
+    Requests the pages of _query_budgets() with a test client, within assert_max_queries().
+    Returns a list of (description, url, budget, queries run, statements or None when within budget).
+    """
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func
+    from . import db
+    from .models import Answer
+
+    busiest = lambda column: db.session.query(column).group_by(column).order_by(func.count().desc()).limit(1).scalar()
+    session_id = busiest(Answer.session_id) or 0
+    question_id = busiest(Answer.question_id) or 0
+    client = app.test_client()
+    client.set_cookie('access_token_cookie', create_access_token(identity="user", expires_delta=False))
+
+    results = []
+    for description, url, budget in _query_budgets(session_id, question_id):
+        try:
+            with assert_max_queries(budget) as recorder:
+                client.get(url)
+            statements = None
+        except AssertionError:
+            statements = recorder["statements"]
+        results.append((description, url, budget, recorder["count"], statements))
+    return results
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import signal
+import socket
+import datetime
+import concurrent.futures
+from flask import current_app
+from . import db
+from .models import Job
+from .providers import submit
+
+# Handlers registered with @job_handler, keyed by job kind
+HANDLERS = {}
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+def job_handler(kind, on_failure=None):
+    """
+    Registers a function as the handler for a kind of job.
+
+    The handler is called with the claimed Job in the worker's main thread, inside an
+    application context. It returns None when there is nothing left to do, or a tuple
+    `(awaitable, apply)`: the awaitable makes the remote calls on the provider event loop,
+    then `apply(result)` writes the outcome to the database back in the main thread.
+    Raising from the handler or from `apply` signals a failure. `on_failure(job, error)`
+    is called once the job has exhausted its attempts.
+    """
+    def decorator(func):
+        HANDLERS[kind] = {'run': func, 'on_failure': on_failure}
+        return func
+    return decorator
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+def enqueue(kind, answer_id=None, payload=None, max_attempts=None, commit=True):
+    """Adds a job to the queue. Web requests only ever enqueue; `flask worker` does the work."""
+    job = Job(
+        kind=kind,
+        answer_id=answer_id,
+        payload=json.dumps(payload) if payload is not None else None,
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 3),
+        run_after=_utcnow()
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    return job
+
+def get_payload(job):
+    """Returns the decoded payload of a job."""
+    return json.loads(job.payload) if job.payload else {}
+
+def _claimable(now):
+    """Pending jobs that are due, and running jobs whose lease expired with attempts left."""
+    return db.or_(
+        db.and_(Job.status == 'pending', Job.run_after <= now),
+        db.and_(Job.status == 'running', Job.lease_expires_at < now, Job.attempts < Job.max_attempts)
+    )
+
+def claim_jobs(limit=1, lease_seconds=None):
+    """
+    Atomically claims up to `limit` jobs for this worker.
+
+    Claiming is a single UPDATE so concurrent workers never receive the same job.
+    A claimed job stays invisible to other workers until its lease expires.
+    """
+    _reap_exhausted_jobs()
+
+    now = _utcnow()
+    lease_seconds = lease_seconds or current_app.config.get('JOB_LEASE_SECONDS', 300)
+    token = uuid.uuid4().hex
+    eligible = db.select(Job.id).where(_claimable(now)).order_by(Job.id).limit(limit)
+
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id.in_(eligible))
+        .values(
+            status='running',
+            lease_token=token,
+            lease_expires_at=now + datetime.timedelta(seconds=lease_seconds),
+            attempts=Job.attempts + 1,
+            updated_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    jobs = Job.query.filter_by(lease_token=token).order_by(Job.id).all()
+    for job in jobs:
+        job.claimed_token = token
+    return jobs
+
+def _held_token(job):
+    # The token of this worker's claim. job.lease_token is loaded again from the database
+    # after each commit, and is then the token of whichever worker holds the job now.
+    return getattr(job, 'claimed_token', None) or job.lease_token
+
+def extend_lease(job, lease_seconds=None):
+    """Pushes back the visibility timeout of a job that is still being worked on."""
+    lease_seconds = lease_seconds or current_app.config.get('JOB_LEASE_SECONDS', 300)
+    updated = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job.id, Job.lease_token == _held_token(job))
+        .values(lease_expires_at=_utcnow() + datetime.timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return updated == 1
+
+def complete_job(job, commit=True):
+    """
+    Marks a job as done, provided this worker still holds its lease. Returns False when it
+    does not: the lease expired and another worker claimed the job again.
+    """
+    updated = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job.id, Job.lease_token == _held_token(job))
+        .values(status='done', lease_token=None, lease_expires_at=None, updated_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if commit:
+        db.session.commit()
+    return updated == 1
+
+def _commit_if_leased(job):
+    """
+    Completes a job in the transaction holding the changes it made, so that they are only
+    committed if this worker still holds its lease. Otherwise another worker claimed the job
+    again after the lease expired, and it is that worker's result that counts.
+    """
+    if not complete_job(job, commit=False):
+        db.session.rollback()
+        print(f"Job {job.id} ({job.kind}) lost its lease, its result is discarded.")
+        return False
+    db.session.commit()
+    return True
+
+def fail_job(job, error):
+    """Schedules a retry with exponential backoff, or marks the job as failed for good."""
+    db.session.rollback()
+    now = _utcnow()
+    if job.attempts < job.max_attempts:
+        retry_delay = current_app.config.get('JOB_RETRY_DELAY', 5) * (2 ** (job.attempts - 1))
+        values = dict(status='pending', run_after=now + datetime.timedelta(seconds=retry_delay))
+    else:
+        values = dict(status='failed')
+
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id == job.id, Job.lease_token == _held_token(job))
+        .values(lease_token=None, lease_expires_at=None, last_error=str(error), updated_at=now, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    if values['status'] == 'failed':
+        _run_failure_hook(job, error)
+
+def _run_failure_hook(job, error):
+    handler = HANDLERS.get(job.kind)
+    if handler and handler['on_failure']:
+        try:
+            handler['on_failure'](job, error)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failure hook for job {job.id} raised: {e}")
+
+def _reap_exhausted_jobs():
+    """Fails jobs whose worker died while running their last attempt."""
+    exhausted = Job.query.filter(
+        Job.status == 'running',
+        Job.lease_expires_at < _utcnow(),
+        Job.attempts >= Job.max_attempts
+    ).all()
+    for job in exhausted:
+        fail_job(job, f"Lease expired after {job.attempts} attempts.")
+
+def _start_job(job):
+    """Prepares a claimed job. Returns `(future, apply)`, or None when the job is already settled."""
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        fail_job(job, f"No handler registered for job kind '{job.kind}'.")
+        return None
+    try:
+        prepared = handler['run'](job)
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}/{job.max_attempts}: {e}")
+        fail_job(job, e)
+        return None
+    if prepared is None:
+        _commit_if_leased(job)
+        return None
+    awaitable, apply = prepared
+    return submit(awaitable), apply
+
+def _finish_job(job, future, apply):
+    """Applies the result of a job whose remote calls are done and records the outcome."""
+    try:
+        apply(future.result())
+        return _commit_if_leased(job)
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}/{job.max_attempts}: {e}")
+        fail_job(job, e)
+        return False
+
+def run_worker(poll_interval=1.0, once=False, concurrency=None):
+    """
+    Claims and runs jobs until stopped with SIGINT/SIGTERM.
+
+    Up to `concurrency` jobs are in flight at once: their remote calls run concurrently on
+    the provider event loop while this thread claims jobs and writes results.
+    With `once`, returns once the queue is drained: no job in flight and none left to claim,
+    including the jobs queued by those it ran.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    concurrency = concurrency or current_app.config.get('JOB_WORKER_CONCURRENCY', 32)
+    lease_refresh_interval = current_app.config.get('JOB_LEASE_SECONDS', 300) / 3
+    stopping = {'value': False}
+
+    def _stop(signum, frame):
+        print(f"Worker {worker_id} stopping after the jobs in flight...")
+        stopping['value'] = True
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    in_flight = {}
+    last_lease_refresh = time.monotonic()
+
+    print(f"Worker {worker_id} started (concurrency: {concurrency}).")
+    while True:
+        claimed = []
+        if not stopping['value'] and len(in_flight) < concurrency:
+            claimed = claim_jobs(limit=concurrency - len(in_flight))
+            for job in claimed:
+                started = _start_job(job)
+                if started:
+                    future, apply = started
+                    in_flight[future] = (job, apply)
+
+        if not in_flight:
+            # Jobs settled while being claimed (e.g. from a cache) may have queued their next
+            # stage, so the queue is only drained once a claim comes back empty
+            if stopping['value'] or (once and not claimed):
+                break
+            if not claimed:
+                time.sleep(poll_interval)
+            continue
+
+        done, _ = concurrent.futures.wait(
+            list(in_flight), timeout=poll_interval, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            job, apply = in_flight.pop(future)
+            _finish_job(job, future, apply)
+
+        # Keep the jobs that are still running invisible to the other workers
+        if time.monotonic() - last_lease_refresh > lease_refresh_interval:
+            for job, _ in in_flight.values():
+                extend_lease(job)
+            last_lease_refresh = time.monotonic()
+    print(f"Worker {worker_id} stopped.")
+
+def has_active_jobs(answer_ids):
+    """Returns the subset of answer ids that still have pending or running jobs."""
+    if not answer_ids:
+        return set()
+    rows = db.session.query(Job.answer_id).filter(
+        Job.answer_id.in_(answer_ids),
+        Job.status.in_(ACTIVE_STATUSES)
+    ).distinct().all()
+    return {row[0] for row in rows}
@@ -0,0 +1,167 @@
+import os
+import datetime
+from sqlalchemy import inspect, func, desc, select
+from . import db
+from .models import Answer, Question, QuizSession, QuestionStats, SchemaMigration, TtsAsset
+
+def create_index(connection, model, name):
+    """Creates an index declared on the model, if it does not exist yet."""
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(connection, checkfirst=True)
+
+def add_column(connection, model, name):
+    """Adds a column declared on the model to its table, if it does not exist yet."""
+    table = model.__table__
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    if name in existing:
+        return
+    column = table.columns[name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{name}" {column_type}')
+
+def _add_query_indexes(connection):
+    create_index(connection, Answer, 'ix_answer_session_id_timestamp')
+    create_index(connection, Answer, 'ix_answer_question_id_timestamp')
+    create_index(connection, Question, 'ix_question_category')
+    create_index(connection, QuizSession, 'ix_quiz_session_start_time')
+
+def _add_question_stats_sort_indexes(connection):
+    create_index(connection, QuestionStats, 'ix_question_stats_attempts')
+    create_index(connection, QuestionStats, 'ix_question_stats_avg_score')
+    create_index(connection, QuestionStats, 'ix_question_stats_max_score')
+    create_index(connection, QuestionStats, 'ix_question_stats_last_answered_at')
+
+def _rekey_tts_assets(connection):
+    """
+    Moves the assets keyed by question id and variant, which served stale audio once ids were
+    reassigned, to keys computed from the content: the current text of the question with that
+    id, or for 'alt' its translation in static/text, which is stored too. The files are kept.
+    Translated assets are attributed to TTS_LEGACY_ALT_LANGUAGE; those without a translation
+    file cannot be keyed and are dropped.
+    """
+    from flask import current_app
+    from .tts_assets import speech_key, get_audio_format
+    from .translate import get_translated_question, store_translation
+
+    columns = {column['name'] for column in inspect(connection).get_columns(TtsAsset.__tablename__)}
+    if 'question_id' not in columns:
+        return
+    connection.exec_driver_sql('ALTER TABLE tts_asset RENAME TO tts_asset_legacy')
+    TtsAsset.__table__.create(connection)
+
+    audio_format = get_audio_format()
+    alt_language = current_app.config.get('TTS_LEGACY_ALT_LANGUAGE', 'en')
+    text_dir = os.path.join(current_app.static_folder, 'text')
+    question_texts = dict(connection.execute(select(Question.id, Question.question_text)).all())
+    rows = connection.exec_driver_sql(
+        'SELECT question_id, variant, sha256, filename, content_type, size, created_at FROM tts_asset_legacy'
+    ).all()
+    assets = {}
+    for row in rows:
+        text, language = question_texts.get(row.question_id), None
+        if text is not None and row.variant == 'alt':
+            translated_text = get_translated_question(row.question_id, text_dir)
+            if translated_text is not None:
+                store_translation(text, alt_language, translated_text)
+            text, language = translated_text, alt_language
+        if text is None:
+            continue
+        # Under the key of TTS_AUDIO_FORMAT, like `flask publish-tts-assets`, so that it is found
+        key = speech_key(text, language, audio_format)
+        assets.setdefault(key, (key, language, row.sha256, row.filename, row.content_type, row.size, row.created_at))
+    if assets:
+        # The values are copied as stored, created_at included
+        connection.exec_driver_sql(
+            'INSERT INTO tts_asset (key, language, sha256, filename, content_type, size, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', list(assets.values())
+        )
+    connection.exec_driver_sql('DROP TABLE tts_asset_legacy')
+    print(f"Audio assets rekeyed by content: {len(assets)} of {len(rows)} kept.")
+
+# db.create_all() creates missing tables with their indexes, but never changes a table that
+# already exists. A migration brings such a table up to date with models.py without touching
+# its data. It must be a no-op on a database create_all() has just built from the current
+# models, since new databases get every migration recorded as applied on first start.
+# (version, name, function taking a connection), in the order they are applied
+MIGRATIONS = [
+    (1, 'answer_question_session_indexes', _add_query_indexes),
+    (2, 'question_stats_sort_indexes', _add_question_stats_sort_indexes),
+    (3, 'content_addressed_tts_assets', _rekey_tts_assets),
+]
+
+def pending_migrations():
+    applied = {row[0] for row in db.session.query(SchemaMigration.version)}
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def run_migrations():
+    """Applies the pending migrations, each in its own transaction. Returns the names of those applied."""
+    applied = []
+    for version, name, migrate in pending_migrations():
+        connection = db.session.connection()
+        migrate(connection)
+        db.session.add(SchemaMigration(version=version, name=name))
+        db.session.commit()
+        print(f"Applied schema migration {version}: {name}")
+        applied.append(name)
+    return applied
+
+def _query_plan_checks():
+    """The hot query shapes of routes.py, with the index each one is expected to use."""
+    return [
+        ('answers of a session',
+         select(Answer).where(Answer.session_id == 1).order_by(Answer.id),
+         'ix_answer_session_id_timestamp'),
+        ('latest answer per session',
+         select(Answer.session_id, func.max(Answer.timestamp)).group_by(Answer.session_id),
+         'ix_answer_session_id_timestamp'),
+        ('answers of a question, latest first',
+         select(Answer).where(Answer.question_id == 1).order_by(desc(Answer.timestamp)),
+         'ix_answer_question_id_timestamp'),
+        ('latest answer per question',
+         select(Answer.question_id, func.max(Answer.timestamp)).group_by(Answer.question_id),
+         'ix_answer_question_id_timestamp'),
+        ('questions of some categories',
+         select(Question.id).where(Question.category.in_(['a', 'b'])),
+         'ix_question_category'),
+        ('categories',
+         select(Question.category).distinct(),
+         'ix_question_category'),
+        ('latest sessions',
+         select(QuizSession.id).order_by(desc(QuizSession.start_time)).limit(10),
+         'ix_quiz_session_start_time'),
+        ('page of sessions, latest first',
+         select(QuizSession.id)
+         .where((QuizSession.start_time < datetime.datetime(2030, 1, 1)) | ((QuizSession.start_time == datetime.datetime(2030, 1, 1)) & (QuizSession.id < 10)))
+         .order_by(desc(QuizSession.start_time), desc(QuizSession.id)).limit(50),
+         'ix_quiz_session_start_time'),
+        ('page of questions by category',
+         select(Question.id)
+         .join(QuestionStats, Question.id == QuestionStats.question_id)
+         .order_by(Question.category, Question.id).limit(50),
+         'ix_question_category'),
+        ('page of questions by average score',
+         select(Question.id)
+         .join(QuestionStats, Question.id == QuestionStats.question_id)
+         .where(QuestionStats.avg_score > 3)
+         .order_by(QuestionStats.avg_score, QuestionStats.question_id).limit(50),
+         'ix_question_stats_avg_score'),
+        ('page of questions by last answer',
+         select(Question.id)
+         .join(QuestionStats, Question.id == QuestionStats.question_id)
+         .order_by(desc(QuestionStats.last_answered_at), desc(QuestionStats.question_id)).limit(50),
+         'ix_question_stats_last_answered_at'),
+    ]
+
+def check_query_plans():
+    """
+    Runs EXPLAIN QUERY PLAN on the hot queries. Returns a list of
+    (description, expected index, plan lines, uses index) tuples.
+    """
+    connection = db.session.connection()
+    results = []
+    for description, statement, index_name in _query_plan_checks():
+        sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+        uses_index = any(index_name in line for line in plan)
+        results.append((description, index_name, plan, uses_index))
+    return results
@@ -4,7 +4,7 @@ import datetime
 class QuizSession(db.Model):
     """Represents a single quiz session."""
     id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    start_time = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
     # Configuration details can be stored as a JSON string or in separate columns
     config = db.Column(db.String, nullable=False) 
     answers = db.relationship('Answer', backref='session', lazy=True, cascade="all, delete-orphan")
@@ -16,7 +16,7 @@ class Question(db.Model):
     """Represents a single question in the database."""
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.String, nullable=False)
-    category = db.Column(db.String, nullable=False)
+    category = db.Column(db.String, nullable=False, index=True)
     digest = db.Column(db.String, unique=True, nullable=False) # SHA-256 digest of the question text
     answers = db.relationship('Answer', backref='question', lazy=True)
 
@@ -25,6 +25,13 @@ class Question(db.Model):
 
 class Answer(db.Model):
     """Represents a user's answer to a question within a session."""
+    __table_args__ = (
+        # Answers of a session, and its latest answer
+        db.Index('ix_answer_session_id_timestamp', 'session_id', 'timestamp'),
+        # Answers of a question, and its latest answer
+        db.Index('ix_answer_question_id_timestamp', 'question_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('quiz_session.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
@@ -39,3 +46,158 @@ class Answer(db.Model):
 
     def __repr__(self):
         return f"<Answer session_id={self.session_id} question_id={self.question_id} score={self.score}>"
+
+class Job(db.Model):
+    """A unit of background work in the durable job queue, processed by `flask worker`."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String, nullable=False) # Name of the registered handler, e.g. 'transcribe'
+    answer_id = db.Column(db.Integer, nullable=True, index=True) # Answer the job works on, if any
+    payload = db.Column(db.Text, nullable=True) # JSON-encoded handler arguments
+
+    status = db.Column(db.String, nullable=False, default='pending') # pending, running, done or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.datetime.utcnow) # Not claimable before this time
+    lease_token = db.Column(db.String, nullable=True) # Identifies the worker currently holding the job
+    lease_expires_at = db.Column(db.DateTime, nullable=True) # Job becomes claimable again after this time
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Job id={self.id} kind='{self.kind}' status='{self.status}' attempts={self.attempts}>"
+
+class EvaluationCache(db.Model):
+    """A cached LLM evaluation, keyed by a hash of everything that influences its result."""
+    key = db.Column(db.String, primary_key=True) # SHA-256, see eval_cache.evaluation_cache_key()
+    score = db.Column(db.Integer, nullable=False)
+    justification = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<EvaluationCache key={self.key[:12]} score={self.score} hits={self.hits}>"
+
+class TranscriptionCache(db.Model):
+    """A cached transcript, keyed by the audio content and the STT settings that produced it."""
+    audio_sha256 = db.Column(db.String, primary_key=True) # SHA-256 of the audio file bytes
+    provider = db.Column(db.String, primary_key=True) # 'deepgram' or 'mistral'
+    model = db.Column(db.String, primary_key=True)
+    language = db.Column(db.String, primary_key=True) # Empty when the provider detects it
+    text = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TranscriptionCache audio={self.audio_sha256[:12]} provider='{self.provider}' model='{self.model}' hits={self.hits}>"
+
+class IngestManifest(db.Model):
+    """A question file already loaded into the database, so that it is skipped while unchanged."""
+    path = db.Column(db.String, primary_key=True) # Absolute path of the JSON file
+    size = db.Column(db.Integer, nullable=False)
+    mtime_ns = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String, nullable=False) # Of the file content
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    ingested_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IngestManifest path='{self.path}' questions={self.question_count}>"
+
+class SchemaMigration(db.Model):
+    """A schema migration applied to the database, see migrations.py."""
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaMigration version={self.version} name='{self.name}'>"
+
+class QuestionStats(db.Model):
+    """
+    Per-question rollup of the answers, kept up to date by question_stats.py whenever
+    answers are added, changed or deleted, so that views do not aggregate the Answer table.
+    """
+    __table_args__ = (
+        # Sort orders of /api/questions; SQLite appends the primary key, which breaks ties
+        db.Index('ix_question_stats_attempts', 'attempts'),
+        db.Index('ix_question_stats_avg_score', 'avg_score'),
+        db.Index('ix_question_stats_max_score', 'max_score'),
+        db.Index('ix_question_stats_last_answered_at', 'last_answered_at'),
+    )
+
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0) # Number of answers, scored or not
+    scored_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    avg_score = db.Column(db.Float, nullable=True) # score_sum / scored_count, None when nothing is scored
+    max_score = db.Column(db.Integer, nullable=True)
+    last_score = db.Column(db.Integer, nullable=True) # Of the most recent answer
+    last_duration = db.Column(db.Float, nullable=True)
+    last_answered_at = db.Column(db.DateTime, nullable=True)
+    duration_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_sum = db.Column(db.Float, nullable=False, default=0)
+    avg_duration = db.Column(db.Float, nullable=True)
+    min_duration = db.Column(db.Float, nullable=True)
+
+    question = db.relationship('Question', backref=db.backref('stats', uselist=False, lazy=True))
+
+    def __repr__(self):
+        return f"<QuestionStats question_id={self.question_id} attempts={self.attempts} avg_score={self.avg_score}>"
+
+class TtsBatch(db.Model):
+    """
+    A run of text-to-speech generation over the whole question bank, processed in the
+    background a chunk of questions at a time (see tts_batch.py). `checkpoint` is the id
+    of the last question done, so that an interrupted run resumes after it.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    is_alt = db.Column(db.Boolean, nullable=False, default=False) # Audio of the translated questions
+    language = db.Column(db.String, nullable=True) # Target language of the translations, when is_alt
+    status = db.Column(db.String, nullable=False, default='running', index=True) # running, done or failed
+    total = db.Column(db.Integer, nullable=False, default=0) # Questions in the bank when the run started
+    checkpoint = db.Column(db.Integer, nullable=False, default=0)
+    created = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0) # The audio file already existed
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow) # Last chunk done, to spot abandoned runs
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<TtsBatch id={self.id} status='{self.status}' checkpoint={self.checkpoint} total={self.total}>"
+
+class TtsAsset(db.Model):
+    """
+    A synthesized audio file in the content-addressed store (see tts_assets.py). It is keyed by
+    everything that went into it: the text, language, voice, model, prosody and format. So a
+    given input is synthesized once, whichever question it belongs to, and reassigned question
+    ids never serve stale audio. The file is named after the hash of its content, so that
+    browsers can cache it forever.
+    """
+    key = db.Column(db.String, primary_key=True) # SHA-256 of the synthesis input, see tts_assets.speech_key()
+    language = db.Column(db.String, nullable=True, index=True) # Of the text, None for the questions as written
+    sha256 = db.Column(db.String, nullable=False) # Of the file content, also its ETag
+    filename = db.Column(db.String, nullable=False) # <hash>.<format>, in TTS_ASSET_DIR
+    content_type = db.Column(db.String, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TtsAsset key={self.key[:12]} filename='{self.filename}'>"
+
+class Translation(db.Model):
+    """A translated question text, keyed by the source text, the language, the model and the prompt."""
+    key = db.Column(db.String, primary_key=True) # SHA-256, see translate.translation_key()
+    source_digest = db.Column(db.String, nullable=False, index=True) # SHA-256 of the source text, as Question.digest
+    language = db.Column(db.String, nullable=False)
+    model = db.Column(db.String, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Translation key={self.key[:12]} language='{self.language}'>"
@@ -0,0 +1,81 @@
+import json
+import base64
+import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class PaginationError(ValueError):
+    """A malformed page request, reported to the client as a 400."""
+
+def encode_cursor(sort_value, row_id):
+    """Opaque cursor pointing after the row with this sort value and id."""
+    if isinstance(sort_value, datetime.datetime):
+        sort_value = {'datetime': sort_value.isoformat()}
+    data = json.dumps([sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Returns the (sort value, id) of a cursor made by encode_cursor()."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.datetime.fromisoformat(sort_value['datetime'])
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, KeyError) as e:
+        raise PaginationError(f"Invalid cursor: {e}")
+
+def page_size(value):
+    """The requested number of rows, within 1 and MAX_PAGE_SIZE."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+def keyset_order(sort_column, id_column, descending):
+    """ORDER BY clause of a keyset page. The id breaks ties, so that the order is total."""
+    if descending:
+        return [sort_column.desc(), id_column.desc()]
+    return [sort_column.asc(), id_column.asc()]
+
+def keyset_after(sort_column, id_column, descending, cursor):
+    """
+    WHERE clause selecting the rows after the cursor in keyset_order(). SQLite sorts NULLs
+    first in ascending order and last in descending order, so a nullable sort column is
+    supported: the NULL rows are compared by id only.
+    """
+    sort_value, row_id = decode_cursor(cursor)
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < row_id)
+        return or_(sort_column < sort_value,
+                   and_(sort_column == sort_value, id_column < row_id),
+                   sort_column.is_(None))
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > row_id), sort_column.isnot(None))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
+
+def keyset_page(query, sort_column, id_column, descending, cursor, limit, sort_key):
+    """
+    Runs a keyset-paginated query. `sort_key(row)` returns the (sort value, id) of a row.
+    Returns (rows, next cursor or None when this is the last page).
+    """
+    if cursor:
+        query = query.filter(keyset_after(sort_column, id_column, descending, cursor))
+    rows = query.order_by(*keyset_order(sort_column, id_column, descending)).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*sort_key(rows[-1]))
+
+def parse_date(value, end_of_day=False):
+    """Parses an ISO date or datetime filter. A bare date ending a range includes that whole day."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"Invalid date: {value}")
+    if end_of_day and len(value) == 10:
+        parsed += datetime.timedelta(days=1)
+    return parsed
@@ -0,0 +1,374 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+import concurrent.futures
+from flask import current_app
+from . import db
+from .models import Answer, Job
+from .jobs import job_handler, enqueue, get_payload, has_active_jobs
+from .stt import transcribe_audio_async, transcribe_audio_cached_async
+from .stt_cache import transcription_cache_key, get_cached_transcription, store_transcription
+from .stt_streaming import get_streaming_transcriber
+from .evaluation import evaluate_answer_async
+from .eval_cache import evaluation_cache_key, get_cached_evaluation, store_evaluation, evaluate_answer_cached_async
+from .audio_utils import get_audio_duration
+from .providers import submit, run_sync
+
+# Futures of the answers currently being processed, grouped by quiz session id.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def get_eval_config():
+    """Helper to get the full evaluation configuration from the app config."""
+    return {
+        'DEEPGRAM_API_KEY': current_app.config.get('DEEPGRAM_API_KEY'),
+        'DEEPGRAM_MODEL': current_app.config.get('DEEPGRAM_MODEL'),
+        'DEEPGRAM_LANGUAGE': current_app.config.get('DEEPGRAM_LANGUAGE'),
+        'MISTRAL_API_KEY': current_app.config.get('MISTRAL_API_KEY'),
+        'DEEPGRAM_MAX_RETRIES': current_app.config.get('DEEPGRAM_MAX_RETRIES', 3),
+        'DEEPGRAM_RETRY_DELAY': current_app.config.get('DEEPGRAM_RETRY_DELAY', 1),
+        'OPENROUTER_API_KEY': current_app.config.get('OPENROUTER_API_KEY'),
+        'OPENROUTER_BASE_URL': current_app.config.get('OPENROUTER_BASE_URL'),
+        'EVALUATION_MODE': current_app.config.get('EVALUATION_MODE', 'two_step'),
+        'REASONING_MODEL': current_app.config.get('REASONING_MODEL'),
+        'REASONING_TEMPERATURE': current_app.config.get('REASONING_TEMPERATURE'),
+        'REASONING_TOP_K': current_app.config.get('REASONING_TOP_K'),
+        'STRUCTURED_OUTPUT_MODEL': current_app.config.get('STRUCTURED_OUTPUT_MODEL'),
+        'STRUCTURED_OUTPUT_TEMPERATURE': current_app.config.get('STRUCTURED_OUTPUT_TEMPERATURE'),
+        'STRUCTURED_OUTPUT_TOP_K': current_app.config.get('STRUCTURED_OUTPUT_TOP_K'),
+        'OPENROUTER_MAX_RETRIES': current_app.config.get('OPENROUTER_MAX_RETRIES', 3),
+        'REASONING_CONTEXT_USER': current_app.config.get('REASONING_CONTEXT_USER'),
+        'REASONING_CONTEXT_SYSTEM': current_app.config.get('REASONING_CONTEXT_SYSTEM'),
+        'STRUCTURED_CONTEXT_USER': current_app.config.get('STRUCTURED_CONTEXT_USER'),
+        'STRUCTURED_CONTEXT_SYSTEM': current_app.config.get('STRUCTURED_CONTEXT_SYSTEM'),
+    }
+
+def _absolute_audio_path(answer):
+    project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
+    return os.path.join(project_root, answer.audio_file_path)
+
+def build_answer_task(answer, stt_provider):
+    """Collects everything the pipeline needs so it can run without a database session."""
+    return {
+        "answer_id": answer.id,
+        "session_id": answer.session_id,
+        "audio_path": _absolute_audio_path(answer),
+        "question_digest": answer.question.digest,
+        "question_text": answer.question.question_text,
+        "category": answer.question.category,
+        "stt_provider": stt_provider,
+        "duration": answer.duration, # Measured at upload, probed again only if missing
+        "answer_text": answer.answer_text # Set when the answer was transcribed while recording
+    }
+
+async def process_answer_task_async(app, task_data, eval_config):
+    """Runs duration probing, transcription and evaluation for a single answer."""
+    try:
+        duration = task_data.get("duration")
+        if duration is None:
+            duration = await asyncio.to_thread(get_audio_duration, task_data["audio_path"])
+        transcribed_text = task_data.get("answer_text")
+        if transcribed_text is None:
+            transcribed_text = await transcribe_audio_cached_async(
+                app,
+                task_data["audio_path"],
+                eval_config,
+                provider=task_data["stt_provider"]
+            )
+        evaluation_result = await evaluate_answer_cached_async(
+            app, task_data["question_digest"], task_data["question_text"], transcribed_text,
+            task_data["category"], eval_config, duration
+        )
+        return {
+            "answer_id": task_data["answer_id"], "duration": duration,
+            "answer_text": transcribed_text, "score": evaluation_result.get("score"),
+            "justification": evaluation_result.get("justification")
+        }
+    except Exception as e:
+        print(f"Error processing answer {task_data['answer_id']}: {e}")
+        return {"answer_id": task_data['answer_id'], "justification": f"An error occurred: {e}"}
+
+def process_answer_tasks(tasks, eval_config):
+    """Processes several answers concurrently on the provider loop and returns their results."""
+    app = current_app._get_current_object()
+
+    async def _process_all():
+        return await asyncio.gather(*(process_answer_task_async(app, task, eval_config) for task in tasks))
+    return run_sync(_process_all())
+
+def save_answer_results(results):
+    """Writes pipeline results back to their Answer rows, in one short write transaction."""
+    answers = Answer.query.filter(Answer.id.in_([result["answer_id"] for result in results])).all()
+    answers_by_id = {answer.id: answer for answer in answers}
+    for result in results:
+        answer = answers_by_id.get(result["answer_id"])
+        if answer:
+            answer.duration = result.get("duration")
+            answer.answer_text = result.get("answer_text")
+            answer.score = result.get("score")
+            answer.justification = result.get("justification")
+    db.session.commit()
+
+def _save_in_app_context(app, results):
+    with app.app_context():
+        save_answer_results(results)
+
+async def _run_in_background(app, task_data, eval_config):
+    result = await process_answer_task_async(app, task_data, eval_config)
+    await asyncio.to_thread(_save_in_app_context, app, [result])
+    return result
+
+def submit_answer_for_processing(answer, stt_provider):
+    """
+    Starts transcription and evaluation of an answer in the background.
+    Must be called from within a request, after the answer has been committed.
+    """
+    app = current_app._get_current_object()
+    task_data = build_answer_task(answer, stt_provider)
+    future = submit(_run_in_background(app, task_data, get_eval_config()))
+    future.answer_id = answer.id
+
+    session_id = answer.session_id
+    with _in_flight_lock:
+        _in_flight.setdefault(session_id, set()).add(future)
+
+    def _forget(done_future):
+        with _in_flight_lock:
+            futures = _in_flight.get(session_id)
+            if futures is not None:
+                futures.discard(done_future)
+                if not futures:
+                    del _in_flight[session_id]
+
+    future.add_done_callback(_forget)
+    return future
+
+def in_flight_answer_ids(session_id):
+    """Returns the ids of the answers of a session still being processed in this process."""
+    with _in_flight_lock:
+        return {f.answer_id for f in _in_flight.get(session_id, ())}
+
+def wait_for_session(session_id, timeout=None):
+    """Blocks until the background work started for a session has finished."""
+    with _in_flight_lock:
+        futures = list(_in_flight.get(session_id, ()))
+    if futures:
+        concurrent.futures.wait(futures, timeout=timeout)
+
+def session_has_pending_work(session_id):
+    """Tells whether some answers of a session are still being processed, in any mode."""
+    if in_flight_answer_ids(session_id):
+        return True
+    answer_ids = [row[0] for row in db.session.query(Answer.id).filter_by(session_id=session_id)]
+    return bool(has_active_jobs(answer_ids))
+
+# --- Streaming upload: the answer is received, and transcribed, while it is recorded ---
+
+# Upload streams open in this process, by stream id. The chunks of a stream must reach
+# the process that opened it, so several workers need sticky sessions.
+_streams = {}
+_streams_lock = threading.Lock()
+
+def open_answer_stream(audio_path, session_id, question_id, stt_provider, eval_config):
+    """
+    Starts receiving an answer in chunks, appended to `audio_path`. When the provider can
+    transcribe live, the chunks are streamed to it as well.
+    Returns (stream_id, is_transcribing).
+    """
+    _expire_idle_streams()
+
+    transcriber = get_streaming_transcriber(stt_provider, eval_config)
+    if transcriber is not None:
+        try:
+            run_sync(transcriber.start(), timeout=current_app.config.get('STREAMING_FINISH_TIMEOUT', 15))
+        except Exception as e:
+            print(f"Could not start live transcription with {stt_provider}, the answer will be transcribed once uploaded: {e}")
+            transcriber = None
+
+    # Truncates a previous recording of the same question
+    with open(audio_path, 'wb'):
+        pass
+
+    stream_id = uuid.uuid4().hex
+    with _streams_lock:
+        _streams[stream_id] = {
+            'audio_path': audio_path,
+            'session_id': session_id,
+            'question_id': question_id,
+            'stt_provider': stt_provider,
+            'transcriber': transcriber,
+            'next_seq': 0,
+            'last_activity': time.monotonic(),
+            'lock': threading.Lock()
+        }
+    return stream_id, transcriber is not None
+
+def get_answer_stream(stream_id, session_id):
+    """Returns an open stream of the given quiz session, or None."""
+    with _streams_lock:
+        stream = _streams.get(stream_id)
+    if stream is None or stream['session_id'] != session_id:
+        return None
+    return stream
+
+def append_answer_chunk(stream, seq, chunk):
+    """Appends the chunk number `seq` to a stream. Returns False if it is not the next one."""
+    with stream['lock']:
+        if seq != stream['next_seq']:
+            return False
+        with open(stream['audio_path'], 'ab') as f:
+            f.write(chunk)
+        stream['next_seq'] += 1
+        stream['last_activity'] = time.monotonic()
+
+        transcriber = stream['transcriber']
+        if transcriber is not None:
+            try:
+                run_sync(transcriber.send(chunk), timeout=current_app.config.get('STREAMING_FINISH_TIMEOUT', 15))
+            except Exception as e:
+                # The recording is still complete on disk, so it can be transcribed at the end
+                print(f"Live transcription failed, the answer will be transcribed once uploaded: {e}")
+                stream['transcriber'] = None
+                submit(transcriber.abort())
+    return True
+
+def close_answer_stream(stream_id):
+    """
+    Ends a stream once its last chunk was received. Returns (stream, transcript), where the
+    transcript is None when the answer was not, or could not be, transcribed live.
+    """
+    with _streams_lock:
+        stream = _streams.pop(stream_id, None)
+    if stream is None:
+        return None, None
+
+    transcript = None
+    transcriber = stream['transcriber']
+    if transcriber is not None:
+        try:
+            transcript = run_sync(transcriber.finish(), timeout=current_app.config.get('STREAMING_FINISH_TIMEOUT', 15))
+        except Exception as e:
+            print(f"Could not complete the live transcription, the answer will be transcribed again: {e}")
+        if not transcript or transcript.startswith("Error:"):
+            transcript = None
+    return stream, transcript
+
+def abort_answer_stream(stream_id):
+    """Discards a stream, e.g. when the question is skipped."""
+    with _streams_lock:
+        stream = _streams.pop(stream_id, None)
+    if stream is not None and stream['transcriber'] is not None:
+        submit(stream['transcriber'].abort())
+    return stream
+
+def _expire_idle_streams():
+    idle_timeout = current_app.config.get('STREAMING_IDLE_TIMEOUT', 300)
+    now = time.monotonic()
+    with _streams_lock:
+        expired = [stream_id for stream_id, stream in _streams.items() if now - stream['last_activity'] > idle_timeout]
+    for stream_id in expired:
+        abort_answer_stream(stream_id)
+
+# --- Durable queue mode: one job per pipeline stage, run by `flask worker` ---
+
+def enqueue_answer_pipeline(answer, stt_provider, commit=True):
+    """Queues the first stage of the pipeline for an answer; each stage queues the next one."""
+    return enqueue(_next_stage(answer), answer_id=answer.id, payload={'stt_provider': stt_provider}, commit=commit)
+
+def _next_stage(answer):
+    # The duration is normally measured at upload, and the transcript may have been
+    # produced while recording, in which case those stages are skipped
+    if answer.duration is None:
+        return 'duration'
+    if answer.answer_text is None:
+        return 'transcribe'
+    return 'evaluate'
+
+def enqueue_unqueued_answers(session_id, stt_provider):
+    """Queues the unprocessed answers of a session that were never handed to the queue."""
+    queued = db.session.query(Job.answer_id).filter(Job.answer_id.isnot(None))
+    answers = Answer.query.filter(
+        Answer.session_id == session_id,
+        Answer.answer_text.is_(None),
+        Answer.justification.is_(None),
+        Answer.id.notin_(queued)
+    ).all()
+    for answer in answers:
+        enqueue_answer_pipeline(answer, stt_provider, commit=False)
+    db.session.commit()
+
+def _record_pipeline_failure(job, error):
+    """
+    Stops an answer from looking unprocessed once one of its stages gave up. The score stays
+    None: a provider failure is not a grade, and must not weigh in the question statistics.
+    """
+    answer = Answer.query.get(job.answer_id)
+    if answer:
+        answer.justification = f"An error occurred: {error}"
+
+@job_handler('duration', on_failure=_record_pipeline_failure)
+def run_duration_job(job):
+    answer = Answer.query.get(job.answer_id)
+    if answer is None:
+        return None # The session was deleted in the meantime
+
+    def save(duration):
+        answer.duration = duration
+        enqueue(_next_stage(answer), answer_id=answer.id, payload=get_payload(job), commit=False)
+
+    return asyncio.to_thread(get_audio_duration, _absolute_audio_path(answer)), save
+
+@job_handler('transcribe', on_failure=_record_pipeline_failure)
+def run_transcribe_job(job):
+    answer = Answer.query.get(job.answer_id)
+    if answer is None:
+        return None
+
+    audio_path = _absolute_audio_path(answer)
+    eval_config = get_eval_config()
+    stt_provider = get_payload(job).get('stt_provider', 'mistral')
+    cache_key = transcription_cache_key(audio_path, stt_provider, eval_config)
+    cached = get_cached_transcription(cache_key)
+    if cached is not None:
+        answer.answer_text = cached
+        enqueue('evaluate', answer_id=answer.id, payload=get_payload(job), commit=False)
+        return None
+
+    def save(transcribed_text):
+        if transcribed_text.startswith("Error:"):
+            raise RuntimeError(transcribed_text)
+        answer.answer_text = transcribed_text
+        enqueue('evaluate', answer_id=answer.id, payload=get_payload(job), commit=False)
+        store_transcription(cache_key, transcribed_text, commit=False)
+
+    transcription = transcribe_audio_async(audio_path, eval_config, provider=stt_provider)
+    return transcription, save
+
+@job_handler('evaluate', on_failure=_record_pipeline_failure)
+def run_evaluate_job(job):
+    answer = Answer.query.get(job.answer_id)
+    if answer is None:
+        return None
+
+    eval_config = get_eval_config()
+    cache_key = evaluation_cache_key(answer.question.digest, answer.answer_text, answer.duration, eval_config)
+    cached = get_cached_evaluation(cache_key)
+    if cached is not None:
+        answer.score = cached["score"]
+        answer.justification = cached["justification"]
+        return None
+
+    def save(evaluation_result):
+        if not evaluation_result.get("score"):
+            raise RuntimeError(evaluation_result.get("justification"))
+        answer.score = evaluation_result.get("score")
+        answer.justification = evaluation_result.get("justification")
+        store_evaluation(cache_key, evaluation_result, commit=False)
+
+    evaluation = evaluate_answer_async(
+        answer.question.question_text, answer.answer_text, answer.question.category,
+        eval_config, answer.duration
+    )
+    return evaluation, save
@@ -0,0 +1,129 @@
+import os
+import queue
+import asyncio
+import threading
+import contextlib
+
+# Maximum number of concurrent in-flight calls per external provider.
+# Overridden from the app config (PROVIDER_CONCURRENCY_<PROVIDER>) by init_app().
+DEFAULT_LIMITS = {
+    'deepgram': 16,
+    'mistral': 8,
+    'openrouter': 32,
+    'speechify': 8,
+}
+
+_limits = dict(DEFAULT_LIMITS)
+_semaphores = {}
+
+# Maximum number of calls per second per provider, for the APIs that enforce a rate limit.
+# Unset (no limit) unless configured with PROVIDER_RATE_LIMIT_<PROVIDER>.
+_rate_limits = {}
+_next_call_times = {}
+
+# One event loop per process, running in a daemon thread. Every external call goes
+# through it, so hundreds of calls can be in flight without holding one thread each.
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+def init_app(app):
+    """Reads the per-provider concurrency limits from the app config."""
+    for provider in DEFAULT_LIMITS:
+        value = app.config.get(f'PROVIDER_CONCURRENCY_{provider.upper()}')
+        if value:
+            _limits[provider] = int(value)
+        rate = app.config.get(f'PROVIDER_RATE_LIMIT_{provider.upper()}')
+        if rate:
+            _rate_limits[provider] = float(rate)
+
+def get_loop():
+    """Returns the event loop of this process, starting it on first use."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        # A forked worker inherits the parent's loop object but not its thread
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _semaphores.clear()
+            _next_call_times.clear()
+            thread = threading.Thread(target=_loop.run_forever, name='provider-loop', daemon=True)
+            thread.start()
+        return _loop
+
+def is_loop_running():
+    """Tells whether this process has started its provider loop, without starting it."""
+    return _loop is not None and _loop_pid == os.getpid() and _loop.is_running()
+
+def submit(coro):
+    """Schedules a coroutine on the provider loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run_sync(coro, timeout=None):
+    """Runs a coroutine on the provider loop and blocks the calling thread until it is done."""
+    loop = get_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the provider loop; await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+_END = object()
+
+def iterate_sync(agen, timeout=None):
+    """
+    Iterates an async generator on the provider loop from a regular thread, yielding its
+    items as they are produced. `timeout` bounds the wait for each item. Closing the returned
+    generator early (e.g. when a streaming client disconnects) cancels the async one.
+    """
+    items = queue.Queue()
+
+    async def _pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except Exception as e:
+            items.put((_END, e))
+        else:
+            items.put((_END, None))
+
+    future = submit(_pump())
+    try:
+        while True:
+            item, error = items.get(timeout=timeout)
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+def _get_semaphore(provider):
+    # Semaphores are only ever created and used on the provider loop, so no lock is needed
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_limits.get(provider, 8))
+        _semaphores[provider] = semaphore
+    return semaphore
+
+async def _wait_for_rate_limit(provider):
+    # Each call books the next free time slot, 1/rate seconds after the previous one
+    rate = _rate_limits.get(provider)
+    if not rate:
+        return
+    now = asyncio.get_running_loop().time()
+    slot = max(now, _next_call_times.get(provider, now))
+    _next_call_times[provider] = slot + 1 / rate
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+@contextlib.asynccontextmanager
+async def limit(provider):
+    """Waits for a free slot of the given provider, and its rate limit, before making a call."""
+    async with _get_semaphore(provider):
+        await _wait_for_rate_limit(provider)
+        yield
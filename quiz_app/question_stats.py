@@ -0,0 +1,239 @@
+from sqlalchemy import event, select, delete, insert, update, func
+from sqlalchemy.orm import Session
+from . import db
+from .models import Answer, QuestionStats
+
+# Answer attributes the rollup depends on
+TRACKED_ATTRIBUTES = ('question_id', 'question', 'score', 'duration', 'timestamp')
+
+def compute_question_stats(rows):
+    """
+    Aggregates (score, duration, timestamp, id) answer rows of one question into the
+    columns of a QuestionStats row, with the same semantics as the SQL aggregates:
+    NULL scores and durations are ignored, the last answer is the most recent one.
+    """
+    scores = [row.score for row in rows if row.score is not None]
+    durations = [row.duration for row in rows if row.duration is not None]
+    last = max(rows, key=lambda row: (row.timestamp is not None, row.timestamp, row.id))
+    return {
+        'attempts': len(rows),
+        'scored_count': len(scores),
+        'score_sum': sum(scores),
+        'avg_score': sum(scores) / len(scores) if scores else None,
+        'max_score': max(scores) if scores else None,
+        'last_score': last.score,
+        'last_duration': last.duration,
+        'last_answered_at': last.timestamp,
+        'duration_count': len(durations),
+        'duration_sum': sum(durations),
+        'avg_duration': sum(durations) / len(durations) if durations else None,
+        'min_duration': min(durations) if durations else None,
+    }
+
+def refresh_question_stats(connection, question_ids):
+    """Recomputes the rollup rows of the given questions from their answers."""
+    # Ids set from form data may still be strings on pending objects
+    question_ids = list({int(question_id) for question_id in question_ids})
+    if not question_ids:
+        return
+
+    rows_by_question = {question_id: [] for question_id in question_ids}
+    answers = connection.execute(
+        select(Answer.question_id, Answer.score, Answer.duration, Answer.timestamp, Answer.id)
+        .where(Answer.question_id.in_(question_ids))
+    )
+    for row in answers:
+        rows_by_question[row.question_id].append(row)
+
+    connection.execute(delete(QuestionStats).where(QuestionStats.question_id.in_(question_ids)))
+    values = [
+        {'question_id': question_id, **compute_question_stats(rows)}
+        for question_id, rows in rows_by_question.items() if rows
+    ]
+    if values:
+        connection.execute(insert(QuestionStats), values)
+
+def rebuild_question_stats():
+    """Recomputes the whole rollup from the Answer table, e.g. to recover from drift."""
+    question_ids = [row[0] for row in db.session.query(Answer.question_id).distinct()]
+    connection = db.session.connection()
+    connection.execute(delete(QuestionStats))
+    # Batches keep the IN clauses under SQLite's variable limit
+    for start in range(0, len(question_ids), 500):
+        refresh_question_stats(connection, question_ids[start:start + 500])
+    db.session.commit()
+    return len(question_ids)
+
+def ensure_question_stats():
+    """Builds the rollup when it is empty but answers exist, e.g. right after an upgrade."""
+    if QuestionStats.query.first() is None and Answer.query.first() is not None:
+        count = rebuild_question_stats()
+        print(f"Question statistics built for {count} questions.")
+
+# Columns of the Answer rows the rollup is computed from
+ANSWER_COLUMNS = (Answer.id, Answer.question_id, Answer.score, Answer.duration, Answer.timestamp)
+
+def _empty_question_stats():
+    return {
+        'attempts': 0, 'scored_count': 0, 'score_sum': 0, 'max_score': None,
+        'last_score': None, 'last_duration': None, 'last_answered_at': None,
+        'duration_count': 0, 'duration_sum': 0, 'min_duration': None,
+    }
+
+def apply_question_stats_delta(stats, removed, added):
+    """
+    Updates the columns of a QuestionStats row (None when the question had no answers) with
+    the answer rows `removed` from the question and `added` to it; a changed answer is
+    removed as it was and added as it is. Returns the new columns, None when no answer is
+    left, and the set of columns the delta cannot settle: 'max_score', 'min_duration' or
+    'last' when a removed row may have held them and no added row replaces it.
+    """
+    values = dict(stats) if stats else _empty_question_stats()
+    stale = set()
+    for row in removed:
+        values['attempts'] -= 1
+        if row.score is not None:
+            values['scored_count'] -= 1
+            values['score_sum'] -= row.score
+            if row.score == values['max_score']:
+                stale.add('max_score')
+        if row.duration is not None:
+            values['duration_count'] -= 1
+            values['duration_sum'] -= row.duration
+            if row.duration == values['min_duration']:
+                stale.add('min_duration')
+        if row.timestamp == values['last_answered_at']:
+            stale.add('last')
+
+    for row in added:
+        values['attempts'] += 1
+        # A stale maximum is still an upper bound of the remaining scores, so a score
+        # reaching it is the maximum again
+        if row.score is not None:
+            values['scored_count'] += 1
+            values['score_sum'] += row.score
+            if values['max_score'] is None or row.score >= values['max_score']:
+                values['max_score'] = row.score
+                stale.discard('max_score')
+        if row.duration is not None:
+            values['duration_count'] += 1
+            values['duration_sum'] += row.duration
+            if values['min_duration'] is None or row.duration <= values['min_duration']:
+                values['min_duration'] = row.duration
+                stale.discard('min_duration')
+        last_at = values['last_answered_at']
+        if row.timestamp is not None and (last_at is None or row.timestamp > last_at):
+            values.update(last_score=row.score, last_duration=row.duration, last_answered_at=row.timestamp)
+            stale.discard('last')
+        elif row.timestamp == last_at:
+            # Ties are broken by id, which the rollup does not keep
+            stale.add('last')
+
+    if values['attempts'] <= 0:
+        return None, set()
+    values['avg_score'] = values['score_sum'] / values['scored_count'] if values['scored_count'] else None
+    values['avg_duration'] = values['duration_sum'] / values['duration_count'] if values['duration_count'] else None
+    if not values['scored_count']:
+        values['max_score'] = None
+        stale.discard('max_score')
+    if not values['duration_count']:
+        # Also drops what float subtraction left of the sum
+        values.update(min_duration=None, duration_sum=0)
+        stale.discard('min_duration')
+    return values, stale
+
+def _recompute_stale_columns(connection, question_id, values, stale):
+    """Reads the columns the delta could not settle from the answers of the question."""
+    of_question = Answer.question_id == question_id
+    if 'max_score' in stale:
+        values['max_score'] = connection.execute(select(func.max(Answer.score)).where(of_question)).scalar()
+    if 'min_duration' in stale:
+        values['min_duration'] = connection.execute(select(func.min(Answer.duration)).where(of_question)).scalar()
+    if 'last' in stale:
+        # Most recent first through ix_answer_question_id_timestamp; SQLite sorts NULLs last here
+        last = connection.execute(
+            select(Answer.score, Answer.duration, Answer.timestamp).where(of_question)
+            .order_by(Answer.timestamp.desc(), Answer.id.desc()).limit(1)
+        ).one()
+        values.update(last_score=last.score, last_duration=last.duration, last_answered_at=last.timestamp)
+
+def apply_answer_changes(connection, removed, added):
+    """
+    Updates the rollup rows of the questions whose answers changed, from the answer rows
+    `removed` (as they were stored) and `added` (as they are stored now). Only a maximum,
+    minimum or last answer that was removed is read again from the Answer table.
+    """
+    changes = {}
+    for rows, index in ((removed, 0), (added, 1)):
+        for row in rows:
+            changes.setdefault(row.question_id, ([], []))[index].append(row)
+    changes.pop(None, None)
+    if not changes:
+        return
+
+    table = QuestionStats.__table__
+    current = {
+        row.question_id: row._asdict()
+        for row in connection.execute(select(table).where(table.c.question_id.in_(list(changes))))
+    }
+    for question_id, (question_removed, question_added) in changes.items():
+        stats = current.get(question_id)
+        values, stale = apply_question_stats_delta(stats, question_removed, question_added)
+        if values is None:
+            if stats is not None:
+                connection.execute(delete(table).where(table.c.question_id == question_id))
+            continue
+        _recompute_stale_columns(connection, question_id, values, stale)
+        if stats is None:
+            connection.execute(insert(table), values | {'question_id': question_id})
+        else:
+            values.pop('question_id', None)
+            connection.execute(update(table).where(table.c.question_id == question_id).values(values))
+
+def _stored_answers(connection, answer_ids):
+    """The rows of some answers as they are in the database, by batches of ids."""
+    answer_ids = list(answer_ids)
+    rows = []
+    # Batches keep the IN clauses under SQLite's variable limit
+    for start in range(0, len(answer_ids), 500):
+        batch = answer_ids[start:start + 500]
+        rows += connection.execute(select(*ANSWER_COLUMNS).where(Answer.id.in_(batch))).all()
+    return rows
+
+def _touched_answers(session):
+    """Answers this flush inserts, and the ones it deletes or changes a tracked attribute of."""
+    added = [obj for obj in session.new if isinstance(obj, Answer)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Answer)]
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, Answer) and any(db.inspect(obj).attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES)
+    ]
+    return added, deleted, changed
+
+@event.listens_for(Session, 'before_flush')
+def _collect_touched_answers(session, flush_context, instances):
+    added, deleted, changed = _touched_answers(session)
+    if not (added or deleted or changed):
+        session.info.pop('stats_touched', None)
+        return
+    # The rows as they were are read from the database: the attribute history misses the
+    # previous values of attributes that were expired, e.g. by a commit, when they were set
+    stored_ids = [obj.id for obj in deleted + changed if obj.id is not None]
+    removed = _stored_answers(session.connection(), stored_ids) if stored_ids else []
+    session.info['stats_touched'] = (removed, added + changed)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _refresh_touched_questions(session, flush_context):
+    touched = session.info.pop('stats_touched', None)
+    if not touched:
+        return
+    removed, answers = touched
+    # Read back after the flush, once ids and the foreign keys set through relationships are known
+    connection = session.connection()
+    added = _stored_answers(connection, {answer.id for answer in answers if answer.id is not None})
+    # Same connection and transaction as the flush, so the rollup commits or rolls back with it
+    apply_answer_changes(connection, removed, added)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_touched_answers(session):
+    session.info.pop('stats_touched', None)
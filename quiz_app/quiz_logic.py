@@ -1,5 +1,6 @@
 import json
 import hashlib
+import datetime
 import os
 from . import db
 from .models import Question
@@ -7,124 +8,153 @@ from .models import Question
 def load_questions_from_json(directory):
     """
     Loads all .json files from a directory into the database.
-    
-    This function is idempotent. It calculates a SHA-256 digest of the 
-    question text and checks if a question with that digest already 
-    exists before adding it to the database.
+
+    This function is idempotent. Questions are identified by a SHA-256 digest
+    of their text, and only those whose digest is not in the database yet are
+    inserted, in a single statement. Files are recorded in the IngestManifest
+    table: a file whose size and modification time are unchanged is skipped
+    without being read, and one whose content hash is unchanged is not parsed.
+    The entries of files no longer in the directory are deleted; their questions
+    are kept, since answers refer to them.
     """
+    from sqlalchemy import insert
+    from .models import IngestManifest
+
     if not os.path.exists(directory):
         print(f"Data directory not found: {directory}")
         return
 
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    questions_data = json.load(f)
-                
-                for q_data in questions_data:
-                    question_text = q_data.get('question')
-                    # Use the filename (without extension) as the category if not in the file
-                    category = q_data.get('category', os.path.splitext(filename)[0].replace('_', ' ').title())
-
-                    if not question_text or not category:
-                        continue
-
-                    # Create a unique digest for the question to prevent duplicates
-                    digest = hashlib.sha256(question_text.encode('utf-8')).hexdigest()
-
-                    # Check if the question already exists
-                    existing_question = Question.query.filter_by(digest=digest).first()
-                    if not existing_question:
-                        new_question = Question(
-                            question_text=question_text,
-                            category=category,
-                            digest=digest
-                        )
-                        db.session.add(new_question)
-
-            except (FileNotFoundError, json.JSONDecodeError) as e:
-                print(f"Error loading questions file {filename}: {e}")
+    manifest = {entry.path: entry for entry in IngestManifest.query.all()}
+    new_rows = {} # digest -> row, so a question repeated across files is inserted once
+    changed_files = []
+    existing_digests = None
+    seen_paths = set()
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        file_path = os.path.abspath(os.path.join(directory, filename))
+        seen_paths.add(file_path)
+        stat = os.stat(file_path)
+        entry = manifest.get(file_path)
+        if entry and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            continue
+
+        try:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            content_hash = hashlib.sha256(content).hexdigest()
+            if entry and entry.sha256 == content_hash:
+                # Touched but not modified
+                entry.size, entry.mtime_ns = stat.st_size, stat.st_mtime_ns
+                continue
+            questions_data = json.loads(content.decode('utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Error loading questions file {filename}: {e}")
+            continue
+
+        if existing_digests is None:
+            # Fetched once, and only when a file needs to be ingested
+            existing_digests = {row[0] for row in db.session.query(Question.digest)}
+
+        question_count = 0
+        for q_data in questions_data:
+            question_text = q_data.get('question')
+            # Use the filename (without extension) as the category if not in the file
+            category = q_data.get('category', os.path.splitext(filename)[0].replace('_', ' ').title())
+
+            if not question_text or not category:
                 continue
-    
+            question_count += 1
+
+            # Create a unique digest for the question to prevent duplicates
+            digest = hashlib.sha256(question_text.encode('utf-8')).hexdigest()
+            if digest not in existing_digests and digest not in new_rows:
+                new_rows[digest] = {'question_text': question_text, 'category': category, 'digest': digest}
+
+        changed_files.append({
+            'path': file_path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': content_hash, 'question_count': question_count,
+        })
+
+    if new_rows:
+        db.session.execute(insert(Question), list(new_rows.values()))
+    for values in changed_files:
+        entry = manifest.get(values['path'])
+        if entry:
+            for key, value in values.items():
+                setattr(entry, key, value)
+            entry.ingested_at = datetime.datetime.utcnow()
+        else:
+            db.session.add(IngestManifest(**values))
+    removed_paths = set(manifest) - seen_paths
+    for path in removed_paths:
+        db.session.delete(manifest[path])
+
     db.session.commit()
-    print("Questions loaded and database synchronized.")
+    if changed_files:
+        print(f"Questions loaded from {len(changed_files)} changed files, {len(new_rows)} new questions.")
+    else:
+        print("Questions are up to date.")
+    if removed_paths:
+        print(f"Forgot {len(removed_paths)} removed question files.")
 
 
 def select_questions(categories, num_questions, attempt_multiplier, score_multiplier):
     """
     Selects questions using a weighted random algorithm based on performance.
     Weight = (attempt_multiplier^(mean_attempts - attempts)) * (score_multiplier^(mean_score - score))
+
+    The questions are drawn one at a time with probability proportional to their weight,
+    without replacement. This is done in a single pass by giving every candidate the key
+    E / weight, with E drawn from an exponential distribution, and taking the k smallest
+    keys in increasing order, which yields exactly the same distribution.
     """
     from sqlalchemy import func
-    from .models import Answer
-    import random
-    import math
+    from .models import QuestionStats
+    import numpy as np
 
-    # Get all questions for the selected categories
-    candidate_questions = Question.query.filter(Question.category.in_(categories)).all()
+    # Per-question stats, for the candidate questions only, read from the rollup
+    candidates = db.session.query(
+        Question.id,
+        func.coalesce(QuestionStats.attempts, 0).label('attempts'),
+        QuestionStats.avg_score
+    ).outerjoin(QuestionStats, QuestionStats.question_id == Question.id)\
+     .filter(Question.category.in_(categories)).all()
 
-    if not candidate_questions:
+    if not candidates:
         return []
 
-    # Get stats for all questions to calculate means
-    stats = db.session.query(
-        Question.id,
-        func.count(Answer.id).label('attempts'),
-        func.avg(Answer.score).label('avg_score')
-    ).join(Answer, Answer.question_id == Question.id, isouter=True)\
-     .group_by(Question.id).all()
-
-    # Create a dictionary for easy lookup
-    stats_dict = {s.id: {'attempts': s.attempts, 'avg_score': s.avg_score if s.avg_score is not None else 0} for s in stats}
-
-    # Calculate mean attempts and score across all candidates
-    total_attempts = sum(s['attempts'] for s in stats_dict.values() if s['attempts'] > 0)
-    scored_questions = [s for s in stats_dict.values() if s['attempts'] > 0 and s['avg_score'] is not None]
-    
-    mean_attempts = total_attempts / len(candidate_questions) if candidate_questions else 0
-    mean_score = sum(s['avg_score'] for s in scored_questions) / len(scored_questions) if scored_questions else 3 # Default to 3 if no scores yet
-
-    weights = []
-    for q in candidate_questions:
-        q_stats = stats_dict.get(q.id, {'attempts': 0, 'avg_score': mean_score})
-        
-        attempts = q_stats.get('attempts', 0)
-        score = q_stats.get('avg_score', mean_score)
-
-        # If a question has never been answered, give it a neutral score weight
-        if attempts == 0:
-            score = mean_score
-
-        # Calculate weight components
-        attempt_weight = math.pow(attempt_multiplier, mean_attempts - attempts)
-        # A higher score_multiplier now correctly increases the weight for questions with lower scores.
-        score_weight = math.pow(score_multiplier, mean_score - score)
-        
-        final_weight = attempt_weight * score_weight
-        weights.append(final_weight)
+    # The means are taken over the whole question bank, i.e. every question with answers
+    total_attempts, mean_score = db.session.query(
+        func.sum(QuestionStats.attempts),
+        func.avg(func.coalesce(QuestionStats.avg_score, 0))
+    ).join(Question, QuestionStats.question_id == Question.id).one()
+
+    mean_attempts = (total_attempts or 0) / len(candidates)
+    mean_score = float(mean_score) if mean_score is not None else 3 # Default to 3 if no scores yet
+
+    ids = np.array([c.id for c in candidates])
+    attempts = np.array([c.attempts for c in candidates], dtype=float)
+    scores = np.array([c.avg_score if c.avg_score is not None else 0 for c in candidates], dtype=float)
+
+    # If a question has never been answered, give it a neutral score weight
+    scores[attempts == 0] = mean_score
+
+    # Weights are computed as logarithms so that large exponents cannot overflow.
+    # A higher score_multiplier increases the weight for questions with lower scores.
+    log_weights = (mean_attempts - attempts) * np.log(attempt_multiplier) \
+        + (mean_score - scores) * np.log(score_multiplier)
 
     # Ensure we don't request more questions than available
-    k = min(num_questions, len(candidate_questions))
-    
-    # Perform weighted random sampling
-    # The 'choices' function allows for replacement, so we'll loop to get unique questions.
-    selected_questions = []
-    population = list(candidate_questions)
-    
-    # Guard against empty population
-    if not population:
+    k = min(num_questions, len(candidates))
+    if k <= 0:
         return []
 
-    # Use weighted random choice to select unique questions
-    while len(selected_questions) < k and population:
-        chosen = random.choices(population, weights=weights, k=1)[0]
-        selected_questions.append(chosen)
-        
-        # Remove the chosen question and its weight to ensure uniqueness
-        idx = population.index(chosen)
-        population.pop(idx)
-        weights.pop(idx)
-
-    return selected_questions
+    # log(E / weight) for E ~ Exp(1); the k smallest keys, in order, are the draws
+    keys = np.log(np.random.default_rng().exponential(size=len(candidates))) - log_weights
+    smallest = np.argpartition(keys, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+    selected_ids = ids[smallest[np.argsort(keys[smallest])]].tolist()
+
+    questions_by_id = {q.id: q for q in Question.query.filter(Question.id.in_(selected_ids))}
+    return [questions_by_id[question_id] for question_id in selected_ids]
@@ -1,14 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, session, current_app, make_response, send_file
-from .models import Question, QuizSession, Answer
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, session, current_app, make_response, send_file, stream_with_context
+from .models import Question, QuizSession, Answer, QuestionStats, Translation, TtsAsset
 from .quiz_logic import select_questions
 from .stt import transcribe_audio
-from .evaluation import evaluate_answer
-from .audio_utils import get_audio_duration
-from .tts import generate_speech_file
-from .translate import get_translated_question, translate_question, save_translated_question, get_translated_question_path
+from .eval_cache import evaluate_answer_cached, stream_evaluation_cached
+from .pipeline import (
+    get_eval_config, build_answer_task, process_answer_tasks, save_answer_results,
+    submit_answer_for_processing, wait_for_session, in_flight_answer_ids,
+    session_has_pending_work, enqueue_answer_pipeline, enqueue_unqueued_answers,
+    open_answer_stream, get_answer_stream, append_answer_chunk, close_answer_stream, abort_answer_stream
+)
+from .stt_cache import transcription_cache_key, store_transcription
+from .translate import get_stored_translations
+from .audio_utils import probe_duration
 from . import db
+from sqlalchemy.orm import joinedload
 import os
-import concurrent.futures
+import json
 from werkzeug.utils import secure_filename
 
 main_bp = Blueprint('main', __name__)
@@ -90,22 +97,53 @@ def quiz():
     question_id = question_ids[current_index]
     question = Question.query.get_or_404(question_id)
     
-    text_dir = os.path.join(current_app.static_folder, 'text')
-    return render_template('quiz.html', question=question, current_index=current_index, total_questions=len(question_ids), get_translated_question=lambda qid: get_translated_question(qid, text_dir))
-
-@main_bp.route('/submit_answer', methods=['POST'])
-def submit_answer():
-    """Saves the audio answer and triggers the evaluation pipeline."""
+    from .tts_assets import question_audio_urls
+    alt_language = session.get('alt_language', 'en')
+    translations = get_stored_translations([question.question_text], alt_language)
+    return render_template('quiz.html', question=question, current_index=current_index, total_questions=len(question_ids),
+                           audio_urls=question_audio_urls(question, alt_language, translations),
+                           translated_text=translations.get(question.question_text))
+
+@main_bp.route('/api/quiz/manifest')
+def quiz_manifest():
+    """
+    All the questions of the active quiz, with their translation and audio URLs, so that the
+    quiz page can show the next question and fetch its audio without loading a page.
+    """
     if 'quiz_session_id' not in session:
         return jsonify({'error': 'No active quiz session'}), 400
 
-    audio_file = request.files.get('audio')
-    question_id = request.form.get('question_id')
-    session_id = session['quiz_session_id']
+    from .tts_assets import questions_audio_urls
+    question_ids = session.get('question_ids', [])
+    alt_language = session.get('alt_language', 'en')
+    questions = {q.id: q for q in Question.query.filter(Question.id.in_(question_ids))}
+    ordered = [(index, questions[question_id]) for index, question_id in enumerate(question_ids) if question_id in questions]
+    translations = get_stored_translations([q.question_text for _, q in ordered], alt_language)
+    audio_urls = questions_audio_urls([q for _, q in ordered], alt_language, translations)
+    return jsonify({
+        'session_id': session['quiz_session_id'],
+        'current_index': session.get('current_question_index', 0),
+        'alt_language': alt_language,
+        'enforce_alt_language': bool(session.get('enforce_alt_language')),
+        'results_url': url_for('main.results'),
+        'questions': [{
+            'index': index,
+            'id': q.id,
+            'text': q.question_text,
+            'category': q.category,
+            'translated_text': translations.get(q.question_text),
+            'audio': audio_urls[q.id],
+        } for index, q in ordered]
+    })
 
-    if not audio_file or not question_id:
-        return jsonify({'error': 'Missing audio file or question ID'}), 400
+def _parse_question_id(value):
+    """The question id of a form field as an int, or None when it is not a plain non-negative number."""
+    if not (value.isascii() and value.isdecimal()):
+        return None
+    return int(value)
 
+def _answer_upload_path(session_id, question_id):
+    """Returns the absolute path where the recording of an answer is stored."""
     # Create a directory for the session if it doesn't exist
     # Note: uploads are stored relative to the application's root path
     session_upload_dir = os.path.join(current_app.root_path, 'uploads', str(session_id))
@@ -113,38 +151,159 @@ def submit_answer():
 
     # Create a secure filename and the full absolute path for saving
     filename = f"question_{question_id}.webm"
-    absolute_path = os.path.join(session_upload_dir, filename)
-    
-    # Save the file
-    audio_file.save(absolute_path)
-    audio_file.close()
+    return os.path.join(session_upload_dir, filename)
 
+def _save_answer(session_id, question_id, absolute_path, answer_text=None):
+    """Creates the Answer of a saved recording and hands it to the evaluation pipeline."""
     # Generate the relative path to store in the database
     # This path is relative to the project root (one level above app root)
     project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
     relative_path = os.path.relpath(absolute_path, project_root)
 
+    # The duration is read from the container headers only, which is cheap enough to do here
+    # once and for all. When that fails it stays None, and the pipeline measures it, decoding
+    # the audio if needed, outside of the request.
+    try:
+        duration = probe_duration(absolute_path) or None
+    except Exception as e:
+        print(f"Could not read the duration of {absolute_path} from its headers: {e}")
+        duration = None
+
     # Create a new Answer record with the relative file path
     new_answer = Answer(
         session_id=session_id,
         question_id=question_id,
-        audio_file_path=relative_path
+        audio_file_path=relative_path,
+        duration=duration,
+        answer_text=answer_text
     )
     db.session.add(new_answer)
     db.session.commit()
 
+    # In pipelined and queue modes, transcription and evaluation start now instead of at /results
+    pipeline_mode = current_app.config.get('PIPELINE_MODE')
+    if pipeline_mode == 'pipelined':
+        submit_answer_for_processing(new_answer, session.get('stt_provider', 'mistral'))
+    elif pipeline_mode == 'queue':
+        enqueue_answer_pipeline(new_answer, session.get('stt_provider', 'mistral'))
+    return new_answer
+
+@main_bp.route('/submit_answer', methods=['POST'])
+def submit_answer():
+    """Saves the audio answer and triggers the evaluation pipeline."""
+    if 'quiz_session_id' not in session:
+        return jsonify({'error': 'No active quiz session'}), 400
+
+    audio_file = request.files.get('audio')
+    question_id = request.form.get('question_id')
+    session_id = session['quiz_session_id']
+
+    if not audio_file or not question_id:
+        return jsonify({'error': 'Missing audio file or question ID'}), 400
+    # The id names the upload on disk, so anything but a number is refused
+    question_id = _parse_question_id(question_id)
+    if question_id is None:
+        return jsonify({'error': 'Invalid question ID'}), 400
+
+    absolute_path = _answer_upload_path(session_id, question_id)
+    
+    # Save the file
+    audio_file.save(absolute_path)
+    audio_file.close()
+
+    _save_answer(session_id, question_id, absolute_path)
+
     return jsonify({'success': True, 'message': 'Answer saved.'})
 
+@main_bp.route('/answer_stream/start', methods=['POST'])
+def start_answer_stream():
+    """
+    Opens a streaming upload for the answer being recorded. The recorder then sends its
+    chunks to /answer_stream/<id>/chunk as they are produced and calls /finish when done,
+    so the answer can be transcribed while the user is still speaking.
+    """
+    if 'quiz_session_id' not in session:
+        return jsonify({'error': 'No active quiz session'}), 400
+
+    question_id = request.form.get('question_id')
+    if not question_id:
+        return jsonify({'error': 'Missing question ID'}), 400
+    question_id = _parse_question_id(question_id)
+    if question_id is None:
+        return jsonify({'error': 'Invalid question ID'}), 400
+
+    session_id = session['quiz_session_id']
+    stt_provider = current_app.config.get('STREAMING_STT_PROVIDER') or session.get('stt_provider', 'mistral')
+    stream_id, transcribing = open_answer_stream(
+        _answer_upload_path(session_id, question_id), session_id, question_id, stt_provider, get_eval_config()
+    )
+    return jsonify({'success': True, 'stream_id': stream_id, 'transcribing': transcribing})
+
+@main_bp.route('/answer_stream/<stream_id>/chunk', methods=['POST'])
+def append_answer_stream(stream_id):
+    """Appends one recorder chunk, sent as the raw request body with its sequence number."""
+    stream = get_answer_stream(stream_id, session.get('quiz_session_id'))
+    if stream is None:
+        return jsonify({'error': 'Unknown upload stream'}), 404
+
+    seq = request.args.get('seq', type=int)
+    if not append_answer_chunk(stream, seq, request.get_data()):
+        return jsonify({'error': f"Expected chunk {stream['next_seq']}", 'next_seq': stream['next_seq']}), 409
+    return jsonify({'success': True})
+
+@main_bp.route('/answer_stream/<stream_id>/finish', methods=['POST'])
+def finish_answer_stream(stream_id):
+    """Completes a streaming upload and saves the answer with its live transcript."""
+    if get_answer_stream(stream_id, session.get('quiz_session_id')) is None:
+        return jsonify({'error': 'Unknown upload stream'}), 404
+
+    stream, transcript = close_answer_stream(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown upload stream'}), 404
+    if stream['next_seq'] == 0:
+        return jsonify({'error': 'No audio was received'}), 400
+
+    if transcript is not None:
+        # Reprocessing the session will then reuse the live transcript
+        store_transcription(
+            transcription_cache_key(stream['audio_path'], stream['stt_provider'], get_eval_config()), transcript
+        )
+    _save_answer(stream['session_id'], stream['question_id'], stream['audio_path'], answer_text=transcript)
+
+    return jsonify({'success': True, 'message': 'Answer saved.', 'transcribed': transcript is not None})
+
+@main_bp.route('/answer_stream/<stream_id>/abort', methods=['POST'])
+def abort_answer_stream_route(stream_id):
+    """Discards a streaming upload, e.g. when the question is skipped."""
+    if get_answer_stream(stream_id, session.get('quiz_session_id')) is not None:
+        abort_answer_stream(stream_id)
+    return jsonify({'success': True})
+
+def _advance_question():
+    """
+    Moves the quiz past its current question. A JSON body may give the `index` of the question
+    being left, so that a request sent twice only advances once.
+    """
+    current_index = session.get('current_question_index', 0)
+    data = request.get_json(silent=True) or {}
+    from_index = data.get('index')
+    session['current_question_index'] = max(current_index, from_index + 1) if isinstance(from_index, int) else current_index + 1
+
+    if session['current_question_index'] >= len(session.get('question_ids', [])):
+        return {'status': 'finished', 'index': session['current_question_index'], 'url': url_for('main.results')}
+    return {'status': 'ok', 'index': session['current_question_index'], 'url': url_for('main.quiz')}
 
 @main_bp.route('/next_question', methods=['POST'])
 def next_question():
-    """Moves to the next question in the quiz."""
+    """Moves to the next question in the quiz. Answers JSON to the quiz page when it renders the questions itself."""
     if 'quiz_session_id' not in session:
+        if request.is_json:
+            return jsonify({'error': 'No active quiz session'}), 400
         return redirect(url_for('main.index'))
 
-    current_index = session.get('current_question_index', 0)
-    session['current_question_index'] = current_index + 1
-    
+    advanced = _advance_question()
+    if request.is_json:
+        return jsonify(advanced)
     return redirect(url_for('main.quiz'))
 
 @main_bp.route('/skip_question', methods=['POST'])
@@ -153,89 +312,33 @@ def skip_question():
     if 'quiz_session_id' not in session:
         return jsonify({'error': 'No active quiz session'}), 400
 
-    # Just advance the question index
-    current_index = session.get('current_question_index', 0)
-    session['current_question_index'] = current_index + 1
-
-    question_ids = session.get('question_ids', [])
-    if session['current_question_index'] >= len(question_ids):
-        return jsonify({'status': 'finished', 'url': url_for('main.results')})
-    else:
-        return jsonify({'status': 'ok', 'url': url_for('main.quiz')})
+    return jsonify(_advance_question())
 
 def _process_session_answers(session_id):
     """Helper function to run the AI pipeline for all unprocessed answers in a session."""
-    answers_to_process = Answer.query.filter_by(session_id=session_id, answer_text=None).all()
+    # Answers already handed to the background pipeline only need to be waited for
+    wait_for_session(session_id, timeout=current_app.config.get('PIPELINE_WAIT_TIMEOUT'))
+
+    in_flight = in_flight_answer_ids(session_id)
+    # Answers transcribed while they were recorded still need to be evaluated
+    answers_to_process = [
+        answer for answer in Answer.query.options(joinedload(Answer.question))
+            .filter_by(session_id=session_id, score=None).all()
+        if answer.id not in in_flight
+    ]
 
     if not answers_to_process:
         return
 
-    # Get the provider from the session before entering the thread pool
     stt_provider = session.get('stt_provider', 'mistral')
+    eval_config = get_eval_config()
 
-    eval_config = {
-        'DEEPGRAM_API_KEY': current_app.config.get('DEEPGRAM_API_KEY'),
-        'DEEPGRAM_MODEL': current_app.config.get('DEEPGRAM_MODEL'),
-        'DEEPGRAM_LANGUAGE': current_app.config.get('DEEPGRAM_LANGUAGE'),
-        'MISTRAL_API_KEY': current_app.config.get('MISTRAL_API_KEY'),
-        'OPENROUTER_API_KEY': current_app.config.get('OPENROUTER_API_KEY'),
-        'REASONING_MODEL': current_app.config.get('REASONING_MODEL'),
-        'REASONING_TEMPERATURE': current_app.config.get('REASONING_TEMPERATURE'),
-        'REASONING_TOP_K': current_app.config.get('REASONING_TOP_K'),
-        'STRUCTURED_OUTPUT_MODEL': current_app.config.get('STRUCTURED_OUTPUT_MODEL'),
-        'STRUCTURED_OUTPUT_TEMPERATURE': current_app.config.get('STRUCTURED_OUTPUT_TEMPERATURE'),
-        'STRUCTURED_OUTPUT_TOP_K': current_app.config.get('STRUCTURED_OUTPUT_TOP_K'),
-        'REASONING_CONTEXT_USER': current_app.config.get('REASONING_CONTEXT_USER'),
-        'REASONING_CONTEXT_SYSTEM': current_app.config.get('REASONING_CONTEXT_SYSTEM'),
-        'STRUCTURED_CONTEXT_USER': current_app.config.get('STRUCTURED_CONTEXT_USER'),
-        'STRUCTURED_CONTEXT_SYSTEM': current_app.config.get('STRUCTURED_CONTEXT_SYSTEM'),
-    }
-
-    project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
-    tasks = []
-    for answer in answers_to_process:
-        absolute_audio_path = os.path.join(project_root, answer.audio_file_path)
-        tasks.append({
-            "answer_id": answer.id,
-            "audio_path": absolute_audio_path,
-            "question_text": answer.question.question_text,
-            "category": answer.question.category,
-            "stt_provider": stt_provider  # Pass the provider to the task
-        })
-
-    def process_single_answer(task_data):
-        try:
-            duration = get_audio_duration(task_data["audio_path"])
-            # Pass the provider to the transcription function
-            transcribed_text = transcribe_audio(
-                task_data["audio_path"], 
-                eval_config, 
-                provider=task_data["stt_provider"]
-            )
-            evaluation_result = evaluate_answer(
-                task_data["question_text"], transcribed_text, task_data["category"], eval_config, duration
-            )
-            return {
-                "answer_id": task_data["answer_id"], "duration": duration,
-                "answer_text": transcribed_text, "score": evaluation_result.get("score"),
-                "justification": evaluation_result.get("justification")
-            }
-        except Exception as e:
-            print(f"Error processing answer {task_data['answer_id']}: {e}")
-            return {"answer_id": task_data['answer_id'], "justification": f"An error occurred: {e}"}
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        results = list(executor.map(process_single_answer, tasks))
-
-    for result in results:
-        answer = Answer.query.get(result["answer_id"])
-        if answer:
-            answer.duration = result.get("duration")
-            answer.answer_text = result.get("answer_text")
-            answer.score = result.get("score")
-            answer.justification = result.get("justification")
-    
+    tasks = [build_answer_task(answer, stt_provider) for answer in answers_to_process]
+    # Hand the connection back to the pool while the providers are called
     db.session.commit()
+    results = process_answer_tasks(tasks, eval_config)
+
+    save_answer_results(results)
 
 @main_bp.route('/results')
 def results():
@@ -244,17 +347,32 @@ def results():
     if not session_id:
         return redirect(url_for('main.index'))
 
-    _process_session_answers(session_id)
+    if current_app.config.get('PIPELINE_MODE') == 'queue':
+        # Workers do the processing; this request only makes sure everything is queued
+        enqueue_unqueued_answers(session_id, session.get('stt_provider', 'mistral'))
+        pending = session_has_pending_work(session_id)
+    else:
+        _process_session_answers(session_id)
+        pending = False
     
-    final_answers = Answer.query.filter_by(session_id=session_id).order_by(Answer.id).all()
-    response = make_response(render_template('results.html', answers=final_answers, session_id=session_id))
+    final_answers = Answer.query.options(joinedload(Answer.question))\
+        .filter_by(session_id=session_id).order_by(Answer.id).all()
+    response = make_response(render_template('results.html', answers=final_answers, session_id=session_id, pending=pending))
     
-    session.pop('quiz_session_id', None)
-    session.pop('question_ids', None)
-    session.pop('current_question_index', None)
+    # Keep the quiz in the session while results are pending so that the page can poll
+    if not pending:
+        session.pop('quiz_session_id', None)
+        session.pop('question_ids', None)
+        session.pop('current_question_index', None)
     
     return response
 
+@main_bp.route('/tts/<filename>')
+def serve_tts_asset(filename):
+    """Serves a published question audio file. Its name is its content hash, so it is cached forever."""
+    from .tts_assets import send_tts_asset
+    return send_tts_asset(filename)
+
 @main_bp.route('/uploads/<int:session_id>/<int:answer_id>')
 def serve_audio(session_id, answer_id):
     """Serves the audio file for a specific answer."""
@@ -268,83 +386,110 @@ def serve_audio(session_id, answer_id):
 
 @main_bp.route('/sessions')
 def sessions_list():
-    """Displays a list of all past quiz sessions with aggregated stats."""
-    from sqlalchemy import func, desc
-    from sqlalchemy.orm import aliased
-
-    # Alias for a subquery to get the last score
-    last_answer_subquery = db.session.query(
-        Answer.session_id,
-        func.max(Answer.timestamp).label('last_timestamp')
-    ).group_by(Answer.session_id).subquery()
-
-    last_answer = aliased(Answer)
-
-    sessions_with_stats = db.session.query(
-        QuizSession,
-        func.count(Answer.id).label('num_questions'),
-        func.avg(Answer.score).label('avg_score'),
-        func.max(Answer.score).label('max_score'),
-        func.avg(Answer.duration).label('avg_duration')
-    ).outerjoin(Answer, QuizSession.id == Answer.session_id)\
-     .group_by(QuizSession.id)\
-     .order_by(desc(QuizSession.start_time))\
-     .all()
-
-    # The query returns tuples, so we need to combine them
-    sessions = []
-    for session_obj, num_q, avg_s, max_s, avg_d in sessions_with_stats:
-        session_obj.num_questions = num_q
-        session_obj.avg_score = avg_s
-        session_obj.max_score = max_s
-        session_obj.avg_duration = avg_d
-        sessions.append(session_obj)
-
-    return render_template('sessions.html', sessions=sessions)
+    """Displays the list of past quiz sessions. The rows are loaded page by page from /api/sessions."""
+    return render_template('sessions.html')
+
+# Sort orders of /api/sessions. Both are served by an index: ix_quiz_session_start_time, and the primary key.
+SESSION_SORTS = {
+    'start_time': QuizSession.start_time,
+    'id': QuizSession.id,
+}
+
+@main_bp.route('/api/sessions')
+def api_sessions():
+    """
+    A page of sessions with their aggregated stats, as JSON.
+
+    Query parameters: sort (start_time or id), order (asc or desc), limit, cursor (the
+    next_cursor of the previous page), date_from and date_to (start time, ISO dates or
+    datetimes, date_to excluded), min_score and max_score (average score, inclusive).
+    """
+    from sqlalchemy import func, select
+    from .pagination import keyset_page, page_size, parse_date, PaginationError
+
+    sort = request.args.get('sort', 'start_time')
+    if sort not in SESSION_SORTS:
+        return jsonify({'error': f"Unknown sort: {sort}"}), 400
+    descending = request.args.get('order', 'desc') != 'asc'
+
+    # Correlated subqueries, evaluated only for the sessions of the page (and of the score
+    # filter), each one a lookup in ix_answer_session_id_timestamp
+    def session_aggregate(aggregate):
+        return select(aggregate).where(Answer.session_id == QuizSession.id).scalar_subquery()
+    num_questions = session_aggregate(func.count(Answer.id))
+    avg_score = session_aggregate(func.avg(Answer.score))
+    max_score = session_aggregate(func.max(Answer.score))
+    avg_duration = session_aggregate(func.avg(Answer.duration))
+
+    try:
+        query = db.session.query(QuizSession, num_questions, avg_score, max_score, avg_duration)
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'), end_of_day=True)
+        if date_from:
+            query = query.filter(QuizSession.start_time >= date_from)
+        if date_to:
+            query = query.filter(QuizSession.start_time < date_to)
+        min_score = request.args.get('min_score', type=float)
+        max_score_filter = request.args.get('max_score', type=float)
+        if min_score is not None:
+            query = query.filter(avg_score >= min_score)
+        if max_score_filter is not None:
+            query = query.filter(avg_score <= max_score_filter)
+
+        sort_column = SESSION_SORTS[sort]
+        rows, next_cursor = keyset_page(
+            query, sort_column, QuizSession.id, descending,
+            request.args.get('cursor'), page_size(request.args.get('limit', type=int)),
+            sort_key=lambda row: (getattr(row[0], sort), row[0].id)
+        )
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    items = [{
+        'id': quiz_session.id,
+        'start_time': quiz_session.start_time.isoformat() if quiz_session.start_time else None,
+        'num_questions': num_q,
+        'avg_score': avg_s,
+        'max_score': max_s,
+        'avg_duration': avg_d,
+        'links': {
+            'view': url_for('main.session_detail', session_id=quiz_session.id),
+            'export': url_for('main.export_session', session_id=quiz_session.id),
+            'reprocess': url_for('main.reprocess_session', session_id=quiz_session.id),
+            'delete': url_for('main.delete_session', session_id=quiz_session.id),
+        },
+    } for quiz_session, num_q, avg_s, max_s, avg_d in rows]
+    return jsonify({'items': items, 'next_cursor': next_cursor})
 
 @main_bp.route('/session/<int:session_id>')
 def session_detail(session_id):
     """Displays the detailed results for a specific session."""
-    quiz_session = QuizSession.query.get_or_404(session_id)
-    return render_template('results.html', answers=quiz_session.answers, session_id=session_id)
-
-def _get_eval_config():
-    """Helper to get the full evaluation configuration from the app config."""
-    return {
-        'DEEPGRAM_API_KEY': current_app.config.get('DEEPGRAM_API_KEY'),
-        'DEEPGRAM_MODEL': current_app.config.get('DEEPGRAM_MODEL'),
-        'DEEPGRAM_LANGUAGE': current_app.config.get('DEEPGRAM_LANGUAGE'),
-        'MISTRAL_API_KEY': current_app.config.get('MISTRAL_API_KEY'),
-        'DEEPGRAM_MAX_RETRIES': current_app.config.get('DEEPGRAM_MAX_RETRIES', 3),
-        'DEEPGRAM_RETRY_DELAY': current_app.config.get('DEEPGRAM_RETRY_DELAY', 1),
-        'OPENROUTER_API_KEY': current_app.config.get('OPENROUTER_API_KEY'),
-        'REASONING_MODEL': current_app.config.get('REASONING_MODEL'),
-        'REASONING_TEMPERATURE': current_app.config.get('REASONING_TEMPERATURE'),
-        'REASONING_TOP_K': current_app.config.get('REASONING_TOP_K'),
-        'STRUCTURED_OUTPUT_MODEL': current_app.config.get('STRUCTURED_OUTPUT_MODEL'),
-        'STRUCTURED_OUTPUT_TEMPERATURE': current_app.config.get('STRUCTURED_OUTPUT_TEMPERATURE'),
-        'STRUCTURED_OUTPUT_TOP_K': current_app.config.get('STRUCTURED_OUTPUT_TOP_K'),
-        'OPENROUTER_MAX_RETRIES': current_app.config.get('OPENROUTER_MAX_RETRIES', 3),
-        'REASONING_CONTEXT_USER': current_app.config.get('REASONING_CONTEXT_USER'),
-        'REASONING_CONTEXT_SYSTEM': current_app.config.get('REASONING_CONTEXT_SYSTEM'),
-        'STRUCTURED_CONTEXT_USER': current_app.config.get('STRUCTURED_CONTEXT_USER'),
-        'STRUCTURED_CONTEXT_SYSTEM': current_app.config.get('STRUCTURED_CONTEXT_SYSTEM'),
-    }
+    QuizSession.query.get_or_404(session_id)
+    answers = Answer.query.options(joinedload(Answer.question))\
+        .filter_by(session_id=session_id).order_by(Answer.id).all()
+    return render_template('results.html', answers=answers, session_id=session_id, pending=session_has_pending_work(session_id))
+
+def _bypass_cache_requested():
+    """True when the client asked to skip the caches, with ?force=1 or {"force": true}."""
+    if request.args.get('force') in ('1', 'true'):
+        return True
+    payload = request.get_json(silent=True) or {}
+    return bool(payload.get('force'))
 
 def _reevaluate_and_save(answer, duration=None):
     """Helper function to re-evaluate an answer and save it."""
-    eval_config = _get_eval_config()
+    eval_config = get_eval_config()
     
     # If duration is not provided, try to get it from the answer object
     if duration is None:
         duration = answer.duration
 
-    evaluation_result = evaluate_answer(
-        answer.question.question_text,
+    evaluation_result = evaluate_answer_cached(
+        answer.question,
         answer.answer_text,
-        answer.question.category,
         eval_config,
-        duration
+        duration,
+        bypass=_bypass_cache_requested()
     )
     answer.score = evaluation_result.get("score")
     answer.justification = evaluation_result.get("justification")
@@ -355,7 +500,7 @@ def _reevaluate_and_save(answer, duration=None):
 def re_transcribe(answer_id):
     """Re-runs transcription and evaluation for a single answer."""
     answer = Answer.query.get_or_404(answer_id)
-    eval_config = _get_eval_config()
+    eval_config = get_eval_config()
     
     if not answer.audio_file_path:
         return jsonify({"success": False, "error": "No audio file available for this answer."}), 400
@@ -366,8 +511,9 @@ def re_transcribe(answer_id):
     # Get the provider from the session
     stt_provider = session.get('stt_provider', 'mistral')
 
-    # Re-transcribe, passing the provider
-    transcribed_text = transcribe_audio(absolute_path, eval_config, provider=stt_provider)
+    # Re-transcribe, passing the provider. This is an explicit request for a new
+    # transcript, so the transcription cache is bypassed and refreshed.
+    transcribed_text = transcribe_audio(absolute_path, eval_config, provider=stt_provider, force=True)
     answer.answer_text = transcribed_text
     
     # Re-evaluate
@@ -415,100 +561,217 @@ def edit_transcription(answer_id):
         "justification": updated_answer.justification
     })
 
+def _sse(event, data):
+    """Formats a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _reevaluation_events(answer_id, bypass, audio_path=None, stt_provider=None):
+    """
+    Re-evaluates an answer and saves it, as Server-Sent Events:
+    'transcript' once a new transcription is ready (when `audio_path` is given),
+    'token' for each piece of the justification, then 'result' or 'error'.
+    """
+    # The stream outlives the view's database session, so the answer is loaded again here
+    answer = Answer.query.get(answer_id)
+    eval_config = get_eval_config()
+    try:
+        if audio_path:
+            answer.answer_text = transcribe_audio(audio_path, eval_config, provider=stt_provider, force=True)
+            db.session.commit()
+            yield _sse('transcript', {"answer_text": answer.answer_text})
+
+        events = stream_evaluation_cached(answer.question, answer.answer_text, eval_config, answer.duration, bypass=bypass)
+        for event, data in events:
+            if event == 'token':
+                yield _sse('token', {"text": data})
+                continue
+            answer.score = data.get("score")
+            answer.justification = data.get("justification")
+            db.session.commit()
+            yield _sse('result', {
+                "success": True,
+                "answer_text": answer.answer_text,
+                "score": answer.score,
+                "justification": answer.justification
+            })
+    except Exception as e:
+        print(f"Error while streaming the evaluation of answer {answer_id}: {e}")
+        yield _sse('error', {"success": False, "error": str(e)})
+
+def _event_stream(events):
+    # Proxies such as nginx must not buffer the stream
+    return current_app.response_class(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main_bp.route('/re-evaluate/<int:answer_id>/stream', methods=['POST'])
+def re_evaluate_stream(answer_id):
+    """Streaming variant of re_evaluate(), sending the justification as it is generated."""
+    answer = Answer.query.get_or_404(answer_id)
+
+    if not answer.answer_text:
+        return jsonify({"success": False, "error": "No transcription available to evaluate."}), 400
+
+    return _event_stream(_reevaluation_events(answer.id, _bypass_cache_requested()))
+
+@main_bp.route('/re-transcribe/<int:answer_id>/stream', methods=['POST'])
+def re_transcribe_stream(answer_id):
+    """Streaming variant of re_transcribe()."""
+    answer = Answer.query.get_or_404(answer_id)
+
+    if not answer.audio_file_path:
+        return jsonify({"success": False, "error": "No audio file available for this answer."}), 400
+
+    project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
+    absolute_path = os.path.join(project_root, answer.audio_file_path)
+    stt_provider = session.get('stt_provider', 'mistral')
+
+    return _event_stream(_reevaluation_events(
+        answer.id, _bypass_cache_requested(), audio_path=absolute_path, stt_provider=stt_provider
+    ))
+
+@main_bp.route('/edit-transcription/<int:answer_id>/stream', methods=['POST'])
+def edit_transcription_stream(answer_id):
+    """Streaming variant of edit_transcription()."""
+    answer = Answer.query.get_or_404(answer_id)
+    new_text = request.json.get('text')
+
+    if new_text is None:
+        return jsonify({"success": False, "error": "No text provided."}), 400
+
+    answer.answer_text = new_text
+    db.session.commit()
+    return _event_stream(_reevaluation_events(answer.id, _bypass_cache_requested()))
+
 @main_bp.route('/reprocess_session/<int:session_id>', methods=['POST'])
 def reprocess_session(session_id):
     """Clears and re-runs the evaluation for all answers in a session."""
     answers_to_reprocess = Answer.query.filter_by(session_id=session_id).all()
+    # The duration only depends on the recording, so it is kept
     for answer in answers_to_reprocess:
         answer.answer_text = None
         answer.score = None
         answer.justification = None
-        answer.duration = None
     db.session.commit()
 
     # Now, trigger the processing and redirect to the results page
-    _process_session_answers(session_id)
+    if current_app.config.get('PIPELINE_MODE') == 'queue':
+        for answer in answers_to_reprocess:
+            enqueue_answer_pipeline(answer, session.get('stt_provider', 'mistral'), commit=False)
+        db.session.commit()
+    else:
+        _process_session_answers(session_id)
     return redirect(url_for('main.session_detail', session_id=session_id))
 
 @main_bp.route('/questions')
 def questions_list():
-    """Displays a list of all questions and their stats."""
-    from sqlalchemy import func, desc, case
-    from sqlalchemy.orm import aliased
-
-    show_unanswered = request.args.get('show_unanswered')
-
-    # Subquery to find the last answer for each question
-    last_answer_subquery = db.session.query(
-        Answer.question_id,
-        func.max(Answer.timestamp).label('last_timestamp')
-    ).group_by(Answer.question_id).subquery()
-
-    last_answer = aliased(Answer)
-
-    # Base query for question stats
-    question_stats_sq = db.session.query(
-        Question.id.label('question_id'),
-        func.count(Answer.id).label('times_answered'),
-        func.avg(Answer.score).label('avg_score'),
-        func.max(Answer.score).label('max_score')
-    ).join(Answer, Question.id == Answer.question_id)\
-     .group_by(Question.id).subquery()
-
-    # Main query combining question info with stats
-    query = db.session.query(
-        Question,
-        question_stats_sq.c.times_answered,
-        question_stats_sq.c.avg_score,
-        question_stats_sq.c.max_score,
-        func.avg(Answer.duration).label('avg_duration'),
-        func.min(Answer.duration).label('min_duration'),
-        last_answer.duration.label('last_duration'),
-        last_answer.score.label('last_score')
-    ).outerjoin(question_stats_sq, Question.id == question_stats_sq.c.question_id)\
-     .outerjoin(Answer, Question.id == Answer.question_id)\
-     .outerjoin(last_answer_subquery, Question.id == last_answer_subquery.c.question_id)\
-     .outerjoin(last_answer, (last_answer.question_id == last_answer_subquery.c.question_id) & (last_answer.timestamp == last_answer_subquery.c.last_timestamp))\
-     .group_by(Question.id)
-
-    if not show_unanswered:
-        query = query.filter(question_stats_sq.c.times_answered > 0)
-
-    questions_with_stats = query.order_by(Question.id).all()
-     
-    questions = []
-    for row in questions_with_stats:
-        q_obj = row[0]
-        q_obj.times_answered = row[1] or 0
-        q_obj.avg_score = row[2]
-        q_obj.max_score = row[3]
-        q_obj.avg_duration = row[4]
-        q_obj.min_duration = row[5]
-        q_obj.last_duration = row[6]
-        q_obj.last_score = row[7]
-        questions.append(q_obj)
-
-    # Calculate overall metrics
-    answered_once = db.session.query(func.count(question_stats_sq.c.question_id)).filter(question_stats_sq.c.times_answered >= 1).scalar()
-    answered_twice = db.session.query(func.count(question_stats_sq.c.question_id)).filter(question_stats_sq.c.times_answered >= 2).scalar()
-    
-    answered_twice_low_score = db.session.query(func.count(question_stats_sq.c.question_id)).filter(
-        question_stats_sq.c.times_answered >= 2,
-        question_stats_sq.c.avg_score < 4
-    ).scalar()
+    """Displays the overall metrics and the list of questions, loaded page by page from /api/questions."""
+    from sqlalchemy import func
 
-    max_score_high = db.session.query(func.count(question_stats_sq.c.question_id)).filter(
-        question_stats_sq.c.max_score >= 4
-    ).scalar()
+    # Calculate overall metrics, from the rollup maintained by question_stats.py
+    def count_stats(*criteria):
+        return db.session.query(func.count(QuestionStats.question_id)).filter(*criteria).scalar()
 
     metrics = {
-        'answered_once': answered_once,
-        'answered_twice': answered_twice,
-        'answered_twice_low_score': answered_twice_low_score,
-        'max_score_high': max_score_high
+        'answered_once': count_stats(QuestionStats.attempts >= 1),
+        'answered_twice': count_stats(QuestionStats.attempts >= 2),
+        'answered_twice_low_score': count_stats(QuestionStats.attempts >= 2, QuestionStats.avg_score < 4),
+        'max_score_high': count_stats(QuestionStats.max_score >= 4)
     }
-        
-    return render_template('questions.html', questions=questions, metrics=metrics)
+    categories = [c[0] for c in db.session.query(Question.category).distinct().order_by(Question.category)]
+
+    return render_template('questions.html', metrics=metrics, categories=categories)
+
+# Sort orders of /api/questions, each served by an index (see models.py)
+QUESTION_SORTS = {
+    'id': Question.id,
+    'category': Question.category,
+    'attempts': QuestionStats.attempts,
+    'avg_score': QuestionStats.avg_score,
+    'max_score': QuestionStats.max_score,
+    'last_answered_at': QuestionStats.last_answered_at,
+}
+
+@main_bp.route('/api/questions')
+def api_questions():
+    """
+    A page of questions with their stats, as JSON.
+
+    Query parameters: sort (see QUESTION_SORTS), order (asc or desc), limit, cursor (the
+    next_cursor of the previous page), category, q (text search), min_score and max_score
+    (average score, inclusive), date_from and date_to (last answer, ISO dates or datetimes,
+    date_to excluded), include_unanswered (true to list questions never answered).
+    """
+    from .pagination import keyset_page, page_size, parse_date, PaginationError
+
+    sort = request.args.get('sort', 'id')
+    if sort not in QUESTION_SORTS:
+        return jsonify({'error': f"Unknown sort: {sort}"}), 400
+    descending = request.args.get('order', 'asc') == 'desc'
+
+    include_unanswered = request.args.get('include_unanswered') == 'true'
+    query = db.session.query(Question, QuestionStats)
+    if include_unanswered:
+        query = query.outerjoin(QuestionStats, Question.id == QuestionStats.question_id)
+    else:
+        query = query.join(QuestionStats, Question.id == QuestionStats.question_id)
+
+    try:
+        category = request.args.get('category')
+        if category:
+            query = query.filter(Question.category == category)
+        text = request.args.get('q')
+        if text:
+            query = query.filter(Question.question_text.contains(text, autoescape=True))
+        min_score = request.args.get('min_score', type=float)
+        max_score = request.args.get('max_score', type=float)
+        if min_score is not None:
+            query = query.filter(QuestionStats.avg_score >= min_score)
+        if max_score is not None:
+            query = query.filter(QuestionStats.avg_score <= max_score)
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'), end_of_day=True)
+        if date_from:
+            query = query.filter(QuestionStats.last_answered_at >= date_from)
+        if date_to:
+            query = query.filter(QuestionStats.last_answered_at < date_to)
+
+        sort_column = QUESTION_SORTS[sort]
+        # The indexes on question_stats end with its primary key, which therefore breaks the
+        # ties; it is NULL for unanswered questions, which are ordered by question id instead
+        if sort_column.class_ is QuestionStats and not include_unanswered:
+            id_column = QuestionStats.question_id
+        else:
+            id_column = Question.id
+        def sort_key(row):
+            question, stats = row
+            if sort in ('id', 'category'):
+                return getattr(question, sort), question.id
+            return (getattr(stats, sort) if stats else None), question.id
+        rows, next_cursor = keyset_page(
+            query, sort_column, id_column, descending,
+            request.args.get('cursor'), page_size(request.args.get('limit', type=int)), sort_key
+        )
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    items = [{
+        'id': question.id,
+        'question_text': question.question_text,
+        'category': question.category,
+        'times_answered': stats.attempts if stats else 0,
+        'avg_score': stats.avg_score if stats else None,
+        'max_score': stats.max_score if stats else None,
+        'avg_duration': stats.avg_duration if stats else None,
+        'min_duration': stats.min_duration if stats else None,
+        'last_duration': stats.last_duration if stats else None,
+        'last_score': stats.last_score if stats else None,
+        'last_answered_at': stats.last_answered_at.isoformat() if stats and stats.last_answered_at else None,
+        'url': url_for('main.question_detail', question_id=question.id),
+    } for question, stats in rows]
+    return jsonify({'items': items, 'next_cursor': next_cursor})
 
 @main_bp.route('/categories')
 def categories_summary():
@@ -517,20 +780,26 @@ def categories_summary():
 
     last_n_sessions = request.args.get('last_n_sessions', type=int)
 
-    # Subquery to get question-level stats
-    question_stats_sq = db.session.query(
-        Question.id.label('question_id'),
-        Question.category,
-        func.count(Answer.id).label('times_answered'),
-        func.avg(Answer.score).label('avg_score'),
-        func.max(Answer.score).label('max_score')
-    ).join(Answer, Question.id == Answer.question_id)
-
+    # Question-level stats: all time from the rollup, or aggregated from the answers of the latest sessions
     if last_n_sessions:
         latest_session_ids = [s.id for s in db.session.query(QuizSession.id).order_by(desc(QuizSession.start_time)).limit(last_n_sessions).all()]
-        question_stats_sq = question_stats_sq.filter(Answer.session_id.in_(latest_session_ids))
-    
-    question_stats_sq = question_stats_sq.group_by(Question.id).subquery()
+        question_stats_sq = db.session.query(
+            Question.id.label('question_id'),
+            Question.category,
+            func.count(Answer.id).label('times_answered'),
+            func.avg(Answer.score).label('avg_score'),
+            func.max(Answer.score).label('max_score')
+        ).join(Answer, Question.id == Answer.question_id)\
+         .filter(Answer.session_id.in_(latest_session_ids))\
+         .group_by(Question.id).subquery()
+    else:
+        question_stats_sq = db.session.query(
+            QuestionStats.question_id,
+            Question.category,
+            QuestionStats.attempts.label('times_answered'),
+            QuestionStats.avg_score,
+            QuestionStats.max_score
+        ).join(Question, Question.id == QuestionStats.question_id).subquery()
 
     # Main query to aggregate by category
     category_stats_query = db.session.query(
@@ -549,119 +818,76 @@ def categories_summary():
 
 @main_bp.route('/reset_database', methods=['POST'])
 def reset_database():
-    """Drops all data, recreates tables, and reloads questions."""
-    db.drop_all()
-    db.create_all()
-    from .quiz_logic import load_questions_from_json
-    questions_dir = current_app.config.get('QUESTIONS_DIR')
-    if questions_dir:
-        load_questions_from_json(questions_dir)
+    """Drops all data, except the translation and audio store, recreates tables, and reloads questions."""
+    from .commands import init_database, ingest_questions
+    # The store is keyed by content, so it stays valid when the questions get new ids
+    kept = {Translation.__table__, TtsAsset.__table__}
+    db.metadata.drop_all(bind=db.engine, tables=[table for table in db.metadata.sorted_tables if table not in kept])
+    init_database()
+    ingest_questions()
     return redirect(url_for('main.index'))
 
 @main_bp.route('/generate-audio', methods=['POST'])
 def generate_audio():
-    """Generates audio files for all questions."""
-    questions = Question.query.all()
-    created_count = 0
-    skipped_count = 0
-    failed_count = 0
-
-    token = current_app.config.get('SPEECHIFY_API_TOKEN')
-    audio_dir = current_app.config.get('TTS_AUDIO_DIR')
-    if not os.path.exists(audio_dir):
-        os.makedirs(audio_dir)
-
-
-    for question in questions:
-        file_path, status = generate_speech_file(question.id, question.question_text, token, audio_dir)
-        if status == 'created':
-            created_count += 1
-        elif status == 'skipped':
-            skipped_count += 1
-        else:
-            failed_count += 1
-    
-    return jsonify({
-        'success': True, 
-        'message': f'Audio generation complete. Created: {created_count}, Skipped: {skipped_count}, Failed: {failed_count}'
-    })
+    """Starts generating the audio files of all questions in the background."""
+    from .tts_batch import start_tts_batch
+    return _tts_batch_started(start_tts_batch())
+
 @main_bp.route('/generate-alt-audio', methods=['POST'])
 def generate_alt_audio():
-    """Generates audio files for all questions in the alternative language."""
-    questions = Question.query.all()
-    created_count = 0
-    skipped_count = 0
-    failed_count = 0
-
-    alt_language = session.get('alt_language', 'en')
-    api_key = current_app.config.get('OPENROUTER_API_KEY')
-    text_dir = os.path.join(current_app.static_folder, 'text')
-    token = current_app.config.get('SPEECHIFY_API_TOKEN')
-    audio_dir = current_app.config.get('TTS_AUDIO_DIR')
-    if not os.path.exists(audio_dir):
-        os.makedirs(audio_dir)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=25) as executor:
-        futures = []
-        for q in questions:
-            if not os.path.exists(get_translated_question_path(q.id, text_dir)):
-                print(f"Translate question {q.id}")
-                futures.append(executor.submit(translate_question, q.id, q.question_text, api_key, alt_language))
-
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                q = future.result()
-                save_translated_question(q["id"], q["text"], text_dir)
-            except Exception as exc:
-                print(f'A question generated an exception: {exc}')
-        futures2 = []
-        # Second pass for audio generation for existing translations
-        for q in questions:
-            translated_text = get_translated_question(q.id, text_dir)
-            if translated_text:
-                futures2.append(executor.submit(generate_speech_file, q.id, translated_text, token, audio_dir, True))
-        for future in concurrent.futures.as_completed(futures2):
-            file_path_alt, status_alt = future.result()
-            if status_alt == 'created':
-                created_count += 1
-            elif status_alt == 'skipped':
-                skipped_count += 1
-            else:
-                failed_count += 1
-
+    """Starts translating all questions and generating their audio files in the background."""
+    from .tts_batch import start_tts_batch
+    return _tts_batch_started(start_tts_batch(is_alt=True, language=session.get('alt_language', 'en')))
 
+def _tts_batch_started(batch):
+    from .tts_batch import batch_progress
     return jsonify({
-        'success': True, 
-        'message': f'Alternate audio generation complete. Created: {created_count}, Skipped: {skipped_count}, Failed: {failed_count}'
-    })
+        'success': True,
+        'message': f'Audio generation running in the background ({batch.total} questions).',
+        'progress_url': url_for('main.tts_batch_progress', batch_id=batch.id),
+        'batch': batch_progress(batch)
+    }), 202
+
+@main_bp.route('/generate-audio/<int:batch_id>')
+def tts_batch_progress(batch_id):
+    """The progress of an audio generation batch: created, skipped and failed counts."""
+    from .models import TtsBatch
+    from .tts_batch import batch_progress
+    return jsonify(batch_progress(TtsBatch.query.get_or_404(batch_id)))
 
 @main_bp.route('/export_session/<int:session_id>')
 def export_session(session_id):
     """Exports a session's data to a JSON file."""
+    from .export import session_record, session_answer_rows
     session = QuizSession.query.get_or_404(session_id)
-    
-    session_data = {
-        "session_id": session.id,
-        "start_time": session.start_time.isoformat(),
-        "config": session.config,
-        "answers": []
-    }
-
-    for answer in session.answers:
-        session_data["answers"].append({
-            "question_id": answer.question_id,
-            "question_text": answer.question.question_text,
-            "category": answer.question.category,
-            "answer_text": answer.answer_text,
-            "score": answer.score,
-            "justification": answer.justification,
-            "duration": answer.duration,
-            "timestamp": answer.timestamp.isoformat()
-        })
+    session_data = session_record(session, session_answer_rows([session_id]))
 
     response = jsonify(session_data)
     response.headers['Content-Disposition'] = f'attachment; filename=session_{session_id}.json'
     return response
 
+@main_bp.route('/export')
+def export_all():
+    """
+    Streams every session and its answers as NDJSON, one session per line in the format of
+    /export_session, read in batches of EXPORT_BATCH_SIZE sessions. `date_from` and `date_to`
+    restrict the export to the sessions started in that range.
+    """
+    from .export import iter_ndjson
+    from .pagination import parse_date, PaginationError
+    try:
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'), end_of_day=True)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 200)
+    response = current_app.response_class(
+        stream_with_context(iter_ndjson(batch_size, date_from, date_to)),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = 'attachment; filename=sessions.ndjson'
+    return response
+
 @main_bp.route('/delete_session/<int:session_id>', methods=['POST'])
 def delete_session(session_id):
     """Deletes a session and all its associated answers."""
@@ -670,39 +896,77 @@ def delete_session(session_id):
     db.session.commit()
     return redirect(url_for('main.sessions_list'))
 
+# Answers shown per page in the history of a question
+QUESTION_HISTORY_PAGE_SIZE = 20
+
+def _question_answers_page(question_id, cursor=None):
+    """A page of the answers to a question, latest first, and the cursor of the next one."""
+    from .pagination import keyset_page
+    query = Answer.query.filter(Answer.question_id == question_id)
+    return keyset_page(
+        query, Answer.timestamp, Answer.id, True, cursor, QUESTION_HISTORY_PAGE_SIZE,
+        sort_key=lambda answer: (answer.timestamp, answer.id)
+    )
+
 @main_bp.route('/question/<int:question_id>')
 def question_detail(question_id):
-    """Displays a detailed view of a single question and all its answers."""
-    from sqlalchemy import func, desc
-
+    """Displays a detailed view of a single question, its statistics and the latest answers."""
     question = Question.query.get_or_404(question_id)
-    
-    # Query for all answers to this question, ordered by timestamp
-    answers = Answer.query.filter_by(question_id=question_id).order_by(desc(Answer.timestamp)).all()
-    
-    # Calculate statistics
-    num_attempts = len(answers)
-    if num_attempts > 0:
-        avg_score = sum(a.score for a in answers if a.score is not None) / num_attempts
-        last_answer = answers[0]
-        last_score = last_answer.score
-        avg_duration = sum(a.duration for a in answers if a.duration is not None) / num_attempts
-        last_duration = last_answer.duration
-    else:
-        avg_score = 0
-        last_score = None
-        avg_duration = 0
-        last_duration = None
 
+    # Statistics from the rollup maintained by question_stats.py. Like SQL's AVG, its averages
+    # leave out the answers that have no score or no duration.
+    question_stats = QuestionStats.query.get(question_id)
     stats = {
-        'num_attempts': num_attempts,
-        'avg_score': avg_score,
-        'last_score': last_score,
-        'avg_duration': avg_duration,
-        'last_duration': last_duration,
+        'num_attempts': question_stats.attempts if question_stats else 0,
+        'avg_score': question_stats.avg_score if question_stats else None,
+        'last_score': question_stats.last_score if question_stats else None,
+        'avg_duration': question_stats.avg_duration if question_stats else None,
+        'last_duration': question_stats.last_duration if question_stats else None,
     }
 
-    return render_template('question_detail.html', question=question, answers=answers, stats=stats)
+    answers, next_cursor = _question_answers_page(question_id)
+    return render_template('question_detail.html', question=question, answers=answers, stats=stats, next_cursor=next_cursor)
+
+@main_bp.route('/question/<int:question_id>/answers')
+def question_answers(question_id):
+    """The next page of a question's answer history, rendered, as JSON: {"html": ..., "next_cursor": ...}."""
+    from .pagination import PaginationError
+    Question.query.get_or_404(question_id)
+    try:
+        answers, next_cursor = _question_answers_page(question_id, request.args.get('cursor'))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    html = render_template('_question_answers.html', answers=answers)
+    return jsonify({'html': html, 'next_cursor': next_cursor})
+
+# Points returned by /api/questions/<id>/history when no limit is given, and at most
+QUESTION_SERIES_DEFAULT_POINTS = 500
+QUESTION_SERIES_MAX_POINTS = 5000
+
+@main_bp.route('/api/questions/<int:question_id>/history')
+def api_question_history(question_id):
+    """
+    The score and duration of the latest answers to a question, oldest first, for charting.
+    The series are parallel arrays: {"t": [unix seconds], "score": [...], "duration": [...]},
+    with null where an answer has no score or duration. `limit` sets the number of points.
+    """
+    import calendar
+    from sqlalchemy import desc
+    Question.query.get_or_404(question_id)
+    limit = max(1, min(request.args.get('limit', QUESTION_SERIES_DEFAULT_POINTS, type=int), QUESTION_SERIES_MAX_POINTS))
+
+    # Only the three columns are read, latest first through ix_answer_question_id_timestamp
+    rows = db.session.query(Answer.timestamp, Answer.score, Answer.duration)\
+        .filter(Answer.question_id == question_id)\
+        .order_by(desc(Answer.timestamp), desc(Answer.id))\
+        .limit(limit).all()
+    rows.reverse()
+
+    return jsonify({
+        't': [calendar.timegm(row.timestamp.utctimetuple()) if row.timestamp else None for row in rows],
+        'score': [row.score for row in rows],
+        'duration': [round(row.duration, 2) if row.duration is not None else None for row in rows],
+    })
 
 @main_bp.route('/start_single_question_quiz', methods=['POST'])
 def start_single_question_quiz():
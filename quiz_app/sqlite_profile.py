@@ -0,0 +1,56 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def is_sqlite_file(uri):
+    """Tells whether the database URI points to an SQLite database file (not an in-memory one)."""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def pragmas(config):
+    """
+    The PRAGMA statements run on every new connection, in order.
+
+    busy_timeout comes first, so that switching to WAL waits for the lock instead of failing.
+    In WAL mode readers never block the writer, nor the writer readers, and synchronous=NORMAL
+    only syncs at checkpoints, which is still safe against corruption (a power loss can only
+    lose the last commits). mmap and a larger page cache keep the hot pages in memory.
+    """
+    return [
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT', 15000))),
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        ('cache_size', int(config.get('SQLITE_CACHE_SIZE', -64 * 1024))), # Negative: in KiB
+    ]
+
+def init_app(app):
+    """
+    Applies the pool settings of the SQLite profile. Must be called before db.init_app(),
+    which creates the engine; the pragmas are then registered with register_pragmas().
+    """
+    if not app.config.get('SQLITE_PROFILE_ENABLED') or not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    # Request threads, the provider loop's threads and job workers each hold a connection
+    # only briefly, but all at the same time under load
+    options.setdefault('pool_size', app.config.get('SQLITE_POOL_SIZE', 10))
+    options.setdefault('max_overflow', app.config.get('SQLITE_POOL_MAX_OVERFLOW', 20))
+    options.setdefault('pool_timeout', app.config.get('SQLITE_POOL_TIMEOUT', 30))
+    connect_args = options.setdefault('connect_args', {})
+    # The driver's own busy handler, in seconds, for the statements run before the pragmas
+    connect_args.setdefault('timeout', int(app.config.get('SQLITE_BUSY_TIMEOUT', 15000)) / 1000)
+
+def register_pragmas(engine, config):
+    """Runs the pragmas of the profile on each new connection of the engine."""
+    if not config.get('SQLITE_PROFILE_ENABLED') or not is_sqlite_file(engine.url):
+        return
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas(config)]
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -0,0 +1,143 @@
+// Fills a table from a keyset-paginated JSON endpoint (see /api/sessions and /api/questions),
+// one page at a time as it is scrolled into view. Sorting and filtering happen on the server:
+// clicking a header with a data-sort attribute, or changing the filters form, reloads from
+// the first page.
+function createLazyTable({ table, url, renderRow, filtersForm, sort, order, emptyText }) {
+    const tbody = table.querySelector('tbody');
+    const columnCount = table.querySelectorAll('thead th').length;
+    const status = document.createElement('div');
+    status.className = 'text-center text-secondary my-3';
+    table.after(status);
+
+    let cursor = null;
+    let finished = false;
+    let loading = false;
+    let generation = 0; // Responses of a previous sort or filter are dropped
+
+    function setStatus(text) {
+        status.textContent = text;
+    }
+
+    function queryString() {
+        const params = new URLSearchParams({ sort, order });
+        if (filtersForm) {
+            for (const [name, value] of new FormData(filtersForm)) {
+                if (value !== '') {
+                    params.append(name, value);
+                }
+            }
+        }
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return params.toString();
+    }
+
+    async function loadNextPage() {
+        if (loading || finished) {
+            return;
+        }
+        loading = true;
+        const requestGeneration = generation;
+        setStatus('Loading...');
+        try {
+            const response = await fetch(`${url}?${queryString()}`);
+            const data = await response.json();
+            if (requestGeneration !== generation) {
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(data.error || response.statusText);
+            }
+            for (const item of data.items) {
+                tbody.appendChild(renderRow(item));
+            }
+            cursor = data.next_cursor;
+            finished = !cursor;
+            if (!tbody.children.length) {
+                tbody.innerHTML = `<tr><td colspan="${columnCount}" class="text-center">${emptyText}</td></tr>`;
+            }
+            setStatus(finished ? '' : 'Scroll to load more');
+        } catch (error) {
+            if (requestGeneration === generation) {
+                setStatus(`Could not load the rows: ${error.message}`);
+                finished = true;
+            }
+        } finally {
+            if (requestGeneration === generation) {
+                loading = false;
+            }
+        }
+        // Keep loading while the end of the table is still visible
+        if (!finished && status.getBoundingClientRect().top < window.innerHeight) {
+            loadNextPage();
+        }
+    }
+
+    function reload() {
+        generation += 1;
+        cursor = null;
+        finished = false;
+        loading = false;
+        tbody.innerHTML = '';
+        updateHeaders();
+        loadNextPage();
+    }
+
+    function updateHeaders() {
+        table.querySelectorAll('thead th[data-sort]').forEach(th => {
+            const indicator = th.dataset.sort === sort ? (order === 'asc' ? ' ▲' : ' ▼') : '';
+            th.textContent = th.dataset.label + indicator;
+        });
+    }
+
+    table.querySelectorAll('thead th[data-sort]').forEach(th => {
+        th.dataset.label = th.textContent;
+        th.style.cursor = 'pointer';
+        th.addEventListener('click', () => {
+            if (th.dataset.sort === sort) {
+                order = order === 'asc' ? 'desc' : 'asc';
+            } else {
+                sort = th.dataset.sort;
+                order = th.dataset.defaultOrder || 'asc';
+            }
+            reload();
+        });
+    });
+
+    if (filtersForm) {
+        filtersForm.addEventListener('submit', event => {
+            event.preventDefault();
+            reload();
+        });
+        filtersForm.addEventListener('change', reload);
+    }
+
+    new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }).observe(status);
+
+    reload();
+    return { reload };
+}
+
+function formatNumber(value, digits = 2) {
+    return value === null || value === undefined ? 'N/A' : Number(value).toFixed(digits);
+}
+
+function formatValue(value) {
+    return value === null || value === undefined ? 'N/A' : value;
+}
+
+function tableCell(content) {
+    // Text content, so that question texts cannot inject markup
+    const td = document.createElement('td');
+    if (content instanceof Node) {
+        td.appendChild(content);
+    } else {
+        td.textContent = content;
+    }
+    return td;
+}
@@ -37,26 +37,201 @@ document.addEventListener('DOMContentLoaded', () => {
     let mediaRecorder;
     let audioChunks = [];
 
+    // Streaming upload: chunks are sent while recording, so the server can transcribe
+    // the answer as it is spoken. Falls back to a single upload if anything goes wrong.
+    const card = document.querySelector('.card');
+    const chunkInterval = card ? parseInt(card.dataset.chunkInterval, 10) : NaN;
+    let uploadStream = null;
+
+    const openUploadStream = async () => {
+        const formData = new FormData();
+        formData.append('question_id', card.dataset.questionId);
+        try {
+            const response = await fetch('/answer_stream/start', { method: 'POST', body: formData });
+            const data = await response.json();
+            if (data.success) {
+                return { id: data.stream_id, seq: 0, queue: Promise.resolve(), failed: false };
+            }
+        } catch (error) {
+            console.error('Could not open the upload stream:', error);
+        }
+        return null;
+    };
+
+    const sendChunk = (upload, chunk) => {
+        // Chunks are sent one after the other, in order
+        const seq = upload.seq++;
+        upload.queue = upload.queue.then(async () => {
+            if (upload.failed) return;
+            try {
+                const response = await fetch(`/answer_stream/${upload.id}/chunk?seq=${seq}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: chunk
+                });
+                if (!response.ok) upload.failed = true;
+            } catch (error) {
+                console.error('Chunk upload error:', error);
+                upload.failed = true;
+            }
+        });
+    };
+
+    const finishUploadStream = async (upload) => {
+        await upload.queue;
+        if (!upload.failed) {
+            try {
+                const response = await fetch(`/answer_stream/${upload.id}/finish`, { method: 'POST' });
+                const data = await response.json();
+                if (data.success) return true;
+            } catch (error) {
+                console.error('Could not finish the upload stream:', error);
+            }
+        }
+        abortUploadStream(upload);
+        return false;
+    };
+
+    const abortUploadStream = (upload) => {
+        fetch(`/answer_stream/${upload.id}/abort`, { method: 'POST' }).catch(() => {});
+    };
+
+    // The following questions are rendered here from the quiz manifest, so moving to the next
+    // question loads no page, and the audio of the next two is fetched while this one is answered
+    let manifest = null;
+    const prefetchedAudio = new Map(); // URL -> object URL of the fetched audio, null while fetching
+
+    const questionAudioUrl = (question) => manifest.enforce_alt_language ? question.audio.alt : question.audio.main;
+
+    const prefetchUpcomingAudio = (index) => {
+        manifest.questions.filter(question => question.index > index && question.index <= index + 2).forEach(question => {
+            const url = questionAudioUrl(question);
+            if (!url || prefetchedAudio.has(url)) return;
+            prefetchedAudio.set(url, null);
+            fetch(url)
+                .then(response => response.ok ? response.blob() : Promise.reject(new Error(response.statusText)))
+                .then(blob => prefetchedAudio.set(url, URL.createObjectURL(blob)))
+                .catch(() => prefetchedAudio.delete(url));
+        });
+    };
+
+    const loadManifest = async () => {
+        try {
+            const response = await fetch(card.dataset.manifestUrl);
+            if (!response.ok) return;
+            manifest = await response.json();
+            prefetchUpcomingAudio(parseInt(card.dataset.questionIndex, 10));
+        } catch (error) {
+            console.error('Could not load the quiz manifest:', error);
+        }
+    };
+
+    const setAudioSource = (audio, url) => {
+        if (!audio) return;
+        if (url) {
+            audio.src = prefetchedAudio.get(url) || url;
+        } else {
+            audio.removeAttribute('src');
+        }
+        audio.load();
+    };
+
+    const renderQuestion = (question) => {
+        const total = manifest.questions.length;
+        card.dataset.questionId = question.id;
+        card.dataset.questionIndex = question.index;
+        document.getElementById('question-progress-label').textContent = `Question ${question.index + 1} of ${total}`;
+        const progressBar = document.getElementById('question-progress-bar');
+        progressBar.style.width = `${((question.index + 1) / total) * 100}%`;
+        progressBar.setAttribute('aria-valuenow', question.index + 1);
+        document.getElementById('question-category').textContent = `Category: ${question.category}`;
+
+        if (manifest.enforce_alt_language) {
+            questionText.textContent = question.translated_text || question.text;
+            setAudioSource(questionAudio, question.audio.alt);
+        } else {
+            questionText.textContent = question.text;
+            setAudioSource(questionAudio, question.audio.main);
+            setAudioSource(questionAudioAlt, question.audio.alt);
+        }
+        questionText.classList.add('d-none');
+        showQuestionBtn.classList.add('d-none');
+        showQuestionBtn.style.display = '';
+        startQuestionBtn.style.display = '';
+        if (startQuestionAltBtn) startQuestionAltBtn.style.display = '';
+        recordingStatus.textContent = 'Please wait for the question to finish playing...';
+        nextBtn.disabled = true;
+        nextBtn.textContent = 'Stop and Go to Next Question';
+        if (skipBtn) skipBtn.disabled = false;
+        prefetchUpcomingAudio(question.index);
+    };
+
+    // Shows the question the server moved to, or loads its page (e.g. the results) otherwise
+    const showNextQuestion = (data) => {
+        const question = manifest && data.status === 'ok' && manifest.questions.find(q => q.index === data.index);
+        if (question) {
+            renderQuestion(question);
+        } else {
+            window.location.href = data.url;
+        }
+    };
+
+    const goToNextQuestion = async () => {
+        if (!manifest) {
+            nextQuestionForm.submit();
+            return;
+        }
+        try {
+            const response = await fetch(nextQuestionForm.action, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ index: parseInt(card.dataset.questionIndex, 10) })
+            });
+            const data = await response.json();
+            if (!response.ok) throw new Error(data.error || response.statusText);
+            showNextQuestion(data);
+        } catch (error) {
+            console.error('Could not move to the next question:', error);
+            // The page shows the question the server is at
+            window.location.reload();
+        }
+    };
+
     const startRecording = async () => {
         try {
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-            mediaRecorder = new MediaRecorder(stream);
+            const recorder = mediaRecorder = new MediaRecorder(stream);
+            uploadStream = chunkInterval > 0 ? await openUploadStream() : null;
             
             mediaRecorder.ondataavailable = event => {
                 audioChunks.push(event.data);
+                if (uploadStream && event.data.size > 0) {
+                    sendChunk(uploadStream, event.data);
+                }
             };
 
             mediaRecorder.onstop = async () => {
                 if (audioChunks.length > 0) {
-                    const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
-                    await sendAudioToServer(audioBlob);
+                    const streamed = uploadStream && await finishUploadStream(uploadStream);
+                    if (!streamed) {
+                        const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+                        await sendAudioToServer(audioBlob);
+                    }
                 }
-                nextQuestionForm.submit();
                 audioChunks = [];
+                uploadStream = null;
                 stream.getTracks().forEach(track => track.stop());
+                // A skipped question is moved past by the skip request
+                if (!recorder.skipped) {
+                    goToNextQuestion();
+                }
             };
 
-            mediaRecorder.start();
+            if (uploadStream) {
+                mediaRecorder.start(chunkInterval);
+            } else {
+                mediaRecorder.start();
+            }
             recordingStatus.innerHTML = `
                 <span class="spinner-grow spinner-grow-sm text-danger" role="status"></span>
                 Recording...
@@ -105,9 +280,19 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // The audio of a question that was not generated yet has no source: record right away
+    const playQuestionAudio = (audio) => {
+        if (!audio.getAttribute('src')) {
+            recordingStatus.textContent = 'No audio for this question. Starting recording.';
+            startRecording();
+            return;
+        }
+        audio.play();
+    };
+
     if (startQuestionBtn) {
         startQuestionBtn.addEventListener('click', () => {
-            questionAudio.play();
+            playQuestionAudio(questionAudio);
             startQuestionBtn.style.display = 'none';
             if (startQuestionAltBtn) startQuestionAltBtn.style.display = 'none';
             showQuestionBtn.classList.remove('d-none');
@@ -116,7 +301,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if(startQuestionAltBtn) {
         startQuestionAltBtn.addEventListener('click', () => {
-            questionAudioAlt.play();
+            playQuestionAudio(questionAudioAlt);
             startQuestionBtn.style.display = 'none';
             startQuestionAltBtn.style.display = 'none';
             showQuestionBtn.classList.remove('d-none');
@@ -156,19 +341,25 @@ document.addEventListener('DOMContentLoaded', () => {
             if (nextBtn) nextBtn.disabled = true;
 
             if (mediaRecorder && mediaRecorder.state === 'recording') {
+                mediaRecorder.skipped = true;
                 mediaRecorder.stream.getTracks().forEach(track => track.stop());
                 audioChunks = [];
                 mediaRecorder.stop();
             }
+            if (uploadStream) {
+                abortUploadStream(uploadStream);
+                uploadStream = null;
+            }
 
             fetch('/skip_question', { 
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' }
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ index: parseInt(card.dataset.questionIndex, 10) })
             })
             .then(response => response.json())
             .then(data => {
                 if (data.url) {
-                    window.location.href = data.url;
+                    showNextQuestion(data);
                 } else {
                     skipBtn.disabled = false;
                     if (nextBtn) nextBtn.disabled = false;
@@ -182,4 +373,8 @@ document.addEventListener('DOMContentLoaded', () => {
             });
         });
     }
+
+    if (card && card.dataset.manifestUrl) {
+        loadManifest();
+    }
 });
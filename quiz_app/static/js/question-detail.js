@@ -0,0 +1,84 @@
+document.addEventListener('DOMContentLoaded', () => {
+    const loadMore = document.getElementById('load-more-answers');
+    if (loadMore) {
+        loadMore.addEventListener('click', () => loadOlderAnswers(loadMore));
+    }
+    const chart = document.getElementById('question-history-chart');
+    if (chart) {
+        loadHistoryChart(chart);
+    }
+});
+
+// Appends the next page of answers, rendered by the server, below the ones already shown
+async function loadOlderAnswers(button) {
+    button.disabled = true;
+    button.textContent = 'Loading...';
+    try {
+        const params = new URLSearchParams({ cursor: button.dataset.cursor });
+        const response = await fetch(`${button.dataset.url}?${params}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        document.getElementById('question-answers').insertAdjacentHTML('beforeend', data.html);
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            button.disabled = false;
+            button.textContent = 'Load older answers';
+        } else {
+            button.remove();
+        }
+    } catch (error) {
+        button.textContent = `Could not load the answers: ${error.message}`;
+    }
+}
+
+async function loadHistoryChart(svg) {
+    try {
+        const response = await fetch(svg.dataset.url);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        drawHistoryChart(svg, data);
+    } catch (error) {
+        svg.outerHTML = `<p class="text-secondary">Could not load the history: ${error.message}</p>`;
+    }
+}
+
+// Draws the score (0-5, left axis) and duration (right axis) series as two polylines,
+// one point per answer in order, skipping the answers that have no value
+function drawHistoryChart(svg, data) {
+    const width = svg.clientWidth || 600;
+    const height = svg.clientHeight || 220;
+    const margin = { top: 10, right: 45, bottom: 20, left: 30 };
+    const plotWidth = width - margin.left - margin.right;
+    const plotHeight = height - margin.top - margin.bottom;
+    const count = data.t.length;
+    const maxDuration = Math.max(1, ...data.duration.filter(value => value !== null));
+
+    const x = index => margin.left + (count > 1 ? index / (count - 1) : 0.5) * plotWidth;
+    const yScore = value => margin.top + plotHeight - (value / 5) * plotHeight;
+    const yDuration = value => margin.top + plotHeight - (value / maxDuration) * plotHeight;
+
+    function points(values, y) {
+        return values
+            .map((value, index) => value === null ? null : `${x(index).toFixed(1)},${y(value).toFixed(1)}`)
+            .filter(point => point !== null)
+            .join(' ');
+    }
+
+    const firstDate = count ? new Date(data.t[0] * 1000).toLocaleDateString() : '';
+    const lastDate = count ? new Date(data.t[count - 1] * 1000).toLocaleDateString() : '';
+    svg.setAttribute('viewBox', `0 0 ${width} ${height}`);
+    svg.innerHTML = `
+        <line x1="${margin.left}" y1="${margin.top + plotHeight}" x2="${margin.left + plotWidth}" y2="${margin.top + plotHeight}" stroke="#888" />
+        <text x="${margin.left - 5}" y="${yScore(5) + 4}" text-anchor="end" font-size="11" fill="#888">5</text>
+        <text x="${margin.left - 5}" y="${yScore(0) + 4}" text-anchor="end" font-size="11" fill="#888">0</text>
+        <text x="${margin.left + plotWidth + 5}" y="${yDuration(maxDuration) + 4}" font-size="11" fill="#888">${maxDuration.toFixed(0)}s</text>
+        <text x="${margin.left}" y="${height - 4}" font-size="11" fill="#888">${firstDate}</text>
+        <text x="${margin.left + plotWidth}" y="${height - 4}" text-anchor="end" font-size="11" fill="#888">${lastDate}</text>
+        <polyline fill="none" stroke="#0d6efd" stroke-width="1.5" points="${points(data.duration, yDuration)}" />
+        <polyline fill="none" stroke="#ffc107" stroke-width="2" points="${points(data.score, yScore)}" />
+    `;
+}
@@ -41,20 +41,69 @@ function updateAnswerUI(answerId, data) {
     }
 }
 
-async function handleFetch(url, answerId) {
+function parseEvent(block) {
+    // A Server-Sent Event block is made of "event: ..." and "data: ..." lines
+    let event = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            data += line.slice(5).trim();
+        }
+    }
+    return { event, data: data ? JSON.parse(data) : {} };
+}
+
+async function handleStream(url, answerId, body = null) {
+    // Streams the re-evaluation of an answer: the justification is shown as it is
+    // generated, and the score once the final 'result' event arrives.
     showLoading(answerId);
+    const justification = document.querySelector(`#answer-justification-${answerId} p`);
+    let streaming = false;
     try {
         const response = await fetch(url, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
-            }
+            },
+            body: JSON.stringify(body || {})
         });
-        const data = await response.json();
-        if (data.success) {
-            updateAnswerUI(answerId, data);
-        } else {
+        if (!response.ok || !response.body) {
+            const data = await response.json();
             alert(`Error: ${data.error || 'An unknown error occurred.'}`);
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const blocks = buffer.split('\n\n');
+            buffer = blocks.pop();
+            for (const block of blocks) {
+                const { event, data } = parseEvent(block);
+                if (event === 'transcript') {
+                    updateAnswerUI(answerId, data);
+                } else if (event === 'token') {
+                    if (!streaming) {
+                        // First token: reveal the card and start the justification afresh
+                        streaming = true;
+                        hideLoading(answerId);
+                        justification.textContent = '';
+                    }
+                    justification.textContent += data.text;
+                } else if (event === 'result') {
+                    updateAnswerUI(answerId, data);
+                } else if (event === 'error') {
+                    alert(`Error: ${data.error || 'An unknown error occurred.'}`);
+                }
+            }
         }
     } catch (error) {
         console.error('Fetch error:', error);
@@ -65,41 +114,20 @@ async function handleFetch(url, answerId) {
 }
 
 function retranscribe(answerId) {
-    handleFetch(`/re-transcribe/${answerId}`, answerId);
+    handleStream(`/re-transcribe/${answerId}/stream`, answerId);
 }
 
-function reevaluate(answerId) {
-    handleFetch(`/re-evaluate/${answerId}`, answerId);
+function reevaluate(answerId, force = false) {
+    handleStream(`/re-evaluate/${answerId}/stream${force ? '?force=1' : ''}`, answerId);
 }
 
-async function saveTranscription(answerId) {
+function saveTranscription(answerId) {
     const textarea = document.getElementById(`editTextarea-${answerId}`);
     const newText = textarea.value;
     const modalInstance = bootstrap.Modal.getInstance(document.getElementById(`editModal-${answerId}`));
 
-    showLoading(answerId);
     modalInstance.hide();
-
-    try {
-        const response = await fetch(`/edit-transcription/${answerId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ text: newText })
-        });
-        const data = await response.json();
-        if (data.success) {
-            updateAnswerUI(answerId, data);
-        } else {
-            alert(`Error: ${data.error || 'An unknown error occurred.'}`);
-        }
-    } catch (error) {
-        console.error('Fetch error:', error);
-        alert('A network error occurred. Please try again.');
-    } finally {
-        hideLoading(answerId);
-    }
+    handleStream(`/edit-transcription/${answerId}/stream`, answerId, { text: newText });
 }
 
 // Add some CSS for the loading overlay
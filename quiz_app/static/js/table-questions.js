@@ -1,54 +1,42 @@
 document.addEventListener('DOMContentLoaded', function () {
-    const filterField = document.getElementById('filter-field');
-    const filterValue = document.getElementById('filter-value');
-    const exactMatch = document.getElementById('exact-match');
-    const exactMatchLabel = document.getElementById('exact-match-label');
     const table = document.getElementById('questions-table');
-    const tableBody = table.getElementsByTagName('tbody')[0];
-    const rows = tableBody.getElementsByTagName('tr');
+    const filtersForm = document.getElementById('questions-filters');
+    const search = document.getElementById('q');
 
-    function toggleExactMatch() {
-        if (filterField.value === "0") {
-            exactMatch.style.display = 'inline-block';
-            exactMatchLabel.style.display = 'inline-block';
-        } else {
-            exactMatch.style.display = 'none';
-            exactMatchLabel.style.display = 'none';
-        }
+    function renderRow(item) {
+        const row = document.createElement('tr');
+        const link = document.createElement('a');
+        link.href = item.url;
+        link.textContent = item.id;
+        row.append(
+            tableCell(link),
+            tableCell(item.question_text),
+            tableCell(item.category),
+            tableCell(item.times_answered),
+            tableCell(formatNumber(item.avg_score)),
+            tableCell(formatValue(item.max_score)),
+            tableCell(formatNumber(item.avg_duration)),
+            tableCell(formatNumber(item.min_duration)),
+            tableCell(formatNumber(item.last_duration)),
+            tableCell(formatValue(item.last_score))
+        );
+        return row;
     }
 
-    function filterTable() {
-        const fieldIndex = parseInt(filterField.value, 10);
-        const value = filterValue.value.toLowerCase();
-        const isExactMatch = exactMatch.checked;
-
-        for (let i = 0; i < rows.length; i++) {
-            const cell = rows[i].getElementsByTagName('td')[fieldIndex];
-            if (cell) {
-                const cellText = (cell.textContent || cell.innerText).toLowerCase();
-                let isMatch = false;
-
-                if (fieldIndex === 0 && isExactMatch) {
-                    isMatch = cellText === value;
-                } else {
-                    isMatch = cellText.indexOf(value) > -1;
-                }
-
-                if (isMatch) {
-                    rows[i].style.display = "";
-                } else {
-                    rows[i].style.display = "none";
-                }
-            }
-        }
-    }
-
-    filterField.addEventListener('change', function() {
-        toggleExactMatch();
-        filterTable();
+    const lazyTable = createLazyTable({
+        table,
+        url: table.dataset.url,
+        renderRow,
+        filtersForm,
+        sort: 'id',
+        order: 'asc',
+        emptyText: 'No questions found.'
     });
-    filterValue.addEventListener('keyup', filterTable);
-    exactMatch.addEventListener('change', filterTable);
 
-    toggleExactMatch();
+    // The search is sent while typing, once the user pauses
+    let searchTimer = null;
+    search.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(lazyTable.reload, 300);
+    });
 });
@@ -0,0 +1,63 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const table = document.getElementById('sessions-table');
+
+    function postButton(action, label, className, confirmation) {
+        const form = document.createElement('form');
+        form.action = action;
+        form.method = 'post';
+        form.className = 'd-inline';
+        form.addEventListener('submit', event => {
+            if (!confirm(confirmation)) {
+                event.preventDefault();
+            }
+        });
+        const button = document.createElement('button');
+        button.type = 'submit';
+        button.className = `btn ${className} btn-sm`;
+        button.textContent = label;
+        form.appendChild(button);
+        return form;
+    }
+
+    function linkButton(href, label, className) {
+        const link = document.createElement('a');
+        link.href = href;
+        link.className = `btn ${className} btn-sm`;
+        link.textContent = label;
+        return link;
+    }
+
+    function renderRow(item) {
+        const row = document.createElement('tr');
+        const startTime = item.start_time ? `${item.start_time.replace('T', ' ').slice(0, 19)} UTC` : 'N/A';
+        row.append(
+            tableCell(item.id),
+            tableCell(startTime),
+            tableCell(item.num_questions),
+            tableCell(formatNumber(item.avg_score)),
+            tableCell(formatValue(item.max_score)),
+            tableCell(formatNumber(item.avg_duration))
+        );
+        const actions = document.createElement('td');
+        actions.append(
+            linkButton(item.links.view, 'View', 'btn-primary'), ' ',
+            linkButton(item.links.export, 'Export', 'btn-secondary'), ' ',
+            postButton(item.links.reprocess, 'Reprocess', 'btn-warning',
+                'Are you sure you want to re-process this session? This will clear existing evaluation data.'), ' ',
+            postButton(item.links.delete, 'Delete', 'btn-danger',
+                'Are you sure you want to delete this session and all its answers? This action cannot be undone.')
+        );
+        row.appendChild(actions);
+        return row;
+    }
+
+    createLazyTable({
+        table,
+        url: table.dataset.url,
+        renderRow,
+        filtersForm: document.getElementById('sessions-filters'),
+        sort: 'start_time',
+        order: 'desc',
+        emptyText: 'No sessions found.'
+    });
+});
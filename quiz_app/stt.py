@@ -1,14 +1,52 @@
+import asyncio
 from flask import session, current_app
-from .stt_deepgram import transcribe_audio as transcribe_deepgram
-from .stt_mistral import transcribe_audio as transcribe_mistral
+from .stt_deepgram import transcribe_audio as transcribe_deepgram, transcribe_audio_async as transcribe_deepgram_async
+from .stt_mistral import transcribe_audio as transcribe_mistral, transcribe_audio_async as transcribe_mistral_async
+from .stt_cache import transcription_cache_key, get_cached_transcription, store_transcription
 
-def transcribe_audio(file_path, config, provider='mistral'):
+def transcribe_audio(file_path, config, provider='mistral', force=False):
     """
     Dispatches the transcription task to the appropriate STT service.
     Defaults to Mistral.
+
+    Transcripts are cached by audio content, provider, model and language, so the same
+    recording is only sent once. With `force`, the service is always called and the
+    fresh transcript replaces the cached one.
     """
+    key = transcription_cache_key(file_path, provider, config)
+    if not force:
+        cached = get_cached_transcription(key)
+        if cached is not None:
+            return cached
+
+    if provider == 'deepgram':
+        transcribed_text = transcribe_deepgram(file_path, config)
+    else:
+        # Default to Mistral
+        transcribed_text = transcribe_mistral(file_path, config)
+
+    store_transcription(key, transcribed_text)
+    return transcribed_text
+
+async def transcribe_audio_async(file_path, config, provider='mistral'):
+    """Async variant of transcribe_audio(), to be awaited on the provider loop. Not cached."""
     if provider == 'deepgram':
-        return transcribe_deepgram(file_path, config)
-    
-    # Default to Mistral
-    return transcribe_mistral(file_path, config)
+        return await transcribe_deepgram_async(file_path, config)
+
+    return await transcribe_mistral_async(file_path, config)
+
+def _in_app_context(app, func, *args):
+    with app.app_context():
+        return func(*args)
+
+async def transcribe_audio_cached_async(app, file_path, config, provider='mistral', force=False):
+    """Async variant of transcribe_audio() for code running on the provider loop."""
+    key = await asyncio.to_thread(transcription_cache_key, file_path, provider, config)
+    if not force:
+        cached = await asyncio.to_thread(_in_app_context, app, get_cached_transcription, key)
+        if cached is not None:
+            return cached
+
+    transcribed_text = await transcribe_audio_async(file_path, config, provider)
+    await asyncio.to_thread(_in_app_context, app, store_transcription, key, transcribed_text)
+    return transcribed_text
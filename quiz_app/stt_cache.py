@@ -0,0 +1,75 @@
+import hashlib
+import datetime
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from . import db
+from .cache_store import record_hit, write_pending_hits, upsert
+from .models import TranscriptionCache
+from .stt_mistral import MISTRAL_STT_MODEL
+
+def audio_digest(file_path):
+    """Returns the SHA-256 of an audio file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stt_settings(provider, config):
+    """Returns the (model, language) used by a provider, the part of the key besides the audio."""
+    if provider == 'deepgram':
+        return config.get('DEEPGRAM_MODEL') or '', config.get('DEEPGRAM_LANGUAGE') or ''
+    return MISTRAL_STT_MODEL, '' # Voxtral detects the language itself
+
+def transcription_cache_key(file_path, provider, config):
+    """Returns the (audio_sha256, provider, model, language) key of a transcription."""
+    model, language = stt_settings(provider, config)
+    return (audio_digest(file_path), provider, model, language)
+
+def _is_enabled():
+    return current_app.config.get('TRANSCRIPTION_CACHE_ENABLED', True)
+
+def get_cached_transcription(key):
+    """Returns the cached transcript for a key, or None. Never writes nor commits."""
+    if not _is_enabled():
+        return None
+    entry = TranscriptionCache.query.get(key)
+    if entry is None:
+        return None
+
+    # Counted in memory, see cache_store.py
+    record_hit(TranscriptionCache, key)
+    return entry.text
+
+def store_transcription(key, text, commit=True):
+    """
+    Caches a transcript, replacing any previous one for the same key. The cache is only an
+    optimisation: a failed write is logged and rolled back on its own, and never fails the
+    caller. With `commit=False`, the write is left to be committed with the caller's changes.
+    """
+    if not _is_enabled() or not text or text.startswith("Error:"):
+        return # Failed transcriptions must be retried, not cached
+
+    audio_sha256, provider, model, language = key
+    now = datetime.datetime.utcnow()
+    # An upsert, since identical recordings processed at the same time store the same key
+    values = dict(
+        audio_sha256=audio_sha256,
+        provider=provider,
+        model=model,
+        language=language,
+        text=text,
+        hits=0,
+        created_at=now,
+        last_used_at=now
+    )
+    try:
+        with db.session.begin_nested():
+            upsert(TranscriptionCache, values, ['text', 'last_used_at'])
+            write_pending_hits(TranscriptionCache)
+        if commit:
+            db.session.commit()
+    except SQLAlchemyError as e:
+        print(f"Could not cache the transcription: {e}")
+        if commit:
+            db.session.rollback()
@@ -1,7 +1,8 @@
-import time
-from deepgram import DeepgramClient, PrerecordedOptions, FileSource
+import asyncio
+from .providers import limit, run_sync
+from .clients import get_client
 
-def transcribe_audio(file_path, config):
+async def transcribe_audio_async(file_path, config):
     """
     Transcribes an audio file using the Deepgram API, with a retry mechanism.
 
@@ -12,6 +13,7 @@ def transcribe_audio(file_path, config):
     Returns:
         A string containing the transcribed text, or an error message.
     """
+    from deepgram import PrerecordedOptions, FileSource
     api_key = config.get('DEEPGRAM_API_KEY')
     model = config.get('DEEPGRAM_MODEL')
     language = config.get('DEEPGRAM_LANGUAGE')
@@ -21,10 +23,9 @@ def transcribe_audio(file_path, config):
     if not api_key:
         return "Error: DEEPGRAM_API_KEY not configured."
 
-    deepgram = DeepgramClient(api_key)
+    deepgram = get_client('deepgram', model, api_key=api_key)
 
-    with open(file_path, "rb") as file:
-        buffer_data = file.read()
+    buffer_data = await asyncio.to_thread(_read_file, file_path)
 
     payload: FileSource = {
         "buffer": buffer_data,
@@ -38,14 +39,25 @@ def transcribe_audio(file_path, config):
 
     for attempt in range(max_retries):
         try:
-            response = deepgram.listen.rest.v("1").transcribe_file(payload, options)
+            async with limit('deepgram'):
+                response = await deepgram.listen.asyncrest.v("1").transcribe_file(
+                    payload, options, transport=get_client('deepgram-transport')
+                )
             transcript = response.results.channels[0].alternatives[0].transcript
             return transcript
         except Exception as e:
             print(f"Deepgram Exception (Attempt {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return f"Error: Could not transcribe audio after {max_retries} attempts. {e}"
 
     return "Error: Transcription failed after all retries."
+
+def transcribe_audio(file_path, config):
+    """Synchronous wrapper around transcribe_audio_async()."""
+    return run_sync(transcribe_audio_async(file_path, config))
+
+def _read_file(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
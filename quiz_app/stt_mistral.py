@@ -1,8 +1,11 @@
 import os
-from mistralai import Mistral
-import time
+import asyncio
+from .providers import limit, run_sync
+from .clients import get_client
 
-def transcribe_audio(file_path, config):
+MISTRAL_STT_MODEL = "voxtral-mini-latest"
+
+async def transcribe_audio_async(file_path, config):
     """
     Transcribes an audio file using the Mistral API (Voxtral).
 
@@ -14,39 +17,40 @@ def transcribe_audio(file_path, config):
         A string containing the transcribed text, or an error message.
     """
     api_key = config.get('MISTRAL_API_KEY')
-    model = "voxtral-mini-latest"
+    model = MISTRAL_STT_MODEL
     max_retries = config.get('MISTRAL_MAX_RETRIES', 3)
     retry_delay = config.get('MISTRAL_RETRY_DELAY', 1)
 
     if not api_key:
         return "Error: MISTRAL_API_KEY not configured."
 
+    audio_content = await asyncio.to_thread(_read_file, file_path)
+    client = get_client('mistral', model, api_key=api_key)
+
     for attempt in range(max_retries):
         try:
-            client = Mistral(api_key=api_key)
-
-            # 1. Upload the audio file
-            with open(file_path, "rb") as f:
-                uploaded_audio = client.files.upload(
+            async with limit('mistral'):
+                # 1. Upload the audio file
+                uploaded_audio = await client.files.upload_async(
                     file={
-                        "content": f,
-                        "file_name": f.name
+                        "content": audio_content,
+                        "file_name": os.path.basename(file_path)
                     },
                     purpose="audio"
                 )
 
-            # 2. Get a signed URL for the uploaded file
-            signed_url = client.files.get_signed_url(file_id=uploaded_audio.id)
+                # 2. Get a signed URL for the uploaded file
+                signed_url = await client.files.get_signed_url_async(file_id=uploaded_audio.id)
 
-            # 3. Get the transcription using the signed URL
-            transcription_response = client.audio.transcriptions.complete(
-                model=model,
-                file_url=signed_url.url,
-            )
+                # 3. Get the transcription using the signed URL
+                transcription_response = await client.audio.transcriptions.complete_async(
+                    model=model,
+                    file_url=signed_url.url,
+                )
 
             # 4. Delete the file from Mistral's servers
             try:
-                client.files.delete(file_id=uploaded_audio.id)
+                await client.files.delete_async(file_id=uploaded_audio.id)
             except Exception as delete_e:
                 print(f"Warning: Failed to delete file {uploaded_audio.id} from Mistral: {delete_e}")
 
@@ -56,8 +60,16 @@ def transcribe_audio(file_path, config):
         except Exception as e:
             print(f"Mistral Exception (Attempt {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return f"Error: Could not transcribe audio with Mistral after {max_retries} attempts. {e}"
 
     return "Error: Mistral transcription failed after all retries."
+
+def transcribe_audio(file_path, config):
+    """Synchronous wrapper around transcribe_audio_async()."""
+    return run_sync(transcribe_audio_async(file_path, config))
+
+def _read_file(file_path):
+    with open(file_path, "rb") as f:
+        return f.read()
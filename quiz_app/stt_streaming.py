@@ -0,0 +1,114 @@
+import abc
+import asyncio
+from .providers import limit
+from .clients import get_client
+
+# Seconds to wait for Deepgram to return the last results once the recording has ended
+DEEPGRAM_FLUSH_TIMEOUT = 5
+
+class StreamingTranscriber(abc.ABC):
+    """
+    Transcribes audio while it is being recorded. Audio is sent in the chunks produced by the
+    browser's MediaRecorder (a WebM stream), and the transcript is collected as it goes.
+
+    All methods are coroutines, to be awaited on the provider loop, in this order:
+    start() once, send() for each chunk, then finish(), which returns the full transcript.
+    """
+    provider = None
+
+    def __init__(self, config):
+        self.config = config
+
+    async def start(self):
+        pass
+
+    @abc.abstractmethod
+    async def send(self, chunk):
+        """Sends a chunk of the recording."""
+
+    @abc.abstractmethod
+    async def finish(self):
+        """Flushes the stream and returns the transcript, or an "Error: ..." string."""
+
+    async def abort(self):
+        """Closes the stream without waiting for the transcript."""
+        pass
+
+class DeepgramStreamingTranscriber(StreamingTranscriber):
+    """Streams the recording to Deepgram's live transcription WebSocket."""
+    provider = 'deepgram'
+
+    async def start(self):
+        from deepgram import LiveOptions, LiveTranscriptionEvents
+        api_key = self.config.get('DEEPGRAM_API_KEY')
+        if not api_key:
+            raise RuntimeError("DEEPGRAM_API_KEY not configured.")
+
+        self.segments = []
+        self.flushed = asyncio.Event()
+        deepgram = get_client('deepgram', self.config.get('DEEPGRAM_MODEL'), api_key=api_key)
+        self.connection = deepgram.listen.asyncwebsocket.v("1")
+        self.connection.on(LiveTranscriptionEvents.Transcript, self._on_transcript)
+
+        options = LiveOptions(
+            model=self.config.get('DEEPGRAM_MODEL'),
+            language=self.config.get('DEEPGRAM_LANGUAGE'),
+            smart_format=True,
+        )
+        # The concurrency slot is held for the connection setup only; a live stream
+        # mostly waits for the speaker, not for Deepgram
+        async with limit('deepgram'):
+            if not await self.connection.start(options):
+                raise RuntimeError("Could not open the Deepgram live connection.")
+
+    async def _on_transcript(self, client, result, **kwargs):
+        if result.is_final:
+            transcript = result.channel.alternatives[0].transcript
+            if transcript:
+                self.segments.append(transcript)
+        if getattr(result, 'from_finalize', False):
+            self.flushed.set()
+
+    async def send(self, chunk):
+        await self.connection.send(chunk)
+
+    async def finish(self):
+        # Finalize makes Deepgram transcribe the audio it holds instead of waiting for more
+        await self.connection.finalize()
+        try:
+            await asyncio.wait_for(self.flushed.wait(), timeout=DEEPGRAM_FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("Deepgram did not confirm the end of the live transcription, using what was received.")
+        await self.connection.finish()
+        return " ".join(self.segments)
+
+    async def abort(self):
+        await self.connection.finish()
+
+class LocalStreamingTranscriber(StreamingTranscriber):
+    """
+    A stand-in that needs no network, for development and tests. It "transcribes" each
+    chunk into a placeholder describing it.
+    """
+    provider = 'local'
+
+    async def start(self):
+        self.segments = []
+
+    async def send(self, chunk):
+        await asyncio.sleep(0)
+        self.segments.append(f"[{len(chunk)} bytes]")
+
+    async def finish(self):
+        return " ".join(self.segments)
+
+# Providers with a live transcription API. The others are transcribed once the recording is complete.
+STREAMING_TRANSCRIBERS = {
+    'deepgram': DeepgramStreamingTranscriber,
+    'local': LocalStreamingTranscriber,
+}
+
+def get_streaming_transcriber(provider, config):
+    """Returns a new StreamingTranscriber for the provider, or None if it cannot stream."""
+    transcriber_class = STREAMING_TRANSCRIBERS.get(provider)
+    return transcriber_class(config) if transcriber_class else None
@@ -1,44 +1,51 @@
 import os
-from langchain.globals import set_verbose
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
-set_verbose(False)
+import json
+import asyncio
+import hashlib
+from . import db
+from .providers import limit, run_sync
+from .clients import get_client
 
 def get_openrouter_client(model_name, temperature, top_k, api_key, max_retries):
-    """Helper function to create a ChatOpenAI client for OpenRouter."""
-    return ChatOpenAI(
-        model=model_name,
+    """Helper function to get the shared ChatOpenAI client for OpenRouter, with reasoning disabled."""
+    return get_client(
+        'openrouter',
+        model_name,
         temperature=temperature,
-        openai_api_key=api_key,
-        openai_api_base="https://openrouter.ai/api/v1",
-        default_headers={
-            "HTTP-Referer": "http://localhost", 
-            "X-Title": "AI Quizzer"
-        },
+        api_key=api_key,
         max_retries=max_retries,
-        extra_body = {
-            "reasoning": {"enable":False}
-        }
+        reasoning=False
     )
 
-def translate_question(question_id, question_text, api_key, target_language="fr"):
+# Everything that changes the translation of a text, part of its key in the Translation table
+TRANSLATION_MODEL = "google/gemini-2.5-pro"
+TRANSLATION_PROMPT = "You are a translator. Translate the following text to {target_language}. Do not add any extra text, just the translation."
+# Added to TRANSLATION_PROMPT by the batch mode, whose output is a TranslationBatch
+BATCH_TRANSLATION_INSTRUCTIONS = """The text is a list of quiz questions, each with an id. Translate each question on its own,
+        and return one translation per question with the id it was given."""
+
+# How a translation was made, by order of preference when a text has several: one request for
+# the text, or a request for a batch of texts (translation_batches())
+TRANSLATION_MODES = ('single', 'batch')
+
+async def translate_question_async(question_id, question_text, api_key, target_language="fr"):
     """
     Translates the question text to the target language using a chat LLM.
     """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
     if not api_key:
         return "Error: OPENROUTER_API_KEY not configured."
 
     translation_client = get_openrouter_client(
-        "google/gemini-2.5-pro",
+        TRANSLATION_MODEL,
         0.1,
         1,
         api_key,
         3
     )
 
-    system_prompt = f"You are a translator. Translate the following text to {target_language}. Do not add any extra text, just the translation."
+    system_prompt = TRANSLATION_PROMPT.format(target_language=target_language)
     
     translation_prompt_text = f"""{system_prompt}
         {{question_text}}
@@ -48,33 +55,170 @@ def translate_question(question_id, question_text, api_key, target_language="fr"
     
     translation_chain = translation_prompt | translation_client | StrOutputParser()
     
-    translated_text = translation_chain.invoke({
-        "question_text": question_text
-    })
+    async with limit('openrouter'):
+        translated_text = await translation_chain.ainvoke({
+            "question_text": question_text
+        })
     
     return {"id": question_id, "text": translated_text}
 
-def get_translated_question_path(question_id, text_dir):
+def translate_question(question_id, question_text, api_key, target_language="fr"):
+    """Synchronous wrapper around translate_question_async()."""
+    return run_sync(translate_question_async(question_id, question_text, api_key, target_language))
+
+# Rough size of a request of the batch mode, in tokens: a translation is about as long as its
+# source, and each item also costs its id and the JSON around it
+BATCH_ITEM_OVERHEAD_TOKENS = 16
+
+def estimate_tokens(text):
+    """A cheap estimate of the number of tokens of a text, about 4 characters each."""
+    return len(text) // 4 + 1
+
+def translation_batches(questions, token_budget, max_items):
+    """
+    Packs (id, text) pairs, in order, into batches of at most `max_items` whose estimated
+    input and output tokens fit `token_budget`. A question over the budget is alone in its batch.
+    """
+    batches, batch, tokens = [], [], 0
+    for question in questions:
+        cost = 2 * estimate_tokens(question[1]) + BATCH_ITEM_OVERHEAD_TOKENS
+        if batch and (len(batch) >= max_items or tokens + cost > token_budget):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(question)
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def _translate_batch_async(batch, api_key, target_language):
+    """
+    Translates a batch of (id, text) pairs in one structured output call. Returns
+    {id: translated text} for the translations that are valid: a non-empty text for an id
+    of the batch. The others are left out.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from .translation_schemas import TranslationBatch
+    translation_client = get_openrouter_client(
+        TRANSLATION_MODEL,
+        0.1,
+        1,
+        api_key,
+        3
+    ).with_structured_output(TranslationBatch)
+
+    # The batch prompt differs from the single one, so its results have keys of their own
+    system_prompt = TRANSLATION_PROMPT.format(target_language=target_language)
+    batch_prompt = ChatPromptTemplate.from_template(f"""{system_prompt}
+        {BATCH_TRANSLATION_INSTRUCTIONS}
+        {{questions}}
+        """)
+    questions = json.dumps([{"id": question_id, "text": text} for question_id, text in batch], ensure_ascii=False)
+
+    async with limit('openrouter'):
+        result = await (batch_prompt | translation_client).ainvoke({"questions": questions})
+
+    ids = {question_id for question_id, _ in batch}
+    return {
+        item.id: item.text for item in result.translations
+        if item.id in ids and item.text.strip()
+    }
+
+async def _translate_batch_or_split_async(batch, api_key, target_language):
     """
-    Gets the path for the translated question text file.
+    Translates a batch, halving it when the call fails (e.g. truncated or invalid output) and
+    translating one by one, with translate_question_async(), the items still missing.
+    Returns {id: (translated text, mode)}, the mode being 'batch' or 'single'.
     """
-    os.makedirs(text_dir, exist_ok=True)
-    return os.path.join(text_dir, f"question_{question_id}.alt.txt")
+    translations = {}
+    if len(batch) > 1:
+        try:
+            translated = await _translate_batch_async(batch, api_key, target_language)
+            translations = {question_id: (text, 'batch') for question_id, text in translated.items()}
+        except Exception as e:
+            middle = len(batch) // 2
+            print(f"Batch translation of {len(batch)} questions failed, splitting it: {e}")
+            halves = await asyncio.gather(
+                _translate_batch_or_split_async(batch[:middle], api_key, target_language),
+                _translate_batch_or_split_async(batch[middle:], api_key, target_language)
+            )
+            return {**halves[0], **halves[1]}
 
-def save_translated_question(question_id, translated_text, text_dir):
+    missing = [(question_id, text) for question_id, text in batch if question_id not in translations]
+    results = await asyncio.gather(
+        *(translate_question_async(question_id, text, api_key, target_language) for question_id, text in missing),
+        return_exceptions=True
+    )
+    for (question_id, _), result in zip(missing, results):
+        if isinstance(result, dict) and result["text"].strip():
+            translations[question_id] = (result["text"], 'single')
+        else:
+            print(f"Could not translate question {question_id}: {result}")
+    return translations
+
+async def translate_questions_async(questions, api_key, target_language="fr", token_budget=4000, max_items=50):
     """
-    Saves the translated question text to a file.
+    Translates many questions, given as (id, text) pairs, with a request per batch of
+    translation_batches() instead of one per question. The items of a batch that fail
+    validation are translated one by one. Returns {id: (translated text, mode)} for the
+    questions that could be translated, the mode to store them under (see
+    TRANSLATION_MODES). `max_items=1` translates every question on its own.
     """
-    file_path = get_translated_question_path(question_id, text_dir)
-    with open(file_path, "w") as f:
-        f.write(translated_text)
-    return file_path
+    if not api_key:
+        print("Error: OPENROUTER_API_KEY not configured.")
+        return {}
+    results = await asyncio.gather(*(
+        _translate_batch_or_split_async(batch, api_key, target_language)
+        for batch in translation_batches(questions, token_budget, max_items)
+    ))
+    return {question_id: text for translations in results for question_id, text in translations.items()}
+
+def text_digest(text):
+    """SHA-256 of a text, as Question.digest."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def translation_key(source_text, language, mode='single'):
+    """
+    Key of the translation of a text: its digest, the language, the model and the prompt,
+    which for the batch mode includes its instructions.
+    """
+    parts = [text_digest(source_text), language, TRANSLATION_MODEL, TRANSLATION_PROMPT]
+    if mode == 'batch':
+        parts.append(BATCH_TRANSLATION_INSTRUCTIONS)
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+def get_stored_translations(source_texts, language):
+    """
+    The stored translations of some texts to a language, as {source text: translated text}.
+    A text translated in several modes gets the translation of the first of TRANSLATION_MODES.
+    """
+    from .models import Translation
+    keys = {translation_key(text, language, mode): (text, rank) for text in source_texts for rank, mode in enumerate(TRANSLATION_MODES)}
+    rows = db.session.query(Translation.key, Translation.text).filter(Translation.key.in_(list(keys)))
+    ranked = sorted(((keys[key], text) for key, text in rows), key=lambda row: row[0][1], reverse=True)
+    return {source_text: text for (source_text, _), text in ranked}
+
+def get_stored_translation(source_text, language):
+    """The stored translation of a text to a language, or None."""
+    return get_stored_translations([source_text], language).get(source_text)
+
+def store_translation(source_text, language, translated_text, mode='single'):
+    """Records a translation, once per distinct text, language, model and prompt. The caller commits."""
+    from .models import Translation
+    key = translation_key(source_text, language, mode)
+    translation = db.session.get(Translation, key)
+    if translation is None:
+        translation = Translation(key=key, source_digest=text_digest(source_text), language=language, model=TRANSLATION_MODEL)
+        db.session.add(translation)
+    translation.text = translated_text
+    return translation
 
 def get_translated_question(question_id, text_dir):
     """
-    Gets the translated question text from a file.
+    Gets the translated question text from the file written, under the question's id, before
+    translations were stored in the database. Only used to import them.
     """
-    file_path = get_translated_question_path(question_id, text_dir)
+    file_path = os.path.join(text_dir, f"question_{question_id}.alt.txt")
     if os.path.exists(file_path):
         with open(file_path, "r") as f:
             return f.read()
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+# JSON structure of a batch translation: the translations, keyed by the id of their question
+class TranslatedQuestion(BaseModel):
+    id: int = Field(description="The id of the question, as given.")
+    text: str = Field(description="The translation of the question text, and nothing else.")
+
+class TranslationBatch(BaseModel):
+    translations: list[TranslatedQuestion] = Field(description="One translation per question given, in any order.")
@@ -1,37 +1,35 @@
-import os
 import base64
-import requests
+import httpx
+from .providers import limit
+from .clients import get_client
 
 API_URL = "https://api.sws.speechify.com/v1/audio/speech"
 
-def generate_speech_file(question_id, question_text, token, audio_dir, is_alt=False):
+# Everything that changes the audio for a given text. The content-addressed store
+# (tts_assets.py) keys each file by these, so changing one never serves stale audio.
+VOICE_ID = "raphael"
+MODEL = "simba-multilingual"
+SPEECH_RATE = "+25.0%"
+SPEECH_EMOTION = "cheerful"
+
+def speech_settings():
+    return {"voice_id": VOICE_ID, "model": MODEL, "rate": SPEECH_RATE, "emotion": SPEECH_EMOTION}
+
+async def synthesize_speech_async(text, token, audio_format="wav"):
     """
-    Generates a speech audio file for a given question text using Speechify's REST API.
-    Saves the file to the configured TTS audio directory.
-    Skips generation if the file already exists.
+    Synthesizes speech for a text using Speechify's REST API, in `audio_format` ("wav",
+    "mp3", "ogg" or "aac"). Returns the audio bytes, or None if the call failed.
     """
     if not token:
         print("Speechify API token is not configured.")
-        return None, 'failed'
-
-    suffix = ".alt.wav" if is_alt else ".wav"
-    file_path = os.path.join(audio_dir, f"question_{question_id}{suffix}")
-
-    if os.path.exists(file_path):
-        print(f"Audio file for question {question_id} already exists. Skipping.")
-        return file_path, 'skipped'
+        return None
 
     try:
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
         ssml_input = f"""
         <speak>
-            <prosody rate="+25.0%">
-                <speechify:style emotion="cheerful">
-                    {question_text}
+            <prosody rate="{SPEECH_RATE}">
+                <speechify:style emotion="{SPEECH_EMOTION}">
+                    {text}
                 </speechify:style>
             </prosody>
         </speak>
@@ -39,33 +37,26 @@ def generate_speech_file(question_id, question_text, token, audio_dir, is_alt=Fa
 
         payload = {
             "input": ssml_input,
-            "voice_id": "raphael",
-            "model": "simba-multilingual",
-            "audio_format": "wav"
+            "voice_id": VOICE_ID,
+            "model": MODEL,
+            "audio_format": audio_format
         }
 
-        response = requests.post(API_URL, json=payload, headers=headers)
+        async with limit('speechify'):
+            response = await get_client('speechify', token=token).post(API_URL, json=payload)
 
         if response.status_code == 200:
-            response_data = response.json()
-            audio_data_b64 = response_data.get("audio_data")
-            
+            audio_data_b64 = response.json().get("audio_data")
             if audio_data_b64:
-                audio_data_bytes = base64.b64decode(audio_data_b64)
-                with open(file_path, 'wb') as f:
-                    f.write(audio_data_bytes)
-                print(f"Successfully generated audio for question {question_id}.")
-                return file_path, 'created'
-            else:
-                print(f"Failed to get audio_data from response for question {question_id}.")
-                return None, 'failed'
-        else:
-            print(f"Failed to generate audio for question {question_id}. Status: {response.status_code}, Response: {response.text}")
-            return None, 'failed'
-
-    except requests.exceptions.RequestException as e:
-        print(f"A network error occurred while generating speech for question {question_id}: {e}")
-        return None, 'failed'
+                return base64.b64decode(audio_data_b64)
+            print("Failed to get audio_data from the Speechify response.")
+            return None
+        print(f"Failed to generate audio. Status: {response.status_code}, Response: {response.text}")
+        return None
+
+    except httpx.HTTPError as e:
+        print(f"A network error occurred while generating speech: {e}")
+        return None
     except Exception as e:
-        print(f"An unexpected error occurred while generating speech for question {question_id}: {e}")
-        return None, 'failed'
+        print(f"An unexpected error occurred while generating speech: {e}")
+        return None
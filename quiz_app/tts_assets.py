@@ -0,0 +1,224 @@
+import io
+import os
+import re
+import json
+import time
+import hashlib
+from flask import current_app, url_for, send_from_directory, abort
+from . import db
+from .models import Question, TtsAsset, Translation
+from .tts import speech_settings
+from .translate import text_digest, translation_key, get_stored_translations, store_translation, get_translated_question, TRANSLATION_MODES
+
+CONTENT_TYPES = {
+    'mp3': 'audio/mpeg',
+    'ogg': 'audio/ogg',
+    'aac': 'audio/aac',
+    'wav': 'audio/wav',
+}
+
+# pydub (ffmpeg) export settings of the compact formats. Speech needs a low bitrate only.
+EXPORT_SETTINGS = {
+    'mp3': {'format': 'mp3', 'bitrate': '64k'},
+    'ogg': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '32k'},
+    'aac': {'format': 'adts', 'bitrate': '64k'},
+}
+
+ASSET_NAME = re.compile(r'^[0-9a-f]{32}\.(mp3|ogg|aac|wav)$')
+
+# Assets never change under a given name, so browsers can keep them for a year without asking
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Files are written before their row is committed, so recent ones are never collected
+GC_GRACE_SECONDS = 3600
+
+def get_asset_dir():
+    asset_dir = current_app.config.get('TTS_ASSET_DIR')
+    os.makedirs(asset_dir, exist_ok=True)
+    return asset_dir
+
+def get_audio_format():
+    return current_app.config.get('TTS_AUDIO_FORMAT', 'mp3')
+
+def speech_key(text, language, audio_format):
+    """Key of the audio of a text: the text, its language (None as written), the voice settings and the format."""
+    parts = [text, language, speech_settings(), audio_format]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+def stored_speech_keys(keys):
+    """The keys, among `keys`, that have stored audio."""
+    return {row[0] for row in db.session.query(TtsAsset.key).filter(TtsAsset.key.in_(list(keys)))}
+
+def write_speech_file(data, audio_format, asset_dir):
+    """
+    Writes audio to `asset_dir` under the hash of its content, so identical audio is written
+    once. Touches no database, so it can run off the request or job that records it.
+    Returns (sha256, filename).
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    filename = f"{digest[:32]}.{audio_format}"
+    path = os.path.join(asset_dir, filename)
+    if not os.path.exists(path):
+        # Written under a temporary name first, so that a stored name is always complete
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest, filename
+
+def record_speech(key, digest, filename, size, audio_format, language):
+    """Records a file written by write_speech_file() as the audio of the input `key`. The caller commits."""
+    asset = db.session.get(TtsAsset, key)
+    if asset is None:
+        asset = TtsAsset(key=key)
+        db.session.add(asset)
+    asset.language = language
+    asset.sha256 = digest
+    asset.filename = filename
+    asset.content_type = CONTENT_TYPES.get(audio_format, 'application/octet-stream')
+    asset.size = size
+    return asset
+
+def questions_audio_urls(questions, alt_language, translations=None):
+    """
+    The URLs of the audio of some questions, as {question id: {variant: URL}}: 'main' as
+    written, 'alt' translated to `alt_language`. Looked up by content, so a variant that was
+    never generated is None. `translations`, the stored translations of the questions to
+    `alt_language` ({source text: text}), are looked up when not given.
+    """
+    audio_format = get_audio_format()
+    if translations is None:
+        translations = get_stored_translations([q.question_text for q in questions], alt_language)
+    keys = {}
+    for question in questions:
+        keys[question.id, 'main'] = speech_key(question.question_text, None, audio_format)
+        if question.question_text in translations:
+            keys[question.id, 'alt'] = speech_key(translations[question.question_text], alt_language, audio_format)
+    filenames = dict(db.session.query(TtsAsset.key, TtsAsset.filename).filter(TtsAsset.key.in_(set(keys.values()))))
+    urls = {question.id: {'main': None, 'alt': None} for question in questions}
+    for (question_id, variant), key in keys.items():
+        if key in filenames:
+            urls[question_id][variant] = url_for('main.serve_tts_asset', filename=filenames[key])
+    return urls
+
+def question_audio_urls(question, alt_language, translations=None):
+    """The URLs of the audio of a question, see questions_audio_urls()."""
+    return questions_audio_urls([question], alt_language, translations)[question.id]
+
+def send_tts_asset(filename):
+    """Serves an asset with a year-long immutable Cache-Control and its content hash as ETag."""
+    if not ASSET_NAME.match(filename):
+        abort(404)
+    response = send_from_directory(
+        get_asset_dir(), filename,
+        mimetype=CONTENT_TYPES[filename.rsplit('.', 1)[1]],
+        max_age=ASSET_MAX_AGE,
+        etag=filename.split('.', 1)[0],
+        conditional=True
+    )
+    response.cache_control.immutable = True
+    return response
+
+def _encode(source_path, audio_format):
+    """Returns (bytes, format) of the file in `audio_format`, or as it is when it cannot be transcoded."""
+    extension = os.path.splitext(source_path)[1].lstrip('.').lower()
+    if extension != audio_format and audio_format in EXPORT_SETTINGS:
+        try:
+            from pydub import AudioSegment
+            buffer = io.BytesIO()
+            AudioSegment.from_file(source_path).export(buffer, **EXPORT_SETTINGS[audio_format])
+            return buffer.getvalue(), audio_format
+        except Exception as e:
+            print(f"Could not transcode {source_path} to {audio_format}, storing it as it is: {e}")
+    with open(source_path, 'rb') as f:
+        return f.read(), extension
+
+def _find_legacy_file(question_id, suffix, audio_dir):
+    for extension in dict.fromkeys([get_audio_format(), 'wav']):
+        path = os.path.join(audio_dir, f"question_{question_id}{suffix}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def import_legacy_files(alt_language=None, force=False):
+    """
+    Imports the files written under question ids before the store existed: the audio
+    (question_<id>.wav and .alt.wav) and, for `alt_language` only, the translations
+    (question_<id>.alt.txt). Each file is attributed to the current text of the question with
+    its id, so this is only right if the ids were not reassigned since, e.g. by a database
+    reset. Returns the number of (audio files, translations) imported.
+    """
+    audio_dir = current_app.config.get('TTS_AUDIO_DIR')
+    text_dir = os.path.join(current_app.static_folder, 'text')
+    asset_dir = get_asset_dir()
+    audio_format = get_audio_format()
+    imported_audio = imported_translations = 0
+    for question_id, question_text in db.session.query(Question.id, Question.question_text).order_by(Question.id).all():
+        inputs = [('', question_text, None)]
+        translated_text = get_translated_question(question_id, text_dir) if alt_language else None
+        if translated_text is not None:
+            inputs.append(('.alt', translated_text, alt_language))
+        keys = {suffix: speech_key(text, language, audio_format) for suffix, text, language in inputs}
+        stored_keys = set() if force else stored_speech_keys(keys.values())
+
+        # Transcoded and written before any database write, so that ffmpeg never runs while
+        # this holds the write lock
+        files = []
+        for suffix, _, language in inputs:
+            source_path = _find_legacy_file(question_id, suffix, audio_dir)
+            if source_path and keys[suffix] not in stored_keys:
+                # Kept under the key of TTS_AUDIO_FORMAT even when it could not be transcoded
+                data, data_format = _encode(source_path, audio_format)
+                files.append((keys[suffix], *write_speech_file(data, data_format, asset_dir), len(data), data_format, language))
+
+        if translated_text is not None:
+            store_translation(question_text, alt_language, translated_text)
+            imported_translations += 1
+        for file in files:
+            record_speech(*file)
+            imported_audio += 1
+        db.session.commit()
+    return imported_audio, imported_translations
+
+def collect_garbage(dry_run=False):
+    """
+    Deletes what no question can use any more: the translations of texts that are no longer
+    questions (or made with another model or prompt), the audio of texts that are neither a
+    question nor a kept translation (or made with other voice settings or format), then the
+    files no audio points to. Returns the numbers of (translations, audio, files) deleted,
+    or that would be with `dry_run`.
+    """
+    audio_format = get_audio_format()
+    question_texts = {text_digest(text): text for (text,) in db.session.query(Question.question_text)}
+    live_keys = {speech_key(text, None, audio_format) for text in question_texts.values()}
+
+    orphan_translations = []
+    for translation in Translation.query.all():
+        source_text = question_texts.get(translation.source_digest)
+        if source_text is None or translation.key not in {translation_key(source_text, translation.language, mode) for mode in TRANSLATION_MODES}:
+            orphan_translations.append(translation)
+        else:
+            live_keys.add(speech_key(translation.text, translation.language, audio_format))
+
+    orphan_assets = []
+    live_files = set()
+    for asset in TtsAsset.query.all():
+        if asset.key in live_keys:
+            live_files.add(asset.filename)
+        else:
+            orphan_assets.append(asset)
+
+    asset_dir = get_asset_dir()
+    now = time.time()
+    orphan_files = [
+        name for name in os.listdir(asset_dir)
+        if name not in live_files and now - os.path.getmtime(os.path.join(asset_dir, name)) > GC_GRACE_SECONDS
+    ]
+
+    if not dry_run:
+        for row in orphan_translations + orphan_assets:
+            db.session.delete(row)
+        db.session.commit()
+        for name in orphan_files:
+            os.remove(os.path.join(asset_dir, name))
+    return len(orphan_translations), len(orphan_assets), len(orphan_files)
@@ -0,0 +1,256 @@
+import json
+import asyncio
+import datetime
+import threading
+from flask import current_app
+from sqlalchemy import func, update
+from . import db
+from .models import Question, TtsBatch, TtsAsset, Job
+from .jobs import job_handler, enqueue, get_payload, ACTIVE_STATUSES
+from .providers import run_sync
+from .tts import synthesize_speech_async
+from .tts_assets import speech_key, write_speech_file, record_speech, get_audio_format, get_asset_dir
+from .translate import translate_questions_async, get_stored_translations, store_translation
+
+# Batches run by a thread of this process, by id
+_running = set()
+_running_lock = threading.Lock()
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+async def _generate_chunk(questions, translations, known_keys, language, token, api_key, audio_format, asset_dir, translation_options):
+    """
+    Translates (to `language`, unless None) the questions that have no stored translation, in
+    batches, then synthesizes the texts whose key is not in `known_keys` and writes their files
+    to `asset_dir`. Identical texts are synthesized once. Returns a result per question, or the
+    exception it raised.
+    """
+    new_translations = {}
+    if language is not None:
+        untranslated = [(q.id, q.question_text) for q in questions if q.question_text not in translations]
+        if untranslated:
+            new_translations = await translate_questions_async(untranslated, api_key, language, **translation_options)
+    synthesis = {} # Speech key -> task, shared by the questions with the same text
+
+    async def _generate(question):
+        translation = new_translations.get(question.id) # (text, mode)
+        text = question.question_text
+        if language is not None:
+            text = translations.get(question.question_text, translation and translation[0])
+            if text is None:
+                return {'status': 'failed'}
+        key = speech_key(text, language, audio_format)
+        if key in known_keys:
+            return {'status': 'skipped', 'translation': translation}
+        first = key not in synthesis
+        if first:
+            synthesis[key] = asyncio.ensure_future(synthesize_speech_async(text, token, audio_format))
+        data = await synthesis[key]
+        if data is None:
+            return {'status': 'failed', 'translation': translation}
+        if not first:
+            return {'status': 'skipped', 'translation': translation}
+        # The file is written here, so that apply() only has rows to write
+        digest, filename = await asyncio.to_thread(write_speech_file, data, audio_format, asset_dir)
+        return {'status': 'created', 'translation': translation, 'key': key, 'sha256': digest, 'filename': filename, 'size': len(data)}
+
+    return await asyncio.gather(*(_generate(q) for q in questions), return_exceptions=True)
+
+def prepare_batch_step(batch):
+    """
+    Prepares the next chunk of a batch: up to TTS_BATCH_CHUNK_SIZE questions after its
+    checkpoint. Returns None when the batch is complete, or `(awaitable, apply)` like a job
+    handler: the awaitable makes the provider calls and writes the audio files, then
+    `apply(results)` records the translations and audio, adds the outcome to the counters
+    and moves the checkpoint.
+    Only the inputs the store does not have yet are sent to the providers.
+    """
+    chunk_size = current_app.config.get('TTS_BATCH_CHUNK_SIZE', 32)
+    questions = db.session.query(Question.id, Question.question_text)\
+        .filter(Question.id > batch.checkpoint).order_by(Question.id).limit(chunk_size).all()
+    if not questions:
+        batch.status = 'done'
+        batch.finished_at = batch.updated_at = _utcnow()
+        db.session.commit()
+        print(f"TTS batch {batch.id} done. Created: {batch.created}, Skipped: {batch.skipped}, Failed: {batch.failed}")
+        return None
+
+    language = batch.language if batch.is_alt else None
+    translations = get_stored_translations([q.question_text for q in questions], language) if batch.is_alt else {}
+    # The keys of texts translated during the step are only known after it, so all the
+    # keys of the language are loaded: one short query, a few MB for a large question bank
+    known_keys = {row[0] for row in db.session.query(TtsAsset.key).filter(TtsAsset.language == language)}
+    awaitable = _generate_chunk(
+        questions, translations, known_keys, language,
+        current_app.config.get('SPEECHIFY_API_TOKEN'),
+        current_app.config.get('OPENROUTER_API_KEY'),
+        get_audio_format(),
+        get_asset_dir(),
+        {
+            'token_budget': current_app.config.get('TRANSLATION_BATCH_TOKEN_BUDGET', 4000),
+            'max_items': current_app.config.get('TRANSLATION_BATCH_MAX_ITEMS', 50),
+        }
+    )
+
+    batch_id = batch.id
+    checkpoint = questions[-1].id
+    audio_format = get_audio_format()
+
+    def apply(results):
+        counts = {'created': 0, 'skipped': 0, 'failed': 0}
+        for q, result in zip(questions, results):
+            if isinstance(result, Exception):
+                print(f"Could not generate the audio of question {q.id}: {result}")
+                counts['failed'] += 1
+                continue
+            counts[result['status']] += 1
+            # Kept even when the synthesis failed, so the translation is not paid for twice
+            if result.get('translation') is not None:
+                translated_text, mode = result['translation']
+                store_translation(q.question_text, language, translated_text, mode)
+            if result['status'] == 'created':
+                record_speech(result['key'], result['sha256'], result['filename'], result['size'], audio_format, language)
+        # A chunk retried after a crash is only counted once
+        db.session.execute(
+            update(TtsBatch)
+            .where(TtsBatch.id == batch_id, TtsBatch.checkpoint < checkpoint)
+            .values(
+                checkpoint=checkpoint,
+                created=TtsBatch.created + counts['created'],
+                skipped=TtsBatch.skipped + counts['skipped'],
+                failed=TtsBatch.failed + counts['failed'],
+                updated_at=_utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    return awaitable, apply
+
+def run_tts_batch(batch_id):
+    """Runs a batch to completion in the calling thread, from its checkpoint."""
+    while True:
+        batch = TtsBatch.query.get(batch_id)
+        if batch is None or batch.status != 'running':
+            return batch
+        prepared = prepare_batch_step(batch)
+        if prepared is None:
+            return batch
+        awaitable, apply = prepared
+        # Hand the connection back to the pool while the providers are called
+        db.session.commit()
+        apply(run_sync(awaitable))
+        db.session.commit()
+
+def _record_batch_failure(batch_id, error):
+    db.session.rollback()
+    db.session.execute(
+        update(TtsBatch).where(TtsBatch.id == batch_id)
+        .values(status='failed', last_error=str(error), updated_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def _run_in_thread(app, batch_id):
+    def _run():
+        with app.app_context():
+            try:
+                run_tts_batch(batch_id)
+            except Exception as e:
+                print(f"TTS batch {batch_id} failed: {e}")
+                _record_batch_failure(batch_id, e)
+            finally:
+                with _running_lock:
+                    _running.discard(batch_id)
+
+    with _running_lock:
+        if batch_id in _running:
+            return
+        _running.add(batch_id)
+    threading.Thread(target=_run, name=f'tts-batch-{batch_id}', daemon=True).start()
+
+def _record_batch_job_failure(job, error):
+    _record_batch_failure(get_payload(job)['batch_id'], error)
+
+@job_handler('tts_batch', on_failure=_record_batch_job_failure)
+def run_tts_batch_job(job):
+    """Runs one chunk of a batch, then queues the job of the next chunk."""
+    batch = TtsBatch.query.get(get_payload(job)['batch_id'])
+    if batch is None or batch.status != 'running':
+        return None
+    prepared = prepare_batch_step(batch)
+    if prepared is None:
+        return None
+    awaitable, apply = prepared
+
+    def apply_and_continue(results):
+        apply(results)
+        enqueue('tts_batch', payload={'batch_id': batch.id}, commit=False)
+    return awaitable, apply_and_continue
+
+def _has_queued_step(batch_id):
+    return db.session.query(Job.id).filter(
+        Job.kind == 'tts_batch',
+        Job.status.in_(ACTIVE_STATUSES),
+        Job.payload == json.dumps({'batch_id': batch_id})
+    ).first() is not None
+
+def _is_abandoned(batch):
+    """A running batch that made no progress for a lease period: the process running it is gone."""
+    stale_after = datetime.timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+    with _running_lock:
+        if batch.id in _running:
+            return False
+    return batch.updated_at is None or _utcnow() - batch.updated_at > stale_after
+
+def dispatch_tts_batch(batch):
+    """Hands a running batch to the job queue (PIPELINE_MODE=queue) or to a thread of this process."""
+    if current_app.config.get('PIPELINE_MODE') == 'queue':
+        if not _has_queued_step(batch.id):
+            enqueue('tts_batch', payload={'batch_id': batch.id})
+    else:
+        _run_in_thread(current_app._get_current_object(), batch.id)
+
+def start_tts_batch(is_alt=False, language=None):
+    """
+    Starts generating the audio of all the questions in the background and returns the batch.
+    A batch of the same kind that is still running is returned instead, and resumed from its
+    checkpoint when it was abandoned, e.g. by a crash or a restart.
+    """
+    language = language if is_alt else None
+    batch = TtsBatch.query.filter_by(status='running', is_alt=is_alt, language=language)\
+        .order_by(TtsBatch.id.desc()).first()
+    if batch is not None:
+        if _is_abandoned(batch):
+            print(f"Resuming TTS batch {batch.id} after question {batch.checkpoint}.")
+            batch.updated_at = _utcnow()
+            db.session.commit()
+            dispatch_tts_batch(batch)
+        return batch
+
+    batch = TtsBatch(
+        is_alt=is_alt,
+        language=language,
+        total=db.session.query(func.count(Question.id)).scalar()
+    )
+    db.session.add(batch)
+    db.session.commit()
+    dispatch_tts_batch(batch)
+    return batch
+
+def batch_progress(batch):
+    """The progress of a batch, as reported by /generate-audio/<id>."""
+    return {
+        'id': batch.id,
+        'is_alt': batch.is_alt,
+        'language': batch.language,
+        'status': batch.status,
+        'total': batch.total,
+        'processed': batch.created + batch.skipped + batch.failed,
+        'created': batch.created,
+        'skipped': batch.skipped,
+        'failed': batch.failed,
+        'last_error': batch.last_error,
+        'started_at': batch.created_at.isoformat() if batch.created_at else None,
+        'finished_at': batch.finished_at.isoformat() if batch.finished_at else None,
+    }